@@ -0,0 +1,63 @@
+"""
+A virtual clock for running schedulers offline without waiting for the real time.
+"""
+import datetime
+from contextlib import contextmanager
+from threading import Lock
+from types import ModuleType
+from typing import Any, Iterator, List, Tuple
+
+
+class VirtualClock:
+    """
+    A clock whose current time only changes when it is moved explicitly.
+
+    `patch` replaces the `datetime` module seen by the given modules with a proxy whose `datetime.now` returns
+    the time of this clock, so that the `schedule` library and the schedulers follow the virtual time.
+    """
+
+    def __init__(self, start: datetime.datetime) -> None:
+        self._now = start
+        self._lock = Lock()
+
+    def now(self) -> datetime.datetime:
+        with self._lock:
+            return self._now
+
+    def move_to(self, time: datetime.datetime) -> None:
+        with self._lock:
+            self._now = time
+
+    def tick(self, delta: datetime.timedelta) -> None:
+        with self._lock:
+            self._now += delta
+
+    @contextmanager
+    def patch(self, *modules: ModuleType) -> Iterator["VirtualClock"]:
+        proxy = _DatetimeModule(self)
+        originals: List[Tuple[ModuleType, Any]] = [(m, getattr(m, "datetime")) for m in modules]
+        for module in modules:
+            setattr(module, "datetime", proxy)
+        try:
+            yield self
+        finally:
+            for module, original in originals:
+                setattr(module, "datetime", original)
+
+
+class _DatetimeModule:
+    """
+    A proxy of the `datetime` module whose `datetime` class takes the current time from a virtual clock.
+    """
+
+    def __init__(self, clock: VirtualClock) -> None:
+        class VirtualDatetime(datetime.datetime):
+            @classmethod
+            def now(cls, tz: Any = None) -> "VirtualDatetime":
+                now = clock.now()
+                return cls.combine(now.date(), now.time())
+
+        self.datetime = VirtualDatetime
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(datetime, name)
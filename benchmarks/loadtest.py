@@ -0,0 +1,156 @@
+"""
+Run many tasks end to end against the simulated exchange and report the throughput of the orders.
+
+Usage:
+    $ python -m benchmarks.loadtest --tasks 5000 --simulator "latency=lognormal:0.05:0.5,fill_delay=exponential:2"
+
+All the tasks are dispatched at once, as when they share a run time, and each of them goes through the same path
+as in the daemon: the execution pool, the task file, the exchange client, the order tracker and the simulated
+exchange. Nothing is sent to real exchanges, and all the files are written in a temporary directory.
+
+The poll schedule of the orders can be changed with `DORU_POLL_SCHEDULE_SIMULATED`.
+"""
+import argparse
+import json
+import tempfile
+import threading
+import time
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List
+
+from tabulate import tabulate
+
+import doru.exchange
+import doru.simulator
+from benchmarks.suite import percentiles
+from doru.cache import MarketCache
+from doru.exchange import ExchangeRegistry
+from doru.manager.task_manager import create_task_manager
+from doru.simulator import SIMULATED_EXCHANGE, SimulatedVenue, parse_simulator_config
+
+DEFAULT_SIMULATOR = "latency=lognormal:0.05:0.5,fill_delay=exponential:2,markets=100,seed=0"
+
+
+def write_tasks(file: Path, size: int, symbols: List[str]) -> None:
+    tasks = {
+        str(i): {
+            "id": str(i),
+            "symbol": symbols[i % len(symbols)],
+            "amount": 1000,
+            "cycle": "Daily",
+            "time": "00:00",
+            "exchange": SIMULATED_EXCHANGE,
+            "status": "Stopped",
+        }
+        for i in range(size)
+    }
+    with open(file, "w") as f:
+        json.dump(tasks, f)
+
+
+def run(args: argparse.Namespace, directory: Path) -> Dict[str, Any]:
+    venue = SimulatedVenue(parse_simulator_config(args.simulator))
+    doru.simulator.venue = venue
+    doru.exchange.registry = ExchangeRegistry(str(directory / "credential.json"))
+    doru.exchange.market_cache = MarketCache(directory=None)
+
+    # The tasks written to the JSON file are imported into the database when the manager is created.
+    write_tasks(directory / "task.json", args.tasks, venue.symbols[: args.symbols])
+    manager = create_task_manager(
+        str(directory / "task.db"),
+        max_running_tasks=args.tasks,
+        max_workers=args.workers,
+        max_orders_per_exchange=args.per_exchange,
+        aggregation_window=args.aggregation_window,
+        history_file=str(directory / "history.jsonl"),
+    )
+    latencies: List[float] = []
+    failures = [0]
+    lock = threading.Lock()
+
+    def job(func: Any, dispatched: float, **kwargs: Any) -> None:
+        try:
+            func(**kwargs)
+        except Exception:
+            with lock:
+                failures[0] += 1
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - dispatched)
+
+    start = time.perf_counter()
+    for task in manager.tasks.values():
+        func = partial(manager._aggregate_task if manager.aggregator is not None else manager._run_task, task.id)
+        kwargs = {"exchange_name": task.exchange, "symbol": task.symbol, "amount": task.amount}
+        manager.executor.submit(partial(job, func, time.perf_counter(), **kwargs), group=task.exchange)
+
+    deadline = start + args.timeout
+    while time.perf_counter() < deadline:
+        stats = manager.executor.stats()
+        pending = manager.aggregator is not None and manager.aggregator._batches
+        if stats["active_workers"] == 0 and stats["queue_depth"] == 0 and not pending:
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    manager.executor.shutdown()
+
+    venue_stats = venue.stats()
+    aggregated = manager.aggregator is not None
+    return {
+        "tasks": args.tasks,
+        "symbols": min(args.symbols, len(venue.symbols)),
+        "aggregation_window": args.aggregation_window,
+        "simulator": args.simulator,
+        "status": "ok" if elapsed < args.timeout else "timeout",
+        "elapsed_seconds": elapsed,
+        "tasks_per_second": args.tasks / elapsed,
+        "orders": venue_stats["orders"],
+        "requests": venue_stats["requests"],
+        "errors": venue_stats["errors"],
+        "failed_tasks": failures[0],
+        # The tasks only hand their orders over to the aggregator when the orders are aggregated.
+        "task_seconds": None if aggregated else percentiles(latencies),
+        "executor": manager.executor.stats(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--symbols", type=int, default=10, help="number of symbols over which the tasks are spread")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--per-exchange", type=int, default=4, help="maximum number of orders per exchange")
+    parser.add_argument("--aggregation-window", type=float, default=0)
+    parser.add_argument("--simulator", default=DEFAULT_SIMULATOR, help="configuration of the simulated exchange")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="file to which the result is written in JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="doru-loadtest-") as directory:
+        result = run(args, Path(directory))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    lag = result["task_seconds"] or {}
+    rows = [
+        [
+            result["tasks"],
+            result["status"],
+            result["elapsed_seconds"],
+            result["tasks_per_second"],
+            result["orders"],
+            result["requests"],
+            result["errors"],
+            result["failed_tasks"],
+            lag.get("p50"),
+            lag.get("p99"),
+        ]
+    ]
+    header = ["Tasks", "Status", "Elapsed (s)", "Tasks/s", "Orders", "Requests", "Errors", "Failed"]
+    header += ["Task p50 (s)", "Task p99 (s)"]
+    print(tabulate(rows, headers=header, floatfmt=".3f", missingval="-"))
+
+
+if __name__ == "__main__":
+    main()
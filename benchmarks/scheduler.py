@@ -0,0 +1,135 @@
+"""
+Compare the cost of managing many jobs with each scheduler implementation.
+
+Usage:
+    $ python -m benchmarks.scheduler --sizes 1000 10000 100000
+
+For each number of jobs, the following operations are measured.
+- start: submit and start all the jobs
+- stop: kill half of the jobs at once
+- restart: submit and start the killed jobs again
+- fire: take the same number of jobs sharing a run time out of the queue when they are due
+  (not applicable to `ScheduleThreadPool`, in which each thread checks its own job every second)
+
+`ScheduleThreadPool` needs one thread per job, so it is skipped for the numbers of jobs above `--max-threads`.
+"""
+import argparse
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from tabulate import tabulate
+
+from doru.scheduler import (
+    HeapScheduler,
+    JobScheduler,
+    ScheduleThreadPool,
+    TimingWheelScheduler,
+)
+from doru.timetable import WEEKDAYS
+from doru.type import Cycle
+
+HEADER = ["Scheduler", "Jobs", "Start (s)", "Stop (s)", "Restart (s)", "Fire (s)", "Threads"]
+
+SchedulerFactory = Callable[[int], JobScheduler]
+
+
+def noop() -> None:
+    pass
+
+
+def submit(scheduler: JobScheduler, key: str, rand: random.Random) -> None:
+    cycles: List[Cycle] = ["Daily", "Weekly", "Monthly"]
+    cycle = rand.choice(cycles)
+    scheduler.submit(
+        key,
+        noop,
+        cycle,
+        weekday=rand.choice(WEEKDAYS),
+        day=rand.randint(1, 28),
+        time=f"{rand.randint(0, 23):02}:{rand.randint(0, 59):02}",
+    )
+
+
+def measure(func: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_fire(create: SchedulerFactory, size: int) -> float:
+    scheduler = create(size)
+    assert isinstance(scheduler, HeapScheduler)
+    scheduler.shutdown()
+    for i in range(size):
+        scheduler.submit(str(i), noop, "Daily")
+        scheduler.start(str(i))
+    next_run = scheduler.next_run("0")
+    assert next_run is not None
+
+    start = time.perf_counter()
+    with scheduler._condition:
+        due = scheduler._pop_due(next_run)
+    seconds = time.perf_counter() - start
+    assert len(due) == size
+    return seconds
+
+
+def bench(name: str, create: SchedulerFactory, size: int, seed: int) -> List[Union[str, int, float, None]]:
+    scheduler = create(size)
+    rand = random.Random(seed)
+    keys = [str(i) for i in range(size)]
+    stopped = keys[::2]
+
+    def start(keys: Sequence[str]) -> None:
+        for key in keys:
+            submit(scheduler, key, rand)
+            scheduler.start(key)
+
+    def stop() -> None:
+        for key in stopped:
+            scheduler.kill(key)
+
+    threads_before = set(threading.enumerate())
+    start_seconds = measure(lambda: start(keys))
+    threads = set(threading.enumerate()) - threads_before
+    stop_seconds = measure(stop)
+    restart_seconds = measure(lambda: start(stopped))
+    fire_seconds: Optional[float] = None
+    if isinstance(scheduler, HeapScheduler):
+        scheduler.shutdown()
+        fire_seconds = bench_fire(create, size)
+    else:
+        for key in keys:
+            scheduler.kill(key)
+    # Wait for the threads of this scheduler so that they do not affect the next measurement.
+    for thread in threads:
+        thread.join()
+    return [name, size, start_seconds, stop_seconds, restart_seconds, fire_seconds, len(threads)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--max-threads", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    schedulers: Dict[str, SchedulerFactory] = {
+        "ScheduleThreadPool": lambda size: ScheduleThreadPool(size),
+        "HeapScheduler": lambda size: HeapScheduler(size),
+        "TimingWheelScheduler": lambda size: TimingWheelScheduler(size),
+    }
+    rows = []
+    for size in args.sizes:
+        for name, create in schedulers.items():
+            if name == "ScheduleThreadPool" and size > args.max_threads:
+                rows.append([name, size, None, None, None, None, None])
+                continue
+            rows.append(bench(name, create, size, args.seed))
+    print(tabulate(rows, headers=HEADER, floatfmt=".3f", missingval="-"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Measure the schedulers with a virtual clock and write the results in JSON.
+
+Usage:
+    $ python -m benchmarks.suite --sizes 10 100 1000 10000 --output results.json
+
+For each scheduler and number of tasks, the following metrics are reported.
+- memory_per_task_bytes: increase of the resident set size per started task
+- threads: number of threads created by the scheduler for the tasks
+- idle_cpu_percent: CPU usage of the process while no task is due
+- dispatch_lag_seconds: percentiles of the delay between the time at which all the tasks become due
+  and the time at which each task is executed
+- submit_us / kill_us: average time to submit and start / kill a task
+
+All the tasks share a run time like tasks created with the default time. Each case is run in a separate process
+so that the cases do not affect each other, and a case that does not finish within `--case-timeout` seconds
+is reported with the `timeout` status.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import schedule
+from tabulate import tabulate
+
+import doru.scheduler
+from benchmarks.clock import VirtualClock
+from doru.scheduler import (
+    HeapScheduler,
+    JobScheduler,
+    ScheduleThreadPool,
+    TimingWheelScheduler,
+)
+
+SCHEDULERS: Dict[str, Callable[[int], JobScheduler]] = {
+    "ScheduleThreadPool": lambda size: ScheduleThreadPool(size),
+    "HeapScheduler": lambda size: HeapScheduler(size),
+    "TimingWheelScheduler": lambda size: TimingWheelScheduler(size),
+}
+START = datetime.datetime(2023, 1, 2, 0, 0)
+RUN_TIME = "00:01"
+PERCENTILES = (50, 90, 99, 100)
+
+
+def rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(values)
+    result: Dict[str, Optional[float]] = {}
+    for p in PERCENTILES:
+        name = "max" if p == 100 else f"p{p}"
+        result[name] = ordered[min(len(ordered) - 1, len(ordered) * p // 100)] if ordered else None
+    return result
+
+
+def wake_up(scheduler: JobScheduler) -> None:
+    # The dispatcher of HeapScheduler sleeps for the real time, so it is woken up when the virtual clock moves.
+    if isinstance(scheduler, HeapScheduler):
+        with scheduler._condition:
+            scheduler._condition.notify_all()
+
+
+def run_case(name: str, size: int, idle_seconds: float, fire_timeout: float) -> Dict[str, Any]:
+    clock = VirtualClock(START)
+    fired = [0.0] * size
+    fired_count = [0]
+    all_fired = threading.Event()
+    lock = threading.Lock()
+
+    def job(index: int) -> None:
+        fired[index] = time.perf_counter()
+        with lock:
+            fired_count[0] += 1
+            if fired_count[0] == size:
+                all_fired.set()
+
+    with clock.patch(schedule, doru.scheduler):
+        scheduler = SCHEDULERS[name](size)
+        keys = [str(i) for i in range(size)]
+        threads_before = threading.active_count()
+        rss_before = rss_bytes()
+
+        start = time.perf_counter()
+        for i, key in enumerate(keys):
+            scheduler.submit(key, job, "Daily", time=RUN_TIME, index=i)
+            scheduler.start(key)
+        submit_seconds = time.perf_counter() - start
+
+        rss_after = rss_bytes()
+        threads = threading.active_count() - threads_before
+
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        time.sleep(idle_seconds)
+        idle_cpu = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+
+        clock.tick(datetime.timedelta(minutes=1))
+        due = time.perf_counter()
+        wake_up(scheduler)
+        completed = all_fired.wait(fire_timeout)
+        lags = [t - due for t in fired if t > 0]
+
+        start = time.perf_counter()
+        for key in keys:
+            scheduler.kill(key)
+        kill_seconds = time.perf_counter() - start
+        if isinstance(scheduler, HeapScheduler):
+            scheduler.shutdown()
+
+    memory = None if rss_before is None or rss_after is None else (rss_after - rss_before) / size
+    return {
+        "scheduler": name,
+        "tasks": size,
+        "status": "ok" if completed else "incomplete",
+        "memory_per_task_bytes": memory,
+        "threads": threads,
+        "idle_cpu_percent": idle_cpu * 100,
+        "dispatch_lag_seconds": percentiles(lags),
+        "fired": len(lags),
+        "submit_us": submit_seconds / size * 1e6,
+        "kill_us": kill_seconds / size * 1e6,
+    }
+
+
+def run_case_in_subprocess(name: str, size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.suite",
+        "--case",
+        name,
+        str(size),
+        "--idle-seconds",
+        str(args.idle_seconds),
+        "--fire-timeout",
+        str(args.fire_timeout),
+    ]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=args.case_timeout, check=True)
+    except subprocess.TimeoutExpired:
+        return {"scheduler": name, "tasks": size, "status": "timeout"}
+    except subprocess.CalledProcessError as e:
+        return {"scheduler": name, "tasks": size, "status": "error", "detail": e.stderr.strip().splitlines()[-1:]}
+    result: Dict[str, Any] = json.loads(completed.stdout)
+    return result
+
+
+def summarize(results: List[Dict[str, Any]]) -> str:
+    header = ["Scheduler", "Tasks", "Status", "Memory/task (KiB)", "Threads", "Idle CPU (%)", "Lag p50 (s)"]
+    header += ["Lag p99 (s)", "Submit (us)", "Kill (us)"]
+    rows = []
+    for r in results:
+        lag = r.get("dispatch_lag_seconds", {})
+        memory = r.get("memory_per_task_bytes")
+        rows.append(
+            [
+                r["scheduler"],
+                r["tasks"],
+                r["status"],
+                None if memory is None else memory / 1024,
+                r.get("threads"),
+                r.get("idle_cpu_percent"),
+                lag.get("p50"),
+                lag.get("p99"),
+                r.get("submit_us"),
+                r.get("kill_us"),
+            ]
+        )
+    return tabulate(rows, headers=header, floatfmt=".3f", missingval="-")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schedulers", nargs="+", choices=list(SCHEDULERS), default=list(SCHEDULERS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--idle-seconds", type=float, default=3, help="duration of the idle CPU measurement")
+    parser.add_argument("--fire-timeout", type=float, default=30, help="maximum time to wait for due tasks")
+    parser.add_argument("--case-timeout", type=float, default=600, help="maximum time of each case")
+    parser.add_argument("--output", help="file to which the results are written instead of the standard output")
+    parser.add_argument("--case", nargs=2, metavar=("SCHEDULER", "TASKS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case is not None:
+        name, size = args.case
+        print(json.dumps(run_case(name, int(size), args.idle_seconds, args.fire_timeout)))
+        return
+
+    results = []
+    for size in args.sizes:
+        for name in args.schedulers:
+            results.append(run_case_in_subprocess(name, size, args))
+            print(summarize(results[-1:]).splitlines()[-1], file=sys.stderr)
+    report = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(summarize(results))
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
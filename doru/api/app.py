@@ -1,8 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
 from fastapi import FastAPI
 
 from doru.api.daemonize import router_daemonize
 from doru.api.router import router
+from doru.exchange import registry
 from doru.manager.container import Container
+from doru.manager.task_manager import TaskManager
+from doru.scheduler import AsyncScheduler
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Create the task manager on startup so that the running tasks are resumed as soon as the daemon starts.
+    If the tasks are scheduled in the event loop, their dispatcher runs while the application is running,
+    and the sessions of the asynchronous exchange clients are closed on shutdown.
+    On shutdown, the task manager is stopped after the running tasks finish, which includes the worker processes
+    if the tasks are distributed over them.
+    """
+    manager: TaskManager = getattr(app, "container").task_manager()
+    dispatcher: Optional["asyncio.Future[None]"] = None
+    if isinstance(manager.pool, AsyncScheduler):
+        dispatcher = asyncio.ensure_future(manager.pool.run())
+    try:
+        yield
+    finally:
+        if dispatcher is not None:
+            manager.pool.shutdown()
+            await dispatcher
+        # Waiting for the running tasks should not block the event loop.
+        await asyncio.get_event_loop().run_in_executor(None, manager.shutdown)
+        await registry.close_async()
 
 
 def create_app() -> FastAPI:
@@ -11,6 +42,8 @@ def create_app() -> FastAPI:
     setattr(app, "container", container)
     app.include_router(router)
     app.include_router(router_daemonize)
+    # FastAPI of this version does not accept a lifespan handler in the constructor.
+    app.router.lifespan_context = lifespan
     return app
 
 
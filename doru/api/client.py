@@ -1,17 +1,24 @@
 from typing import List, Optional
 
-from doru.api.schema import Credential, KeepAlive, Task, TaskCreate
+from doru.api.schema import (
+    Credential,
+    KeepAlive,
+    SymbolValidation,
+    Task,
+    TaskBase,
+    UpcomingRun,
+)
 from doru.api.session import create_session
 from doru.envs import DORU_SOCK_NAME
-from doru.type import Cycle, Weekday
+from doru.type import Cycle, Status, Weekday
 
 
 class Client:
     def __init__(self, sock: str) -> None:
         self.session = create_session(sock)
 
-    def get_tasks(self) -> List[Task]:
-        res = self.session.get("tasks")
+    def get_tasks(self, status: Optional[Status] = None) -> List[Task]:
+        res = self.session.get("tasks", params={"status": status} if status else None)
         res.raise_for_status()
         data = res.json()
         return [
@@ -26,6 +33,7 @@ class Client:
                 exchange=d["exchange"],
                 status=d["status"],
                 next_run=d.get("next_run"),
+                last_run=d.get("last_run"),
             )
             for d in data
         ]
@@ -40,7 +48,8 @@ class Client:
         weekday: Optional[Weekday] = None,
         day: Optional[int] = None,
     ) -> Task:
-        task = TaskCreate(
+        # Only the structure is validated here, and the symbol is validated by the daemon.
+        task = TaskBase(
             symbol=symbol, amount=amount, cycle=cycle, weekday=weekday, day=day, time=time, exchange=exchange
         )
         res = self.session.post("tasks", data=task.json())
@@ -58,6 +67,11 @@ class Client:
             status=data["status"],
         )
 
+    def validate_symbol(self, exchange: str, symbol: str) -> SymbolValidation:
+        res = self.session.get("symbols/validate", params={"exchange": exchange, "symbol": symbol})
+        res.raise_for_status()
+        return SymbolValidation.parse_obj(res.json())
+
     def remove_task(self, id: str) -> None:
         res = self.session.delete(f"tasks/{id}")
         res.raise_for_status()
@@ -67,7 +81,8 @@ class Client:
         res.raise_for_status()
 
     def start_all_tasks(self) -> None:
-        tasks = self.get_tasks()
+        # The running tasks are not started again.
+        tasks = self.get_tasks(status="Stopped")
         for task in tasks:
             self.start_task(task.id)
 
@@ -76,10 +91,19 @@ class Client:
         res.raise_for_status()
 
     def stop_all_tasks(self) -> None:
-        tasks = self.get_tasks()
+        tasks = self.get_tasks(status="Running")
         for task in tasks:
             self.stop_task(task.id)
 
+    def get_upcoming_runs(self, horizon: int) -> List[UpcomingRun]:
+        res = self.session.get("schedule/upcoming", params={"horizon": horizon})
+        res.raise_for_status()
+        data = res.json()
+        return [
+            UpcomingRun(id=d["id"], symbol=d["symbol"], amount=d["amount"], exchange=d["exchange"], run_at=d["run_at"])
+            for d in data
+        ]
+
     def add_cred(self, exchange: str, key: str, secret: str) -> None:
         cred = Credential(exchange=exchange, key=key, secret=secret)
         res = self.session.post("credentials", data=cred.json())
@@ -1,15 +1,34 @@
+from datetime import timedelta
 from logging import getLogger
-from typing import List
+from typing import List, Optional
 
 from dependency_injector.wiring import Provide, inject
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 from fastapi.responses import JSONResponse
 
-from doru.api.schema import Credential, Task, TaskCreate
+from doru.api.schema import (
+    CacheStats,
+    Credential,
+    ExchangeLoad,
+    ExecutorStats,
+    OrderFill,
+    OrderFillStats,
+    PhaseLatency,
+    Span,
+    SymbolValidation,
+    Task,
+    TaskCreate,
+    UpcomingRun,
+    is_valid_exchange_name,
+)
+from doru.cache import market_cache
 from doru.exceptions import MoreThanMaxRunningTasks, TaskDuplicate, TaskNotExist
+from doru.exchange import get_exchange, registry
 from doru.manager.container import Container
 from doru.manager.credential_manager import CredentialManager
 from doru.manager.task_manager import TaskManager
+from doru.tracing import recorder
+from doru.type import Status
 
 router = APIRouter()
 logger = getLogger(__name__)
@@ -20,8 +39,13 @@ INTERNAL_ERROR_MESSAGE = "An internal error has occurred."
 
 @router.get("/tasks", response_model=List[Task], response_model_exclude_none=True, status_code=status.HTTP_200_OK)
 @inject
-def get_tasks(manager: TaskManager = Depends(Provide[Container.task_manager])):
-    return manager.get_tasks()
+def get_tasks(
+    exchange: Optional[str] = Query(default=None),
+    symbol: Optional[str] = Query(default=None),
+    status: Optional[Status] = Query(default=None),
+    manager: TaskManager = Depends(Provide[Container.task_manager]),
+):
+    return manager.get_tasks(exchange=exchange, symbol=symbol, status=status)
 
 
 @router.post("/tasks", response_model=Task, response_model_exclude_none=True, status_code=status.HTTP_201_CREATED)
@@ -39,6 +63,26 @@ def post_task(task: TaskCreate, manager: TaskManager = Depends(Provide[Container
     return t
 
 
+@router.get("/symbols/validate", response_model=SymbolValidation, status_code=status.HTTP_200_OK)
+def get_symbol_validation(exchange: str = Query(), symbol: str = Query()):
+    # The symbols are looked up in the market cache of the daemon, which is kept warm by the running tasks.
+    try:
+        is_valid_exchange_name(exchange)
+    except ValueError as e:
+        return JSONResponse(content={"detail": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+    try:
+        index = get_exchange(exchange).symbol_index()
+    except Exception as e:
+        logger.error(f"Failed to validate symbol: {str(e)}")
+        return JSONResponse(
+            content={"detail": INTERNAL_ERROR_MESSAGE}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    valid = symbol in index
+    return SymbolValidation(
+        exchange=exchange, symbol=symbol, valid=valid, suggestions=[] if valid else index.suggest(symbol)
+    )
+
+
 @router.post("/tasks/{task_id}/start", status_code=status.HTTP_204_NO_CONTENT)
 @inject
 def post_start_task(task_id: str, manager: TaskManager = Depends(Provide[Container.task_manager])):
@@ -101,6 +145,63 @@ def delete_task(task_id: str, manager: TaskManager = Depends(Provide[Container.t
     logger.info(f"Removed task: {{'id': {task_id}}}")
 
 
+@router.get("/schedule/upcoming", response_model=List[UpcomingRun], status_code=status.HTTP_200_OK)
+@inject
+def get_upcoming_runs(
+    horizon: int = Query(default=7, ge=1, le=366),
+    manager: TaskManager = Depends(Provide[Container.task_manager]),
+):
+    return manager.get_upcoming_runs(timedelta(days=horizon))
+
+
+@router.get("/history", response_model=List[OrderFill], status_code=status.HTTP_200_OK)
+@inject
+def get_history(
+    task_id: Optional[str] = Query(default=None),
+    manager: TaskManager = Depends(Provide[Container.task_manager]),
+):
+    return manager.get_history(task_id)
+
+
+@router.get("/stats/load", response_model=List[ExchangeLoad], status_code=status.HTTP_200_OK)
+@inject
+def get_load_report(
+    horizon: int = Query(default=1, ge=1, le=366),
+    manager: TaskManager = Depends(Provide[Container.task_manager]),
+):
+    return manager.get_load_report(timedelta(days=horizon))
+
+
+@router.get("/stats/executor", response_model=ExecutorStats, status_code=status.HTTP_200_OK)
+@inject
+def get_executor_stats(manager: TaskManager = Depends(Provide[Container.task_manager])):
+    return manager.get_executor_stats()
+
+
+@router.get("/stats/cache", response_model=CacheStats, status_code=status.HTTP_200_OK)
+def get_cache_stats():
+    return market_cache.stats()
+
+
+@router.get("/stats/fills", response_model=List[OrderFillStats], status_code=status.HTTP_200_OK)
+def get_fill_stats():
+    return registry.fill_stats()
+
+
+@router.get("/stats/latency", response_model=List[PhaseLatency], status_code=status.HTTP_200_OK)
+def get_latency_stats():
+    return recorder.summary()
+
+
+@router.get("/spans", response_model=List[Span], status_code=status.HTTP_200_OK)
+def get_spans(
+    exchange: Optional[str] = Query(default=None),
+    run: Optional[str] = Query(default=None),
+    limit: int = Query(default=100, ge=1, le=10000),
+):
+    return recorder.recent(exchange, run, limit)
+
+
 @router.post("/credentials", status_code=status.HTTP_201_CREATED)
 @inject
 def post_credential(cred: Credential, manager: CredentialManager = Depends(Provide[Container.credential_manager])):
@@ -1,27 +1,34 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 import ccxt
 from pydantic import BaseModel, root_validator, validator
 
+from doru.simulator import SIMULATED_EXCHANGE
 from doru.type import Cycle, Status, Weekday
 
 TIMESTAMP_STRING_FORMAT = "%Y-%m-%d %H:%M"
+SECONDS_TIMESTAMP_STRING_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
 def is_valid_exchange_name(exchange: str):
-    if exchange not in ccxt.exchanges:
-        raise ValueError(f"`{exchange}` is an unsupported exchange.\n\nSupported exchanges:\n{ccxt.exchanges}")
+    if exchange not in ccxt.exchanges and exchange != SIMULATED_EXCHANGE:
+        exchanges = ccxt.exchanges + [SIMULATED_EXCHANGE]
+        raise ValueError(f"`{exchange}` is an unsupported exchange.\n\nSupported exchanges:\n{exchanges}")
 
 
 def is_valid_symbol(exchange: str, symbol: str):
     from doru.exchange import get_exchange
 
     is_valid_exchange_name(exchange)
-    ex = get_exchange(exchange)
-    symbols = ex.fetch_spot_symbols()
-    if symbol not in symbols:
-        raise ValueError(f"`{symbol}` is not supported on {exchange}.\n\nSupported symbols:\n{set(symbols)}")
+    index = get_exchange(exchange).symbol_index()
+    if symbol not in index:
+        raise ValueError(invalid_symbol_message(exchange, symbol, index.suggest(symbol)))
+
+
+def invalid_symbol_message(exchange: str, symbol: str, suggestions: List[str]) -> str:
+    hint = f"Did you mean {', '.join(suggestions)}?" if suggestions else "No similar symbols are found."
+    return f"`{symbol}` is not supported on {exchange}. {hint}\n\nRun `doru symbols {exchange}` to see the supported symbols."
 
 
 class TaskBase(BaseModel):
@@ -33,6 +40,13 @@ class TaskBase(BaseModel):
     time: str
     exchange: str
 
+    @validator("symbol")
+    def symbol_should_be_unified_spot_symbol(cls, v: str):
+        base, _, quote = v.partition("/")
+        if not base or not quote:
+            raise ValueError("The symbol parameter should be in the following format `BASE/QUOTE`.")
+        return v
+
     @validator("amount")
     def amount_should_be_positive_number(cls, v, values):
         if v <= 0:
@@ -65,23 +79,31 @@ class TaskBase(BaseModel):
 
     @root_validator
     def exchange_symbol_validator(cls, values):
+        # Only the structure is validated here because the tasks are also loaded from the file and the responses
+        # of the daemon. Whether the symbol is listed on the exchange is validated on creation by `TaskCreate`.
         if "exchange" not in values:
             raise ValueError("`exchange` is required")
         if "symbol" not in values:
             raise ValueError("`symbol` is required")
         is_valid_exchange_name(values["exchange"])
-        is_valid_symbol(values["exchange"], values["symbol"])
         return values
 
 
 class TaskCreate(TaskBase):
-    pass
+    @root_validator(skip_on_failure=True)
+    def symbol_validator(cls, values):
+        # The markets are read from the market cache, so that they are fetched at most once per TTL.
+        is_valid_symbol(values["exchange"], values["symbol"])
+        return values
 
 
 class Task(TaskBase):
     id: str
     status: Status
     next_run: Optional[str]
+    # The time until which the scheduled runs have been handled,
+    # i.e. the time of the last run or the time when the task was started.
+    last_run: Optional[str] = None
 
     @validator("id")
     def empty_id_forbidden(cls, v):
@@ -98,6 +120,23 @@ class Task(TaskBase):
                 raise ValueError("The next_run parameter should be in the following format `%Y-%m-%d %H:%M`.")
         return v
 
+    @validator("last_run")
+    def last_run_should_be_specified_format(cls, v: Optional[str]):
+        if v is not None:
+            try:
+                datetime.strptime(v, TIMESTAMP_STRING_FORMAT)
+            except ValueError:
+                raise ValueError("The last_run parameter should be in the following format `%Y-%m-%d %H:%M`.")
+        return v
+
+
+class SymbolValidation(BaseModel):
+    exchange: str
+    symbol: str
+    valid: bool
+    # the listed symbols close to the symbol if it is not valid
+    suggestions: List[str] = []
+
 
 class CredentialBase(BaseModel):
     key: str
@@ -127,3 +166,86 @@ class Credential(CredentialBase):
 
 class KeepAlive(BaseModel):
     pid: int
+
+
+class UpcomingRun(BaseModel):
+    id: str
+    symbol: str
+    amount: float
+    exchange: str
+    run_at: str
+
+
+class ExchangeLoad(BaseModel):
+    exchange: str
+    runs: int
+    # number of seconds in which at least one run starts
+    busy_seconds: int
+    # maximum number of runs that start in the same second
+    peak: int
+    peak_at: str
+
+
+class ExecutorStats(BaseModel):
+    max_workers: int
+    workers: int
+    active_workers: int
+    queue_depth: int
+    utilization: float
+    busy_seconds: float
+    completed: int
+
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    entries: int
+
+
+class OrderFillStats(BaseModel):
+    exchange: str
+    # number of recently filled orders
+    fills: int
+    mean_seconds: float
+    p50_seconds: float
+    p90_seconds: float
+    max_seconds: float
+
+
+class PhaseLatency(BaseModel):
+    exchange: str
+    # e.g. credential, ticker, markets, create_order, fill_wait, cancel, record or total
+    phase: str
+    count: int
+    failures: int
+    mean_seconds: float
+    p50_seconds: float
+    p90_seconds: float
+    p99_seconds: float
+    max_seconds: float
+
+
+class Span(BaseModel):
+    run: Optional[str]
+    exchange: str
+    symbol: Optional[str]
+    phase: str
+    started_at: float
+    seconds: float
+    succeeded: bool
+
+
+class OrderFill(BaseModel):
+    task_id: str
+    order_id: str
+    exchange: str
+    symbol: str
+    # the quote amount of the task
+    amount: float
+    # the base amount and the cost attributed to the task in proportion to its amount
+    filled: float
+    cost: float
+    price: Optional[float]
+    # the number of tasks whose orders were placed as this order
+    tasks: int
+    executed_at: str
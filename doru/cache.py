@@ -0,0 +1,329 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import Future
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from typing_extensions import TypedDict
+
+from doru.envs import (
+    DORU_CACHE_DIR,
+    DORU_MARKET_CACHE_TTL,
+    DORU_TICKER_BATCH_WINDOW,
+    DORU_TICKER_MAX_AGE,
+)
+
+logger = getLogger(__name__)
+
+
+class CacheStats(TypedDict):
+    hits: int
+    misses: int
+    entries: int
+
+
+class TickerStats(TypedDict):
+    hits: int
+    coalesced: int
+    requests: int
+
+
+class MarketCache:
+    """
+    A cache of the markets of exchanges, which expire `ttl` seconds after they are fetched.
+
+    The markets of an exchange are refreshed by only one thread at a time, and the other threads waiting for
+    the refresh use its result. The markets are also written to `directory`, so that a new process can use them
+    without downloading them again. If `ttl` is 0, the markets are always fetched.
+    """
+
+    def __init__(self, ttl: float = DORU_MARKET_CACHE_TTL, directory: Optional[str] = DORU_CACHE_DIR) -> None:
+        self.ttl = ttl
+        self.directory = Path(directory).expanduser() / "markets" if directory else None
+        self.hits = 0
+        self.misses = 0
+        # exchange -> (the epoch time at which the markets are fetched, the markets)
+        self._entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._locks: Dict[str, Lock] = {}
+        self._async_locks: Dict[str, asyncio.Lock] = {}
+        self._lock = Lock()
+
+    def _lock_of(self, exchange: str) -> Lock:
+        with self._lock:
+            return self._locks.setdefault(exchange, Lock())
+
+    def _snapshot_file(self, exchange: str) -> Optional[Path]:
+        return None if self.directory is None else self.directory / f"{exchange}.json"
+
+    def _read_snapshot(self, exchange: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        file = self._snapshot_file(exchange)
+        if file is None or not file.exists():
+            return None
+        try:
+            with open(file, "r") as f:
+                snapshot = json.load(f)
+            return float(snapshot["fetched_at"]), snapshot["markets"]
+        except Exception as e:
+            logger.warning(f"Failed to read the market cache of {exchange}: {str(e)}")
+            return None
+
+    def _write_snapshot(self, exchange: str, fetched_at: float, markets: Dict[str, Any]) -> None:
+        file = self._snapshot_file(exchange)
+        if file is None:
+            return
+        try:
+            file.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so that other processes never read a partially written file.
+            tmp = file.parent / f"{file.name}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"fetched_at": fetched_at, "markets": markets}, f)
+            os.replace(tmp, file)
+        except Exception as e:
+            logger.warning(f"Failed to write the market cache of {exchange}: {str(e)}")
+
+    def _is_fresh(self, entry: Optional[Tuple[float, Dict[str, Any]]]) -> bool:
+        return entry is not None and 0 <= time.time() - entry[0] < self.ttl
+
+    def _lookup(self, exchange: str, refresh: bool) -> Optional[Dict[str, Any]]:
+        # Return the fresh markets of the exchange and count the hit or the miss.
+        if not refresh:
+            entry = self._entries.get(exchange)
+            if not self._is_fresh(entry):
+                entry = self._read_snapshot(exchange) if self.ttl > 0 else None
+            if entry is not None and self._is_fresh(entry):
+                self._entries[exchange] = entry
+                with self._lock:
+                    self.hits += 1
+                return entry[1]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store(self, exchange: str, markets: Dict[str, Any]) -> None:
+        fetched_at = time.time()
+        if self.ttl > 0:
+            self._entries[exchange] = (fetched_at, markets)
+            self._write_snapshot(exchange, fetched_at, markets)
+
+    def get(self, exchange: str, load: Callable[[], Dict[str, Any]], refresh: bool = False) -> Dict[str, Any]:
+        """
+        Return the cached markets of `exchange`, or the markets returned by `load` if they are missing or expired.
+        If `refresh` is True, the markets are loaded regardless of the cache.
+        """
+        with self._lock_of(exchange):
+            markets = self._lookup(exchange, refresh)
+            if markets is None:
+                markets = load()
+                self._store(exchange, markets)
+            return markets
+
+    async def get_async(
+        self, exchange: str, load: Callable[[], Awaitable[Dict[str, Any]]], refresh: bool = False
+    ) -> Dict[str, Any]:
+        """
+        The same as `get` except that the markets are loaded by awaiting `load`.
+        The coroutines waiting for the refresh of the same exchange use its result.
+        """
+        if exchange not in self._async_locks:
+            self._async_locks[exchange] = asyncio.Lock()
+        async with self._async_locks[exchange]:
+            markets = self._lookup(exchange, refresh)
+            if markets is None:
+                markets = await load()
+                self._store(exchange, markets)
+            return markets
+
+    def peek(self, exchange: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the markets of `exchange` in the cache or its snapshot even if they are expired, or None if there are
+        none. Nothing is fetched, and the hits and the misses are not counted.
+        """
+        entry = self._entries.get(exchange) or self._read_snapshot(exchange)
+        return None if entry is None else entry[1]
+
+    def invalidate(self, exchange: Optional[str] = None) -> None:
+        """
+        Discard the cached markets of `exchange`, or of all the exchanges if it is None.
+        """
+        exchanges = list(self._entries) if exchange is None else [exchange]
+        if exchange is None and self.directory is not None and self.directory.exists():
+            exchanges += [f.stem for f in self.directory.glob("*.json")]
+        for e in set(exchanges):
+            self._entries.pop(e, None)
+            file = self._snapshot_file(e)
+            if file is not None and file.exists():
+                file.unlink()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(hits=self.hits, misses=self.misses, entries=len(self._entries))
+
+
+market_cache = MarketCache()
+
+
+class TickerCache:
+    """
+    A short-lived cache of the tickers of exchanges, which coalesces the requests for the same ticker.
+
+    A ticker is reused for `max_age` seconds after it is received, so the prices of orders are never older than
+    that. While a ticker is being fetched, the other callers wait for the same response instead of sending their own
+    requests. If the exchange can fetch several tickers at once, the tickers requested within `window` seconds of the
+    first one are fetched in one request. If `max_age` is 0, the tickers are only shared by the waiting callers.
+    """
+
+    def __init__(
+        self, max_age: float = DORU_TICKER_MAX_AGE / 1000, window: float = DORU_TICKER_BATCH_WINDOW / 1000
+    ) -> None:
+        self.max_age = max_age
+        self.window = window
+        self.hits = 0
+        self.coalesced = 0
+        self.requests = 0
+        # (exchange, symbol) -> (the monotonic time at which the ticker is received, the ticker)
+        self._entries: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        # (exchange, symbol, asynchronous) -> the future of the ticker being fetched or waiting for a batch
+        self._pending: Dict[Tuple[str, str, bool], Any] = {}
+        # (exchange, asynchronous) -> the symbols of the batch that has not been sent yet
+        self._batches: Dict[Tuple[str, bool], List[str]] = {}
+        self._lock = Lock()
+
+    def _claim(
+        self, exchange: str, symbol: str, batched: bool, new_future: Callable[[], Any], asynchronous: bool
+    ) -> Tuple[Optional[Dict[str, Any]], Any, Optional[List[str]]]:
+        # Return the fresh ticker if any. Otherwise return the future of the ticker, and also the batch of symbols
+        # if the caller is the one that should fetch them.
+        with self._lock:
+            entry = self._entries.get((exchange, symbol))
+            if entry is not None and time.monotonic() - entry[0] <= self.max_age:
+                self.hits += 1
+                return entry[1], None, None
+            key = (exchange, symbol, asynchronous)
+            if key in self._pending:
+                self.coalesced += 1
+                return None, self._pending[key], None
+            future = self._pending[key] = new_future()
+            if not batched:
+                return None, future, [symbol]
+            batch = self._batches.get((exchange, asynchronous))
+            if batch is not None:
+                batch.append(symbol)
+                return None, future, None
+            batch = self._batches[(exchange, asynchronous)] = [symbol]
+            return None, future, batch
+
+    def _close_batch(self, exchange: str, asynchronous: bool) -> None:
+        with self._lock:
+            self._batches.pop((exchange, asynchronous), None)
+
+    def _count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def _resolve(
+        self,
+        exchange: str,
+        batch: List[str],
+        results: Dict[str, Union[Dict[str, Any], Exception]],
+        asynchronous: bool,
+    ) -> None:
+        now = time.monotonic()
+        with self._lock:
+            futures = [(symbol, self._pending.pop((exchange, symbol, asynchronous))) for symbol in batch]
+            for symbol, result in results.items():
+                if not isinstance(result, Exception) and self.max_age > 0:
+                    self._entries[(exchange, symbol)] = (now, result)
+        for symbol, future in futures:
+            result = results.get(symbol, Exception(f"The ticker of {symbol} was not fetched."))
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def get(
+        self,
+        exchange: str,
+        symbol: str,
+        fetch_one: Callable[[str], Dict[str, Any]],
+        fetch_many: Optional[Callable[[List[str]], Dict[str, Dict[str, Any]]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Return the ticker of `symbol` on `exchange`, which is fetched by `fetch_one` unless a fresh one is cached.
+        If `fetch_many` is given, it is used to fetch the tickers requested during the batch window together.
+        """
+        batched = fetch_many is not None and self.window > 0
+        ticker, future, batch = self._claim(exchange, symbol, batched, Future, False)
+        if ticker is not None:
+            return ticker
+        if batch is not None:
+            results: Dict[str, Union[Dict[str, Any], Exception]] = {}
+            try:
+                if batched:
+                    time.sleep(self.window)
+                    self._close_batch(exchange, False)
+                if len(batch) > 1 and fetch_many is not None:
+                    self._count_request()
+                    results.update(fetch_many(list(batch)))
+                for s in batch:
+                    # Some exchanges do not return all the tickers requested.
+                    if s not in results:
+                        try:
+                            self._count_request()
+                            results[s] = fetch_one(s)
+                        except Exception as e:
+                            results[s] = e
+            except Exception as e:
+                results = {s: e for s in batch}
+            finally:
+                self._resolve(exchange, batch, results, False)
+        result: Dict[str, Any] = future.result()
+        return result
+
+    async def get_async(
+        self,
+        exchange: str,
+        symbol: str,
+        fetch_one: Callable[[str], Awaitable[Dict[str, Any]]],
+        fetch_many: Optional[Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        The same as `get` except that the tickers are fetched by awaiting `fetch_one` and `fetch_many`.
+        """
+        batched = fetch_many is not None and self.window > 0
+        loop = asyncio.get_running_loop()
+        ticker, future, batch = self._claim(exchange, symbol, batched, loop.create_future, True)
+        if ticker is not None:
+            return ticker
+        if batch is not None:
+            results: Dict[str, Union[Dict[str, Any], Exception]] = {}
+            try:
+                if batched:
+                    await asyncio.sleep(self.window)
+                    self._close_batch(exchange, True)
+                if len(batch) > 1 and fetch_many is not None:
+                    self._count_request()
+                    results.update(await fetch_many(list(batch)))
+                for s in batch:
+                    if s not in results:
+                        try:
+                            self._count_request()
+                            results[s] = await fetch_one(s)
+                        except Exception as e:
+                            results[s] = e
+            except Exception as e:
+                results = {s: e for s in batch}
+            finally:
+                self._resolve(exchange, batch, results, True)
+        result: Dict[str, Any] = await future
+        return result
+
+    def stats(self) -> TickerStats:
+        with self._lock:
+            return TickerStats(hits=self.hits, coalesced=self.coalesced, requests=self.requests)
+
+
+ticker_cache = TickerCache()
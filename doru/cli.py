@@ -1,8 +1,9 @@
 import asyncio
 import json
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
+import ccxt
 import click
 from requests import HTTPError, RequestException
 from tabulate import tabulate
@@ -10,12 +11,20 @@ from typing_extensions import get_args
 
 from doru.api.client import create_client
 from doru.api.daemonize import run
-from doru.api.schema import is_valid_exchange_name, is_valid_symbol
+from doru.api.schema import (
+    invalid_symbol_message,
+    is_valid_exchange_name,
+    is_valid_symbol,
+)
+from doru.exchange import cached_symbol_index, get_exchange
+from doru.simulator import SIMULATED_EXCHANGE
+from doru.symbols import normalize
 from doru.type import Cycle, Weekday
 
 ENABLE_CYCLES = get_args(Cycle)
 WEEKDAY = get_args(Weekday)
 HEADER = ["ID", "Symbol", "Amount", "Cycle", "Next Invest Date", "Exchange", "Status"]
+UPCOMING_HEADER = ["Invest Date", "ID", "Symbol", "Amount", "Exchange"]
 
 
 def validate_exchange(ctx, param, value):
@@ -26,25 +35,55 @@ def validate_exchange(ctx, param, value):
     return value
 
 
+def validate_symbol(exchange: str, symbol: str) -> None:
+    # The daemon validates the symbol with the markets in its cache,
+    # and the markets are fetched here only if the daemon is not running.
+    try:
+        result = create_client().validate_symbol(exchange, symbol)
+    except HTTPError as e:
+        raise ValueError(json.loads(e.response.content).get("detail"))
+    except RequestException:
+        is_valid_symbol(exchange, symbol)
+        return
+    if not result.valid:
+        raise ValueError(invalid_symbol_message(exchange, symbol, result.suggestions))
+
+
 def validate_exchange_symbol(ctx: click.Context, param: click.Option, value):
+    # Shell completion parses the options as well, where the symbol should not be fetched.
+    if ctx.resilient_parsing:
+        return value
     try:
         if param.name == "exchange":
             is_valid_exchange_name(value)
             # If symbol is specified before exchange,
             # validate symbol here because symbol is not checked.
             if "symbol" in ctx.params.keys():
-                is_valid_symbol(value, ctx.params["symbol"])
+                validate_symbol(value, ctx.params["symbol"])
         elif param.name == "symbol":
             # If symbol is specified before exchange,
             # symbol will be validated during the exchange validation
             if "exchange" not in ctx.params.keys():
                 return value
-            is_valid_symbol(ctx.params["exchange"], value)
+            validate_symbol(ctx.params["exchange"], value)
     except Exception as e:
         raise click.ClickException(str(e))
     return value
 
 
+def complete_exchange(ctx: click.Context, param: click.Parameter, incomplete: str) -> List[str]:
+    return [e for e in ccxt.exchanges + [SIMULATED_EXCHANGE] if e.startswith(incomplete.lower())]
+
+
+def complete_symbol(ctx: click.Context, param: click.Parameter, incomplete: str) -> List[str]:
+    # Only the markets in the cache are used, so that the completion never waits for the exchange.
+    index = cached_symbol_index(ctx.params["exchange"]) if ctx.params.get("exchange") else None
+    if index is None:
+        return []
+    key = normalize(incomplete)
+    return [s for s in index.filter() if normalize(s).startswith(key)]
+
+
 # TODO: wrap with ClickException
 def validate_cred(ctx, param, value):
     if len(value) == 0:
@@ -85,6 +124,7 @@ def cli():
     type=str,
     prompt=True,
     callback=validate_exchange_symbol,
+    shell_complete=complete_exchange,
     help="Enter the exchange you will use.",
 )
 @click.option(
@@ -94,6 +134,7 @@ def cli():
     type=str,
     prompt=True,
     callback=validate_exchange_symbol,
+    shell_complete=complete_symbol,
     help="Enter the symbol you want to buy.",
 )
 @click.option(
@@ -282,6 +323,47 @@ def list():
     )
 
 
+@cli.command(help="Display upcoming investments of running tasks.")
+@click.option(
+    "--horizon",
+    "-H",
+    type=click.IntRange(min=1, max=366),
+    default=7,
+    show_default=True,
+    help="Enter the number of days to look ahead.",
+)
+def upcoming(horizon: int):
+    client = create_client()
+    try:
+        runs = client.get_upcoming_runs(horizon)
+    except HTTPError as e:
+        raise_with_response_message(e)
+    except Exception as e:
+        raise click.ClickException(str(e))
+    click.echo(
+        tabulate(
+            [(r.run_at, r.id, r.symbol, r.amount, r.exchange) for r in runs],
+            headers=UPCOMING_HEADER,
+            tablefmt="simple",
+            numalign="right",
+        )
+    )
+
+
+@cli.command(help="Display the spot symbols supported on the exchange.")
+@click.argument("exchange", callback=validate_exchange, shell_complete=complete_exchange)
+@click.option("--base", "-b", type=str, help="Enter the base currency of the symbols, e.g. BTC.")
+@click.option("--quote", "-q", type=str, help="Enter the quote currency of the symbols, e.g. USDT.")
+@click.option("--refresh", is_flag=True, help="Insert this option if you want to fetch the latest markets.")
+def symbols(exchange: str, base: Optional[str], quote: Optional[str], refresh: bool):
+    try:
+        index = get_exchange(exchange).symbol_index(refresh=refresh)
+    except Exception as e:
+        raise click.ClickException(str(e))
+    for symbol in index.filter(base=base, quote=quote):
+        click.echo(symbol)
+
+
 @cli.group(help="Add or remove credentials for the exchanges.")
 def cred():
     pass
@@ -1,11 +1,99 @@
 import os
+from typing import Dict, Tuple
 
 DORU_SOCK_NAME = os.environ.get("DORU_SOCK_NAME", "~/.doru/run/doru.sock")
 DORU_PID_FILE = os.environ.get("DORU_PID_FILE", "~/.doru/run/doru.pid")
 DORU_CREDENTIAL_FILE = os.environ.get("DORU_CREDENTIAL_FILE", "~/.doru/credential.json")
-DORU_TASK_FILE = os.environ.get("DORU_TASK_FILE", "~/.doru/task.json")
+DORU_TASK_FILE = os.environ.get("DORU_TASK_FILE", "~/.doru/task.db")
 DORU_LOG_FILE = os.environ.get("DORU_LOG_FILE", "~/.doru/log/doru.log")
+DORU_CACHE_DIR = os.environ.get("DORU_CACHE_DIR", "~/.doru/cache")
+DORU_HISTORY_FILE = os.environ.get("DORU_HISTORY_FILE", "~/.doru/history.jsonl")
+# the configuration of the simulated exchange (see doru.simulator)
+DORU_SIMULATOR = os.environ.get("DORU_SIMULATOR", "")
 try:
     DORU_TASK_LIMIT = int(os.environ["DORU_TASK_LIMIT"])
 except (KeyError, ValueError):
     DORU_TASK_LIMIT = 50
+try:
+    DORU_WORKER_LIMIT = int(os.environ["DORU_WORKER_LIMIT"])
+except (KeyError, ValueError):
+    DORU_WORKER_LIMIT = 16
+try:
+    DORU_EXCHANGE_CONCURRENCY = int(os.environ["DORU_EXCHANGE_CONCURRENCY"])
+except (KeyError, ValueError):
+    DORU_EXCHANGE_CONCURRENCY = 4
+DORU_CATCHUP_POLICY = os.environ.get("DORU_CATCHUP_POLICY", "skip")
+if DORU_CATCHUP_POLICY not in ("skip", "once", "all"):
+    DORU_CATCHUP_POLICY = "skip"
+try:
+    DORU_CATCHUP_INTERVAL = float(os.environ["DORU_CATCHUP_INTERVAL"])
+except (KeyError, ValueError):
+    DORU_CATCHUP_INTERVAL = 1.0
+try:
+    DORU_SPREAD_WINDOW = float(os.environ["DORU_SPREAD_WINDOW"])
+except (KeyError, ValueError):
+    DORU_SPREAD_WINDOW = 0.0
+if not 0 <= DORU_SPREAD_WINDOW <= 3600:
+    DORU_SPREAD_WINDOW = 0.0
+try:
+    DORU_SHARDS = int(os.environ["DORU_SHARDS"])
+except (KeyError, ValueError):
+    DORU_SHARDS = 0
+# the number of the latest timing spans of orders kept in memory
+try:
+    DORU_SPAN_BUFFER_SIZE = int(os.environ["DORU_SPAN_BUFFER_SIZE"])
+except (KeyError, ValueError):
+    DORU_SPAN_BUFFER_SIZE = 10000
+if DORU_SPAN_BUFFER_SIZE < 0:
+    DORU_SPAN_BUFFER_SIZE = 10000
+try:
+    DORU_AGGREGATION_WINDOW = float(os.environ["DORU_AGGREGATION_WINDOW"])
+except (KeyError, ValueError):
+    DORU_AGGREGATION_WINDOW = 0.0
+if not 0 <= DORU_AGGREGATION_WINDOW <= 60:
+    DORU_AGGREGATION_WINDOW = 0.0
+DORU_SCHEDULER_BACKEND = os.environ.get("DORU_SCHEDULER_BACKEND", "heap")
+if DORU_SCHEDULER_BACKEND not in ("heap", "wheel", "async"):
+    DORU_SCHEDULER_BACKEND = "heap"
+try:
+    DORU_MARKET_CACHE_TTL = float(os.environ["DORU_MARKET_CACHE_TTL"])
+except (KeyError, ValueError):
+    DORU_MARKET_CACHE_TTL = 3600.0
+if DORU_MARKET_CACHE_TTL < 0:
+    DORU_MARKET_CACHE_TTL = 3600.0
+# the maximum age in milliseconds of the tickers used for the prices of orders
+try:
+    DORU_TICKER_MAX_AGE = float(os.environ["DORU_TICKER_MAX_AGE"])
+except (KeyError, ValueError):
+    DORU_TICKER_MAX_AGE = 1000.0
+if DORU_TICKER_MAX_AGE < 0:
+    DORU_TICKER_MAX_AGE = 1000.0
+# the window in milliseconds in which the tickers requested on the same exchange are fetched together
+try:
+    DORU_TICKER_BATCH_WINDOW = float(os.environ["DORU_TICKER_BATCH_WINDOW"])
+except (KeyError, ValueError):
+    DORU_TICKER_BATCH_WINDOW = 50.0
+if not 0 <= DORU_TICKER_BATCH_WINDOW <= 1000:
+    DORU_TICKER_BATCH_WINDOW = 50.0
+
+
+def _parse_poll_schedule(value: str) -> Tuple[float, float, float]:
+    initial, factor, maximum = (float(v) for v in value.split(","))
+    if initial <= 0 or factor < 1 or maximum < initial:
+        raise ValueError(f"Invalid poll schedule: {value}")
+    return initial, factor, maximum
+
+
+# the initial interval, the backoff factor and the maximum interval in seconds at which orders are checked
+try:
+    DORU_POLL_SCHEDULE = _parse_poll_schedule(os.environ["DORU_POLL_SCHEDULE"])
+except (KeyError, ValueError):
+    DORU_POLL_SCHEDULE = (2.0, 2.0, 60.0)
+# the poll schedules of exchanges given by DORU_POLL_SCHEDULE_<EXCHANGE> (e.g. DORU_POLL_SCHEDULE_BINANCE)
+DORU_POLL_SCHEDULES: Dict[str, Tuple[float, float, float]] = {}
+for _name, _value in os.environ.items():
+    if _name.startswith("DORU_POLL_SCHEDULE_"):
+        try:
+            DORU_POLL_SCHEDULES[_name.split("DORU_POLL_SCHEDULE_", 1)[1].lower()] = _parse_poll_schedule(_value)
+        except ValueError:
+            pass
@@ -1,14 +1,31 @@
+import asyncio
 import datetime
+import hashlib
+import json
 import logging
+import os
 import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from enum import Enum
-from typing import Any, Dict, List, Optional, Union
+from functools import partial
+from pathlib import Path
+from threading import Condition, Lock, Thread
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple, Union, cast
 
 import ccxt
+import ccxt.async_support
 from retry import retry
 from typing_extensions import TypedDict
 
-from doru.manager.credential_manager import create_credential_manager
+from doru.cache import market_cache, ticker_cache
+from doru.envs import DORU_CREDENTIAL_FILE, DORU_POLL_SCHEDULE, DORU_POLL_SCHEDULES
+from doru.limiter import AsyncThrottle, Throttle, rate_limiter_of
+from doru.manager.credential_manager import CredentialManager, create_credential_manager
+from doru.simulator import SIMULATED_EXCHANGE, async_simulated, simulated
+from doru.symbols import SymbolIndex, index_of
+from doru.tracing import recorder
 
 logger = logging.getLogger(__name__)
 
@@ -36,27 +53,257 @@ class OrderStatus(Enum):
     REJECTED = "rejected"
 
 
-class Exchange:
+FAILED_STATUSES = (OrderStatus.CANCELED.value, OrderStatus.EXPIRED.value, OrderStatus.REJECTED.value)
+
+
+class PollSchedule(NamedTuple):
+    """
+    The intervals at which the status of an order is fetched: `initial` seconds after the order is placed,
+    and then at intervals multiplied by `factor` up to `max` seconds.
+    """
+
+    initial: float
+    factor: float
+    max: float
+
+    @classmethod
+    def fixed(cls, interval: float) -> "PollSchedule":
+        return cls(interval, 1, interval)
+
+    def next_delay(self, delay: Optional[float] = None) -> float:
+        return self.initial if delay is None else min(delay * self.factor, self.max)
+
+
+def poll_schedule_of(exchange: str) -> PollSchedule:
+    return PollSchedule(*DORU_POLL_SCHEDULES.get(exchange, DORU_POLL_SCHEDULE))
+
+
+class FillStats(TypedDict):
+    exchange: str
+    fills: int
+    mean_seconds: float
+    p50_seconds: float
+    p90_seconds: float
+    max_seconds: float
+
+
+class TrackedOrder:
+    """
+    An order whose status is refreshed by `OrderTracker` until it is finished.
+    """
+
+    __slots__ = ("order_id", "symbol", "schedule", "since", "delay", "next_poll", "future", "result")
+
+    def __init__(self, order_id: str, symbol: str, schedule: PollSchedule) -> None:
+        self.order_id = order_id
+        self.symbol = symbol
+        self.schedule = schedule
+        self.since = time.time()
+        self.delay = schedule.next_delay()
+        self.next_poll = time.monotonic() + self.delay
+        self.future: "Future[Dict[str, Any]]" = Future()
+        # the last fetched order
+        self.result: Optional[Dict[str, Any]] = None
+
+    def backoff(self) -> None:
+        self.delay = self.schedule.next_delay(self.delay)
+        self.next_poll = time.monotonic() + self.delay
+
+
+class OrderTracker:
+    """
+    An implementation of a class that waits for the orders on an exchange to finish.
+
+    The orders due for a refresh are fetched together in one thread, by symbol with `fetch_orders` or
+    `fetch_open_orders` if the exchange supports them, and the waiters are notified through futures. So the number
+    of requests per poll depends on the number of symbols rather than the number of orders. The orders missing
+    from the results (e.g. the orders closed when only the open orders can be fetched) are fetched one by one.
+
+    Each order is first fetched shortly after it is tracked, and then less and less often according to its
+    `PollSchedule`, since limit orders at the bid price are often filled within seconds. The times to fill
+    of the last `max_fills` filled orders are kept to tune the schedule.
+    """
+
+    # the number of seconds for which the thread waits for new orders before it exits
+    max_idle_seconds = 60
+    max_fills = 1000
+
+    def __init__(
+        self,
+        exchange: ccxt.Exchange,
+        schedule: PollSchedule = PollSchedule(*DORU_POLL_SCHEDULE),
+    ) -> None:
+        self.exchange = exchange
+        self.schedule = schedule
+        self.orders: Dict[str, TrackedOrder] = {}
+        self.fill_seconds: Deque[float] = deque(maxlen=self.max_fills)
+        self._condition = Condition()
+        self._thread: Optional[Thread] = None
+
+    def track(self, order_id: str, symbol: str, schedule: Optional[PollSchedule] = None) -> "Future[Dict[str, Any]]":
+        """
+        Start refreshing the order, and return the future of the finished order.
+        """
+        with self._condition:
+            order = self.orders.get(order_id)
+            if order is None:
+                order = self.orders[order_id] = TrackedOrder(order_id, symbol, schedule or self.schedule)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+            return order.future
+
+    def untrack(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Stop refreshing the order and return its last fetched status.
+        """
+        with self._condition:
+            order = self.orders.pop(order_id, None)
+            self._condition.notify_all()
+        return None if order is None else order.result
+
+    def wait(
+        self,
+        order_id: str,
+        symbol: str,
+        wait_for: datetime.timedelta,
+        schedule: Optional[PollSchedule] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the order to finish up to `wait_for`, and return the finished order.
+        If the order does not finish in time, its last fetched status is returned.
+        """
+        future = self.track(order_id, symbol, schedule)
+        try:
+            return future.result(timeout=wait_for.total_seconds())
+        except FutureTimeoutError:
+            return self.untrack(order_id)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self.orders:
+                    self._condition.wait(self.max_idle_seconds)
+                    if not self.orders:
+                        self._thread = None
+                        return
+                    continue
+                now = time.monotonic()
+                next_poll = min(o.next_poll for o in self.orders.values())
+                if next_poll > now:
+                    # Woken up early when orders are tracked or untracked
+                    self._condition.wait(next_poll - now)
+                    continue
+                due = [o for o in self.orders.values() if o.next_poll <= now]
+            self.poll(due)
+
+    def poll(self, orders: List[TrackedOrder]) -> None:
+        by_symbol: Dict[str, List[TrackedOrder]] = {}
+        for o in orders:
+            by_symbol.setdefault(o.symbol, []).append(o)
+        for symbol, symbol_orders in by_symbol.items():
+            results = self._fetch(symbol, symbol_orders)
+            with self._condition:
+                for o in symbol_orders:
+                    o.backoff()
+                # The results may include the orders that are not due yet.
+                for order_id, result in results.items():
+                    tracked = self.orders.get(order_id)
+                    if tracked is None:
+                        continue
+                    tracked.result = result
+                    if result.get("status") not in (OrderStatus.OPEN.value, None):
+                        self.orders.pop(order_id)
+                        self._record_fill(tracked, result)
+                        tracked.future.set_result(result)
+
+    def _record_fill(self, order: TrackedOrder, result: Dict[str, Any]) -> None:
+        if result.get("status") != OrderStatus.CLOSED.value:
+            return
+        # Prefer the times reported by the exchange to the time at which the fill is found.
+        if result.get("timestamp") and result.get("lastTradeTimestamp"):
+            seconds = (result["lastTradeTimestamp"] - result["timestamp"]) / 1000
+        else:
+            seconds = time.time() - order.since
+        self.fill_seconds.append(max(seconds, 0))
+
+    def stats(self, exchange: str) -> FillStats:
+        """
+        Return the statistics of the times to fill of the recently filled orders.
+        """
+        seconds = sorted(self.fill_seconds)
+        if not seconds:
+            return FillStats(exchange=exchange, fills=0, mean_seconds=0, p50_seconds=0, p90_seconds=0, max_seconds=0)
+        return FillStats(
+            exchange=exchange,
+            fills=len(seconds),
+            mean_seconds=sum(seconds) / len(seconds),
+            p50_seconds=seconds[len(seconds) * 50 // 100],
+            p90_seconds=seconds[len(seconds) * 90 // 100],
+            max_seconds=seconds[-1],
+        )
+
+    def _request(self, method: str, *args: Any) -> Any:
+        return getattr(self.exchange, method)(*args)
+
+    def _fetch(self, symbol: str, orders: List[TrackedOrder]) -> Dict[str, Dict[str, Any]]:
+        results: Dict[str, Dict[str, Any]] = {}
+        try:
+            if self.exchange.has.get("fetchOrders"):
+                # The orders are placed a little before they are tracked.
+                since = int((min(o.since for o in orders) - 60) * 1000)
+                results = {r["id"]: r for r in self._request("fetch_orders", symbol, since)}
+            elif self.exchange.has.get("fetchOpenOrders"):
+                results = {r["id"]: r for r in self._request("fetch_open_orders", symbol)}
+        except Exception as e:
+            logger.error(f"Failed to fetch orders: {e}")
+        for o in orders:
+            if o.order_id in results:
+                continue
+            try:
+                results[o.order_id] = self._request("fetch_order", o.order_id, symbol)
+            except Exception as e:
+                # Ignore errors because we want to continue processing even when order rtrieval may
+                # fail for unforeseen reasons
+                logger.error(f"Failed to fecth order: {e}")
+        return results
+
+
+class BaseExchange:
+    """
+    The part of the exchange clients that does not depend on whether the requests are synchronous.
+    """
+
     _markets: Optional[Dict[str, Market]] = None
+    # the module from which the ccxt class of the exchange is taken
+    _ccxt: Any = ccxt
+    _simulated: Any = simulated
+    _throttle: Any = Throttle
 
-    def __init__(self, exchange: str) -> None:
-        credential = self._read_credential(exchange)
+    def __init__(self, exchange: str, credential: Optional[Dict[str, str]] = None) -> None:
+        if credential is None:
+            credential = self._read_credential(exchange)
         if not credential:
             logger.warning(f"Credential not found for {exchange}")
+        self.name = exchange
         self.exchange = self._get_exchange_instance(exchange, credential)
+        # The requests are throttled by the bucket shared with the other clients using the same API key
+        # instead of the throttling of each ccxt instance, at the costs of the endpoints defined by ccxt.
+        self.limiter = rate_limiter_of(exchange, credential.get("apiKey", ""), self.exchange.rateLimit)
+        self.exchange.throttle = self._throttle(self.limiter)
 
     @staticmethod
     def _read_credential(exchange: str) -> Dict[str, str]:
-        manager = create_credential_manager()
-        credential = manager.get_credential(exchange)
-        return {"apiKey": credential.key, "secret": credential.secret} if credential is not None else {}
+        return registry.read_credential(exchange)
 
-    @staticmethod
-    def _get_exchange_instance(name: str, config: Dict[str, str]) -> ccxt.Exchange:
-        exchange_class = getattr(ccxt, name, None)
+    @classmethod
+    def _get_exchange_instance(cls, name: str, config: Dict[str, str]) -> ccxt.Exchange:
+        exchange_class = cls._simulated if name == SIMULATED_EXCHANGE else getattr(cls._ccxt, name, None)
         if exchange_class is None or not issubclass(exchange_class, ccxt.Exchange):
             raise ValueError(f"{name} is not supported.")
-        return exchange_class(config)
+        options: Dict[str, Any] = {**config, "enableRateLimit": True}
+        return exchange_class(options)
 
     def _calc_amount(self, amount: float, precision: Optional[Union[int, float]]) -> float:
         # If precision is None, the calculation is performed with two significant digits.
@@ -68,12 +315,8 @@ class Exchange:
         decimal = ccxt.decimal_to_precision(amount, precision=precision, counting_mode=counting_mode)
         return float(decimal)
 
-    def _load_spot_markets(self) -> None:
-        try:
-            markets = self.exchange.fetch_markets()
-        except Exception as e:
-            logger.error(f"Failed to fetch markets: {e}")
-            raise
+    @staticmethod
+    def _parse_spot_markets(markets: List[Dict[str, Any]]) -> Dict[str, Market]:
         markets_dict: Dict[str, Market] = {}
         for m in markets:
             if m["type"] == "spot" and m["active"]:
@@ -81,12 +324,70 @@ class Exchange:
                     "symbol": m["symbol"],
                     "precision": {"amount": m["precision"]["amount"]},
                 }
-        self._markets = markets_dict
+        return markets_dict
 
-    def _fetch_ticker(self, symbol: str) -> Ticker:
-        raw_ticker: Dict[str, Any] = self.exchange.fetch_ticker(symbol)
+    @staticmethod
+    def _parse_ticker(raw_ticker: Dict[str, Any]) -> Ticker:
         return {"symbol": raw_ticker["symbol"], "bid": raw_ticker["bid"], "last": raw_ticker["last"]}
 
+    def _amount_of(self, ticker: Ticker, quote_amount: float, symbol: str) -> Tuple[float, float]:
+        """
+        Return the amount and the price of a buy order worth `quote_amount` at the bid price of `ticker`.
+        """
+        bid = ticker["bid"] or ticker["last"]  # because sometimes bid is None
+        if self._markets is None:
+            raise Exception("Failed to load markets.")
+        return self._calc_amount(quote_amount / bid, self._markets[symbol]["precision"]["amount"]), bid
+
+    @staticmethod
+    def _is_order_finished(result: Dict[str, Any]) -> bool:
+        if result["status"] == OrderStatus.CLOSED.value:
+            logger.info(f"Completed order: {result}")
+            return True
+        elif result["status"] in FAILED_STATUSES:
+            logger.error(f"The order is no longer valid: {result}")
+            return True
+        return False
+
+    @staticmethod
+    def _order_status(result: Optional[Dict[str, Any]]) -> Optional[str]:
+        if result is None:
+            logger.error("The order status is unknown")
+            return None
+        if result["status"] == OrderStatus.OPEN.value:
+            logger.error(f"The order was not completed: {result}")
+        return result["status"]
+
+
+class Exchange(BaseExchange):
+    def __init__(self, exchange: str, credential: Optional[Dict[str, str]] = None) -> None:
+        super().__init__(exchange, credential)
+        # The orders are tracked together for each client, which is shared through the registry.
+        self.tracker = OrderTracker(self.exchange, poll_schedule_of(exchange))
+
+    def _request(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        return getattr(self.exchange, method)(*args, **kwargs)
+
+    def _fetch_spot_markets(self) -> Dict[str, Market]:
+        try:
+            markets = self._request("fetch_markets")
+        except Exception as e:
+            logger.error(f"Failed to fetch markets: {e}")
+            raise
+        return self._parse_spot_markets(markets)
+
+    def _load_spot_markets(self, refresh: bool = False) -> None:
+        # The markets are shared with the other clients of the same exchange through the cache.
+        markets = market_cache.get(self.name, self._fetch_spot_markets, refresh=refresh)
+        self._markets = cast(Dict[str, Market], markets)
+
+    def _fetch_ticker(self, symbol: str) -> Ticker:
+        # The orders placed at the same time share the requests for the tickers.
+        fetch_many = partial(self._request, "fetch_tickers") if self.exchange.has.get("fetchTickers") else None
+        return self._parse_ticker(
+            ticker_cache.get(self.name, symbol, partial(self._request, "fetch_ticker"), fetch_many)
+        )
+
     def fetch_spot_symbols(self) -> List[str]:
         try:
             self._load_spot_markets()
@@ -95,15 +396,28 @@ class Exchange:
             raise
         return list(self._markets.keys()) if self._markets else []
 
+    def symbol_index(self, refresh: bool = False) -> SymbolIndex:
+        try:
+            self._load_spot_markets(refresh=refresh)
+        except Exception as e:
+            logger.error(f"Failed to fetch symbols: {e}")
+            raise
+        return index_of(self.name, self._markets or {})
+
     def create_order(self, symbol: str, quote_amount: float) -> str:
         try:
-            ticker = self._fetch_ticker(symbol)
-            bid = ticker["bid"] or ticker["last"]  # because sometimes bid is None
-            self._load_spot_markets()
-            if self._markets is None:
-                raise Exception("Failed to load markets.")
-            amount = self._calc_amount(quote_amount / bid, self._markets[symbol]["precision"]["amount"])
-            result = self.exchange.create_order(symbol=symbol, type="limit", side="buy", amount=amount, price=bid)
+            with recorder.span(self.name, "ticker", symbol):
+                ticker = self._fetch_ticker(symbol)
+            with recorder.span(self.name, "markets", symbol):
+                self._load_spot_markets()
+                if self._markets is not None and symbol not in self._markets:
+                    # The symbol may have been listed after the markets were cached.
+                    self._load_spot_markets(refresh=True)
+            amount, bid = self._amount_of(ticker, quote_amount, symbol)
+            with recorder.span(self.name, "create_order", symbol):
+                result = self._request(
+                    "create_order", symbol=symbol, type="limit", side="buy", amount=amount, price=bid
+                )
         except Exception as e:
             logger.error(f"Failed to create order: {e}")
             raise
@@ -111,60 +425,296 @@ class Exchange:
 
     def fetch_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
         try:
-            result = self.exchange.fetch_order(order_id, symbol)
+            result = self._request("fetch_order", order_id, symbol)
         except Exception as e:
             logger.error(f"Failed to fecth order: {e}")
             raise
         return result
 
+    def wait_order(
+        self,
+        order_id: str,
+        symbol: str,
+        wait_for: datetime.timedelta = datetime.timedelta(minutes=15),
+        tick: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the order to finish and return it, or None if it has never been fetched. The order is checked
+        according to the poll schedule of the exchange, or every `tick` seconds if it is given.
+        """
+        # The status is refreshed together with the other orders on the exchange.
+        schedule = None if tick is None else PollSchedule.fixed(tick)
+        with recorder.span(self.name, "fill_wait", symbol):
+            result = self.tracker.wait(order_id, symbol, wait_for, schedule)
+        if result is not None:
+            self._is_order_finished(result)
+        return result
+
     def wait_order_complete(
         self,
         order_id: str,
         symbol: str,
         wait_for: datetime.timedelta = datetime.timedelta(minutes=15),
-        tick: float = 60,
+        tick: Optional[float] = None,
     ) -> Optional[str]:
-        result: Optional[Dict[str, Any]] = None
-        start = datetime.datetime.now()
-        while True:
-            try:
-                result = self.fetch_order(order_id, symbol)
-            except Exception:
-                # Ignore errors because we want to continue processing even when order rtrieval may
-                # fail for unforeseen reasons
-                pass
-            else:
-                if result["status"] == OrderStatus.CLOSED.value:
-                    logger.info(f"Completed order: {result}")
-                    break
-                elif result["status"] in (
-                    OrderStatus.CANCELED.value,
-                    OrderStatus.EXPIRED.value,
-                    OrderStatus.REJECTED.value,
-                ):
-                    logger.error(f"The order is no longer valid: {result}")
-                    break
-            finally:
-                time.sleep(tick)
-
-            if datetime.datetime.now() - start > wait_for:
-                break
-
-        if result is None:
-            logger.error("The order status is unknown")
-            return None
-        if result["status"] == OrderStatus.OPEN.value:
-            logger.error(f"The order was not completed: {result}")
-        return result["status"]
+        """
+        Wait for the order to finish and return its status.
+        """
+        return self._order_status(self.wait_order(order_id, symbol, wait_for, tick))
 
     @retry(tries=5, delay=2)
     def cancel_order(self, order_id: str, symbol: str) -> None:
         try:
-            self.exchange.cancel_order(order_id, symbol)
+            with recorder.span(self.name, "cancel", symbol):
+                self._request("cancel_order", order_id, symbol)
         except Exception as e:
             logger.error(f"Failed to cancel order: {e}")
             raise
 
 
+class AsyncExchange(BaseExchange):
+    """
+    An asynchronous counterpart of `Exchange` built on the asyncio classes of ccxt, so that waiting for responses
+    and for orders to complete does not occupy threads.
+
+    The HTTP session is opened on the first request in the running event loop. It should be closed by `close`
+    in the same event loop, or by using the client as an async context manager.
+    """
+
+    _ccxt = ccxt.async_support
+    _simulated = async_simulated
+    _throttle = AsyncThrottle
+
+    async def __aenter__(self) -> "AsyncExchange":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.exchange.close()
+
+    async def _request(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        return await getattr(self.exchange, method)(*args, **kwargs)
+
+    async def _fetch_spot_markets(self) -> Dict[str, Market]:
+        try:
+            markets = await self._request("fetch_markets")
+        except Exception as e:
+            logger.error(f"Failed to fetch markets: {e}")
+            raise
+        return self._parse_spot_markets(markets)
+
+    async def _load_spot_markets(self, refresh: bool = False) -> None:
+        markets = await market_cache.get_async(self.name, self._fetch_spot_markets, refresh=refresh)
+        self._markets = cast(Dict[str, Market], markets)
+
+    async def _fetch_ticker(self, symbol: str) -> Ticker:
+        fetch_many = partial(self._request, "fetch_tickers") if self.exchange.has.get("fetchTickers") else None
+        ticker = await ticker_cache.get_async(self.name, symbol, partial(self._request, "fetch_ticker"), fetch_many)
+        return self._parse_ticker(ticker)
+
+    async def fetch_spot_symbols(self) -> List[str]:
+        try:
+            await self._load_spot_markets()
+        except Exception as e:
+            logger.error(f"Failed to fetch symbols: {e}")
+            raise
+        return list(self._markets.keys()) if self._markets else []
+
+    async def symbol_index(self, refresh: bool = False) -> SymbolIndex:
+        try:
+            await self._load_spot_markets(refresh=refresh)
+        except Exception as e:
+            logger.error(f"Failed to fetch symbols: {e}")
+            raise
+        return index_of(self.name, self._markets or {})
+
+    async def create_order(self, symbol: str, quote_amount: float) -> str:
+        try:
+            with recorder.span(self.name, "ticker", symbol):
+                ticker = await self._fetch_ticker(symbol)
+            with recorder.span(self.name, "markets", symbol):
+                await self._load_spot_markets()
+                if self._markets is not None and symbol not in self._markets:
+                    await self._load_spot_markets(refresh=True)
+            amount, bid = self._amount_of(ticker, quote_amount, symbol)
+            with recorder.span(self.name, "create_order", symbol):
+                result = await self._request(
+                    "create_order", symbol=symbol, type="limit", side="buy", amount=amount, price=bid
+                )
+        except Exception as e:
+            logger.error(f"Failed to create order: {e}")
+            raise
+        return result["id"]
+
+    async def fetch_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        try:
+            result: Dict[str, Any] = await self._request("fetch_order", order_id, symbol)
+        except Exception as e:
+            logger.error(f"Failed to fecth order: {e}")
+            raise
+        return result
+
+    async def wait_order_complete(
+        self,
+        order_id: str,
+        symbol: str,
+        wait_for: datetime.timedelta = datetime.timedelta(minutes=15),
+        tick: Optional[float] = None,
+    ) -> Optional[str]:
+        schedule = poll_schedule_of(self.name) if tick is None else PollSchedule.fixed(tick)
+        result: Optional[Dict[str, Any]] = None
+        start = datetime.datetime.now()
+        delay = schedule.next_delay()
+        with recorder.span(self.name, "fill_wait", symbol):
+            while True:
+                await asyncio.sleep(delay)
+                try:
+                    result = await self.fetch_order(order_id, symbol)
+                except Exception:
+                    pass
+                else:
+                    if self._is_order_finished(result):
+                        break
+
+                if datetime.datetime.now() - start > wait_for:
+                    break
+                delay = schedule.next_delay(delay)
+        return self._order_status(result)
+
+    async def cancel_order(self, order_id: str, symbol: str, tries: int = 5, delay: float = 2) -> None:
+        # The same retries as `Exchange.cancel_order`
+        for i in range(tries):
+            try:
+                with recorder.span(self.name, "cancel", symbol):
+                    await self._request("cancel_order", order_id, symbol)
+                return
+            except Exception as e:
+                logger.error(f"Failed to cancel order: {e}")
+                if i == tries - 1:
+                    raise
+            await asyncio.sleep(delay)
+
+
+class ExchangeRegistry:
+    """
+    A process-wide registry of exchange clients keyed by the exchange name and the credential.
+
+    The clients are reused across orders and validations, so the ccxt instances keep their HTTP sessions
+    (and their connection pools) alive. The credential file is read again only when it is modified,
+    and the client of an exchange is replaced when its credential changes.
+
+    The asynchronous clients are kept separately, and their sessions should be closed by `close_async`
+    in the event loop in which they are used.
+    """
+
+    clients: Dict[str, Tuple[str, Exchange]]
+    async_clients: Dict[str, Tuple[str, AsyncExchange]]
+
+    def __init__(self, file: str = DORU_CREDENTIAL_FILE) -> None:
+        self.file = Path(file).expanduser()
+        self.clients = {}
+        self.async_clients = {}
+        self._manager: Optional[CredentialManager] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._lock = Lock()
+        self._credential_lock = Lock()
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def read_credential(self, exchange: str) -> Dict[str, str]:
+        with self._credential_lock:
+            if self._manager is None or self._file_signature() != self._signature:
+                self._manager = create_credential_manager(str(self.file))
+                self._signature = self._file_signature()
+            credential = self._manager.get_credential(exchange)
+        return {"apiKey": credential.key, "secret": credential.secret} if credential is not None else {}
+
+    @staticmethod
+    def _fingerprint(credential: Dict[str, str]) -> str:
+        # The credential itself is not kept as a key.
+        return hashlib.sha256(json.dumps(credential, sort_keys=True).encode()).hexdigest()
+
+    def credential_fingerprint(self, name: str) -> str:
+        """
+        Return the hash of the credential currently used for the exchange, which identifies its account.
+        """
+        return self._fingerprint(self.read_credential(name))
+
+    def get(self, name: str) -> Exchange:
+        credential = self.read_credential(name)
+        fingerprint = self._fingerprint(credential)
+        with self._lock:
+            cached = self.clients.get(name)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+            if cached is not None:
+                logger.info(f"The credential for {name} has changed, so its client is recreated.")
+            client = Exchange(name, credential)
+            self.clients[name] = (fingerprint, client)
+            return client
+
+    async def get_async(self, name: str) -> AsyncExchange:
+        credential = self.read_credential(name)
+        fingerprint = self._fingerprint(credential)
+        with self._lock:
+            cached = self.async_clients.get(name)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+            client = AsyncExchange(name, credential)
+            self.async_clients[name] = (fingerprint, client)
+        if cached is not None:
+            logger.info(f"The credential for {name} has changed, so its client is recreated.")
+            await cached[1].close()
+        return client
+
+    def fill_stats(self) -> List[FillStats]:
+        with self._lock:
+            clients = [(name, client) for name, (_, client) in self.clients.items()]
+        return [client.tracker.stats(name) for name, client in sorted(clients)]
+
+    async def close_async(self) -> None:
+        with self._lock:
+            clients = [c for _, c in self.async_clients.values()]
+            self.async_clients = {}
+        for client in clients:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close the client of {client.name}: {str(e)}")
+
+    def clear(self) -> None:
+        """
+        Forget all the clients and the credentials. The sessions of the asynchronous clients are not closed.
+        """
+        with self._lock, self._credential_lock:
+            self.clients = {}
+            self.async_clients = {}
+            self._manager = None
+            self._signature = None
+
+
+registry = ExchangeRegistry()
+
+
 def get_exchange(name: str) -> Exchange:
-    return Exchange(name)
+    return registry.get(name)
+
+
+async def get_async_exchange(name: str) -> AsyncExchange:
+    return await registry.get_async(name)
+
+
+def cached_symbol_index(name: str) -> Optional[SymbolIndex]:
+    """
+    Return the index of the symbols of the exchange in the market cache even if they are expired, or None if they
+    have never been cached. Nothing is fetched from the exchange.
+    """
+    markets = market_cache.peek(name)
+    return None if markets is None else index_of(name, markets)
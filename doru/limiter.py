@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+import math
+import time
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    A token bucket that limits the rate of requests to `rate` per second with bursts of up to `capacity` requests.
+
+    Requests beyond the rate are not rejected but delayed, and they are served in the order in which they arrive
+    because each request reserves its token before waiting. The same bucket can be used from threads and from
+    coroutines at the same time.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1) -> None:
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("The rate and the capacity should be positive.")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def _reserve(self, cost: float) -> float:
+        # Take the tokens and return the number of seconds to wait until they are refilled.
+        if math.isinf(self.rate):
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= cost
+            return 0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, cost: float = 1) -> float:
+        """
+        Block until the request is allowed, and return the number of seconds waited.
+        """
+        wait = self._reserve(cost)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, cost: float = 1) -> float:
+        wait = self._reserve(cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class Throttle:
+    """
+    The `throttle` hook of a ccxt instance, which is called with the cost of each HTTP request defined by the
+    exchange (1 by default), so that every request of ccxt including its internal ones takes tokens from the bucket.
+    """
+
+    # ccxt sets the event loop of the asyncio instances on the hook.
+    loop: Any = None
+
+    def __init__(self, bucket: TokenBucket) -> None:
+        self.bucket = bucket
+
+    def __call__(self, cost: Optional[float] = None) -> float:
+        return self.bucket.acquire(1 if cost is None else cost)
+
+
+class AsyncThrottle:
+    """
+    The `throttle` hook of an instance of the asyncio classes of ccxt.
+    """
+
+    loop: Any = None
+
+    def __init__(self, bucket: TokenBucket) -> None:
+        self.bucket = bucket
+
+    async def __call__(self, cost: Optional[float] = None) -> float:
+        return await self.bucket.acquire_async(1 if cost is None else cost)
+
+
+_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+_lock = Lock()
+
+
+def rate_limiter_of(exchange: str, api_key: str, rate_limit: float) -> TokenBucket:
+    """
+    Return the token bucket shared by all the clients of `exchange` with `api_key` in this process.
+    `rate_limit` is the minimum interval between requests in milliseconds, as `rateLimit` of ccxt.
+    """
+    # The API key itself is not kept as a key.
+    key = (exchange, hashlib.sha256(api_key.encode()).hexdigest())
+    with _lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(1000 / rate_limit if rate_limit > 0 else math.inf)
+        return _buckets[key]
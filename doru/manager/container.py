@@ -1,6 +1,19 @@
 from dependency_injector import containers, providers
 
-from doru.envs import DORU_CREDENTIAL_FILE, DORU_TASK_FILE, DORU_TASK_LIMIT
+from doru.envs import (
+    DORU_AGGREGATION_WINDOW,
+    DORU_CATCHUP_INTERVAL,
+    DORU_CATCHUP_POLICY,
+    DORU_CREDENTIAL_FILE,
+    DORU_EXCHANGE_CONCURRENCY,
+    DORU_HISTORY_FILE,
+    DORU_SCHEDULER_BACKEND,
+    DORU_SHARDS,
+    DORU_SPREAD_WINDOW,
+    DORU_TASK_FILE,
+    DORU_TASK_LIMIT,
+    DORU_WORKER_LIMIT,
+)
 from doru.manager.credential_manager import CredentialManager
 from doru.manager.task_manager import TaskManager
 
@@ -11,5 +24,16 @@ class Container(containers.DeclarativeContainer):
         CredentialManager, file=DORU_CREDENTIAL_FILE
     )
     task_manager: providers.Singleton[TaskManager] = providers.Singleton(
-        TaskManager, file=DORU_TASK_FILE, max_running_tasks=DORU_TASK_LIMIT
+        TaskManager,
+        file=DORU_TASK_FILE,
+        max_running_tasks=DORU_TASK_LIMIT,
+        max_workers=DORU_WORKER_LIMIT,
+        max_orders_per_exchange=DORU_EXCHANGE_CONCURRENCY,
+        catch_up_policy=DORU_CATCHUP_POLICY,
+        catch_up_interval=DORU_CATCHUP_INTERVAL,
+        spread_window=DORU_SPREAD_WINDOW,
+        scheduler_backend=DORU_SCHEDULER_BACKEND,
+        shards=DORU_SHARDS,
+        aggregation_window=DORU_AGGREGATION_WINDOW,
+        history_file=DORU_HISTORY_FILE,
     )
@@ -0,0 +1,164 @@
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional
+
+from doru.manager.task_registry import TaskRecord
+
+logger = getLogger(__name__)
+
+COLUMNS = TaskRecord.__slots__
+
+
+class TaskStorage(ABC):
+    """
+    The persistent store of the tasks.
+    """
+
+    file: Path
+
+    @abstractmethod
+    def load(self) -> List[Dict[str, Any]]:
+        """
+        Return the stored tasks in the order in which they were added.
+        """
+        ...
+
+    @abstractmethod
+    def save(self, tasks: Mapping[str, TaskRecord], ids: Iterable[str]) -> None:
+        """
+        Store the tasks of `ids` changed in `tasks`. The tasks of `ids` missing from `tasks` are removed.
+        """
+        ...
+
+    def close(self) -> None:
+        """
+        Release the resources held by the store. The store should not be used after this method is called.
+        """
+
+
+class JsonTaskStorage(TaskStorage):
+    """
+    All the tasks in a JSON file, which is rewritten on every save whichever tasks are changed.
+    """
+
+    def __init__(self, file: Path) -> None:
+        self.file = file
+
+    def load(self) -> List[Dict[str, Any]]:
+        """
+        Raise FileNotFoundError if the file does not exist.
+        """
+        with open(self.file, "r") as f:
+            return list(json.load(f).values())
+
+    def save(self, tasks: Mapping[str, TaskRecord], ids: Iterable[str]) -> None:
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.file, "w") as f:
+            json.dump({k: v.dict(exclude_none=True) for (k, v) in tasks.items()}, f)
+
+
+class SqliteTaskStorage(TaskStorage):
+    """
+    The tasks in an SQLite database in WAL mode, where a save updates only the rows of the changed tasks
+    in one transaction, so that its cost does not depend on the number of the tasks.
+
+    When the database is created and `legacy_file` exists, the tasks in the JSON file are imported in the same
+    transaction, and the file is renamed to `<name>.migrated` so that it is not imported again.
+    """
+
+    def __init__(self, file: Path, legacy_file: Optional[Path] = None) -> None:
+        self.file = file
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        # The transactions are started explicitly, and the connection is shared by the threads under the lock.
+        self._conn = sqlite3.connect(str(file), isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._transaction():
+            exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks'"
+            ).fetchone()
+            if exists is None:
+                self._conn.execute(
+                    """
+                    CREATE TABLE tasks (
+                        id TEXT PRIMARY KEY,
+                        symbol TEXT NOT NULL,
+                        amount REAL NOT NULL,
+                        cycle TEXT NOT NULL,
+                        weekday TEXT,
+                        day INTEGER,
+                        time TEXT NOT NULL,
+                        exchange TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        next_run TEXT,
+                        last_run TEXT
+                    )
+                    """
+                )
+                if legacy_file is not None and legacy_file.exists():
+                    self._migrate(legacy_file)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _migrate(self, legacy_file: Path) -> None:
+        with open(legacy_file, "r") as f:
+            tasks = list(json.load(f).values())
+        for task in tasks:
+            self._insert({c: task.get(c) for c in COLUMNS})
+        migrated = legacy_file.with_name(f"{legacy_file.name}.migrated")
+        legacy_file.rename(migrated)
+        logger.warning(f"Migrated {len(tasks)} tasks from {legacy_file} to {self.file}, and renamed it to {migrated}.")
+
+    def _insert(self, values: Dict[str, Any]) -> None:
+        self._conn.execute(
+            f"INSERT INTO tasks ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            [values[c] for c in COLUMNS],
+        )
+
+    def load(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(COLUMNS)} FROM tasks ORDER BY rowid").fetchall()
+        return [{c: v for c, v in zip(COLUMNS, row) if v is not None} for row in rows]
+
+    def save(self, tasks: Mapping[str, TaskRecord], ids: Iterable[str]) -> None:
+        with self._lock, self._transaction():
+            for id in ids:
+                record = tasks.get(id)
+                if record is None:
+                    self._conn.execute("DELETE FROM tasks WHERE id = ?", (id,))
+                    continue
+                values = record.dict()
+                # An update keeps the rowid of the task, by which the tasks are loaded in order.
+                cursor = self._conn.execute(
+                    f"UPDATE tasks SET {', '.join(f'{c} = ?' for c in COLUMNS)} WHERE id = ?",
+                    [values[c] for c in COLUMNS] + [id],
+                )
+                if cursor.rowcount == 0:
+                    self._insert(values)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_task_storage(file: Path) -> TaskStorage:
+    """
+    Return the JSON storage if the file name ends with `.json`, or the SQLite storage importing the tasks of
+    the JSON file of the same name otherwise.
+    """
+    if file.suffix == ".json":
+        return JsonTaskStorage(file)
+    return SqliteTaskStorage(file, legacy_file=file.with_suffix(".json"))
@@ -1,14 +1,49 @@
-import json
-import os
+import datetime
+import time
+from contextlib import contextmanager
+from functools import partial
 from logging import getLogger
 from pathlib import Path
-from typing import Dict, List, Optional
+from threading import RLock, Thread
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
 
 from nanoid import generate
 from retry import retry
 
-from doru.api.schema import TIMESTAMP_STRING_FORMAT, Task, TaskCreate
-from doru.envs import DORU_TASK_FILE, DORU_TASK_LIMIT
+from doru.api.schema import (
+    SECONDS_TIMESTAMP_STRING_FORMAT,
+    TIMESTAMP_STRING_FORMAT,
+    ExchangeLoad,
+    ExecutorStats,
+    OrderFill,
+    Task,
+    TaskCreate,
+    UpcomingRun,
+)
+from doru.envs import (
+    DORU_AGGREGATION_WINDOW,
+    DORU_CATCHUP_INTERVAL,
+    DORU_CATCHUP_POLICY,
+    DORU_EXCHANGE_CONCURRENCY,
+    DORU_HISTORY_FILE,
+    DORU_SCHEDULER_BACKEND,
+    DORU_SHARDS,
+    DORU_SPREAD_WINDOW,
+    DORU_TASK_FILE,
+    DORU_TASK_LIMIT,
+    DORU_WORKER_LIMIT,
+)
 from doru.exceptions import (
     DoruError,
     MoreThanMaxRunningTasks,
@@ -18,18 +53,42 @@ from doru.exceptions import (
     TaskDuplicate,
     TaskNotExist,
 )
-from doru.exchange import OrderStatus, get_exchange
-from doru.manager.utils import rollback
-from doru.scheduler import ScheduleThreadPool
+from doru.exchange import (
+    Exchange,
+    OrderStatus,
+    get_async_exchange,
+    get_exchange,
+    registry,
+)
+from doru.manager.storage import create_task_storage
+from doru.manager.task_registry import TaskRecord, TaskRegistry
+from doru.scheduler import (
+    AsyncScheduler,
+    ExecutionPool,
+    HeapScheduler,
+    JobAggregator,
+    TimingWheelScheduler,
+)
+from doru.shard import ShardedScheduler
+from doru.timetable import Spec, load_per_second, upcoming_runs
+from doru.tracing import recorder
+from doru.type import CatchUpPolicy, SchedulerBackend, Status
 
 logger = getLogger(__name__)
 
+SCHEDULER_BACKENDS: Dict[str, Type[HeapScheduler]] = {
+    "heap": HeapScheduler,
+    "wheel": TimingWheelScheduler,
+    "async": AsyncScheduler,
+}
+
 
 @retry(tries=5, exceptions=(OrderNotCreated, OrderNotComplete))
 def do_order(*args, **kwargs) -> None:
     if not kwargs.keys() >= {"exchange_name", "symbol", "amount"}:
         raise ValueError("Requied args are missing. required args: `exchange_name, symbol, amount`")
-    exchange = get_exchange(kwargs["exchange_name"])
+    with recorder.span(kwargs["exchange_name"], "credential"):
+        exchange = get_exchange(kwargs["exchange_name"])
 
     try:
         order_id = exchange.create_order(kwargs["symbol"], kwargs["amount"])
@@ -37,13 +96,75 @@ def do_order(*args, **kwargs) -> None:
         raise OrderNotCreated(str(e))
 
     order_status = exchange.wait_order_complete(order_id, kwargs["symbol"])
+    _check_order_status(exchange, order_id, kwargs["symbol"], order_status)
+
+
+@retry(tries=5, exceptions=(OrderNotCreated, OrderNotComplete))
+def place_order(exchange_name: str, symbol: str, amount: float) -> Dict[str, Any]:
+    """
+    The same as `do_order` except that the completed order is returned.
+    """
+    with recorder.span(exchange_name, "credential"):
+        exchange = get_exchange(exchange_name)
+
+    try:
+        order_id = exchange.create_order(symbol, amount)
+    except Exception as e:
+        raise OrderNotCreated(str(e))
+
+    result = exchange.wait_order(order_id, symbol)
+    _check_order_status(exchange, order_id, symbol, None if result is None else result["status"])
+    return cast(Dict[str, Any], result)
+
+
+def _check_order_status(exchange: Exchange, order_id: str, symbol: str, order_status: Optional[str]) -> None:
+    # Raise an exception if the order has not been completed, after cancelling it if it is still open.
     if order_status is None:
         raise OrderStatusUnknown(order_id)
     elif order_status in (OrderStatus.CANCELED.value, OrderStatus.EXPIRED.value, OrderStatus.REJECTED.value):
         raise OrderNotComplete(order_id)
     elif order_status == OrderStatus.OPEN.value:
         try:
-            exchange.cancel_order(order_id, kwargs["symbol"])
+            exchange.cancel_order(order_id, symbol)
+        except Exception:
+            raise DoruError(f"Failed to cancel order: {{'order_id': {order_id}}}")
+        else:
+            raise OrderNotComplete(order_id)
+
+
+async def do_order_async(*args, tries: int = 5, **kwargs) -> None:
+    """
+    The same as `do_order` except that the order is placed and waited for in the running event loop.
+    """
+    if not kwargs.keys() >= {"exchange_name", "symbol", "amount"}:
+        raise ValueError("Requied args are missing. required args: `exchange_name, symbol, amount`")
+    for i in range(tries):
+        try:
+            await _do_order_async(kwargs["exchange_name"], kwargs["symbol"], kwargs["amount"])
+            return
+        except (OrderNotCreated, OrderNotComplete):
+            if i == tries - 1:
+                raise
+            logger.warning(f"Retrying the order: {kwargs}")
+
+
+async def _do_order_async(exchange_name: str, symbol: str, amount: float) -> None:
+    with recorder.span(exchange_name, "credential"):
+        exchange = await get_async_exchange(exchange_name)
+
+    try:
+        order_id = await exchange.create_order(symbol, amount)
+    except Exception as e:
+        raise OrderNotCreated(str(e))
+
+    order_status = await exchange.wait_order_complete(order_id, symbol)
+    if order_status is None:
+        raise OrderStatusUnknown(order_id)
+    elif order_status in (OrderStatus.CANCELED.value, OrderStatus.EXPIRED.value, OrderStatus.REJECTED.value):
+        raise OrderNotComplete(order_id)
+    elif order_status == OrderStatus.OPEN.value:
+        try:
+            await exchange.cancel_order(order_id, symbol)
         except Exception:
             raise DoruError(f"Failed to cancel order: {{'order_id': {order_id}}}")
         else:
@@ -51,52 +172,138 @@ def do_order(*args, **kwargs) -> None:
 
 
 class TaskManager:
-    tasks: Dict[str, Task]
+    tasks: TaskRegistry
     _size = 12
     _alphabet = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
-    def __init__(self, file: str, max_running_tasks: int) -> None:
+    def __init__(
+        self,
+        file: str,
+        max_running_tasks: int,
+        max_workers: int = DORU_WORKER_LIMIT,
+        max_orders_per_exchange: int = DORU_EXCHANGE_CONCURRENCY,
+        catch_up_policy: CatchUpPolicy = DORU_CATCHUP_POLICY,  # type: ignore[assignment]
+        catch_up_interval: float = DORU_CATCHUP_INTERVAL,
+        spread_window: float = DORU_SPREAD_WINDOW,
+        scheduler_backend: SchedulerBackend = DORU_SCHEDULER_BACKEND,  # type: ignore[assignment]
+        shards: int = DORU_SHARDS,
+        aggregation_window: float = DORU_AGGREGATION_WINDOW,
+        history_file: str = DORU_HISTORY_FILE,
+    ) -> None:
+        """
+        The tasks are stored in `file`, which is a JSON file rewritten on every change if its name ends with `.json`,
+        or an SQLite database updated task by task otherwise. The tasks of the JSON file of the same name are imported
+        when the database is created.
+
+        `catch_up_policy` decides what to do with the runs of running tasks missed while the daemon was down.
+        - skip: the missed runs are not executed.
+        - once: each task with missed runs is executed once.
+        - all: all the missed runs are executed, one every `catch_up_interval` seconds.
+
+        The orders of tasks sharing a run time are spread over `spread_window` seconds after the run time.
+
+        `scheduler_backend` selects how the running tasks are scheduled.
+        - heap: a priority queue, which is suitable for most cases.
+        - wheel: a hierarchical timing wheel, which keeps starting and stopping tasks O(1) for tens of thousands of tasks.
+        - async: a priority queue dispatched in the event loop of the application, which has to be started by
+          awaiting `self.pool.run()`. Orders are placed in the event loop too, so waiting orders occupy no threads.
+
+        If `shards` is more than 0, the tasks are distributed over that number of worker processes by the hash of
+        their exchange, and each process schedules its tasks and places their orders. `scheduler_backend` is ignored
+        in that case. `max_workers` and `max_orders_per_exchange` are applied to each process.
+
+        If `aggregation_window` is more than 0, the due tasks buying the same symbol on the same exchange with the same
+        credential within that number of seconds are executed as one order, and the filled amount is attributed
+        to each task in proportion to its amount in the history written to `history_file`. It is ignored with
+        the async backend and with shards.
+        """
         self.file = Path(file).expanduser()
-        self.pool = ScheduleThreadPool(max_running_threads=max_running_tasks)
+        self.storage = create_task_storage(self.file)
+        self.history_file = Path(history_file).expanduser()
+        self.executor = ExecutionPool(max_workers=max_workers, max_jobs_per_group=max_orders_per_exchange)
+        self.pool: Union[HeapScheduler, ShardedScheduler]
+        if shards > 0:
+            self.pool = ShardedScheduler(
+                shards,
+                max_running_jobs=max_running_tasks,
+                max_workers=max_workers,
+                max_jobs_per_group=max_orders_per_exchange,
+                spread_window=spread_window,
+                on_run=self._record_run,
+            )
+        else:
+            scheduler_class = SCHEDULER_BACKENDS.get(scheduler_backend, HeapScheduler)
+            self.pool = scheduler_class(
+                max_running_jobs=max_running_tasks, executor=self.executor, spread_window=spread_window
+            )
+        self.aggregator: Optional[JobAggregator] = None
+        if aggregation_window > 0 and not isinstance(self.pool, (ShardedScheduler, AsyncScheduler)):
+            self.aggregator = JobAggregator(aggregation_window, self.executor, self._run_aggregated)
         self._max_running_tasks = max_running_tasks
+        self._catch_up_policy = catch_up_policy
+        self._catch_up_interval = catch_up_interval
+        self._lock = RLock()
         try:
             self._read()
-            # Start tasks with running status
-            for t in self.tasks.values():
-                if t.status == "Running":
-                    self.start_task(t.id)
         except FileNotFoundError:
+            # Only the JSON file can be missing, as the SQLite database is created with its storage.
             logger.warning("Task file for this application could not be found.")
-            self.tasks = {}
-
-            if not os.path.exists(self.file.parent):
-                self.file.parent.mkdir(parents=True)
+            self.tasks = TaskRegistry()
             self._write()
         except Exception as e:
             logger.error(f"Failed to read the Task file: {e}")
             raise e
+        # Start tasks with running status
+        for t in self.tasks.find(status="Running"):
+            self._schedule(t)
+        self._catch_up(datetime.datetime.now())
 
     def _read(self) -> None:
-        with open(self.file, "r") as f:
-            tasks = json.load(f)
-            # raise ValidationError when v is incompatible with Task class
-            self.tasks = {k: Task.parse_obj(v) for (k, v) in tasks.items()}
-
-    def _write(self) -> None:
-        with open(self.file, "w") as f:
-            task_dict = {k: v.dict(exclude_none=True) for (k, v) in self.tasks.items()}
-            json.dump(task_dict, f)
-
-    def get_tasks(self) -> List[Task]:
-        # update next_run fields
-        for k, v in self.tasks.items():
-            self.tasks[k].next_run = self._get_next_run(k)
-        return list(self.tasks.values())
-
-    @rollback(properties=["tasks"], files=["file"])
+        tasks = self.storage.load()
+        # raise ValidationError when v is incompatible with Task class
+        # The symbols are not validated against the exchange, so that the daemon starts without network.
+        self.tasks = TaskRegistry([TaskRecord.from_model(Task.parse_obj(v)) for v in tasks])
+
+    def _write(self, *ids: str) -> None:
+        """
+        Store the changes of the tasks of `ids`.
+        """
+        with self._lock:
+            self.storage.save(self.tasks, ids)
+
+    @contextmanager
+    def _rollback(self, id: str) -> Iterator[None]:
+        """
+        Restore the task in memory and in the storage if the block raises an exception.
+        Only the task is copied and stored again, whatever the number of the tasks.
+        """
+        snapshot = self.tasks.snapshot(id)
+        try:
+            yield
+        except Exception:
+            self.tasks.restore(id, snapshot)
+            try:
+                self._write(id)
+            except Exception as e:
+                logger.error(f"Failed to restore the task: {e}")
+            raise
+
+    def get_tasks(
+        self, exchange: Optional[str] = None, symbol: Optional[str] = None, status: Optional[Status] = None
+    ) -> List[Task]:
+        """
+        Return the tasks matching all the given conditions, which are looked up in the indexes of the tasks.
+        """
+        with self._lock:
+            tasks = [r.to_model() for r in self.tasks.find(exchange=exchange, symbol=symbol, status=status)]
+        # The next runs are filled in the copies, so the shared records are not changed without the lock.
+        for t in tasks:
+            t.next_run = self._get_next_run(t.id)
+        return tasks
+
     def add_task(self, task: TaskCreate) -> Task:
         id = generate(size=self._size, alphabet=self._alphabet)
-        new_task = Task(
+        new_task = TaskRecord(
             symbol=task.symbol,
             amount=task.amount,
             cycle=task.cycle,
@@ -107,29 +314,44 @@ class TaskManager:
             id=id,
             status="Stopped",
         )
-        self.tasks[id] = new_task
-        self._write()
-        return new_task
+        with self._lock, self._rollback(id):
+            self.tasks.add(new_task)
+            self._write(id)
+        return new_task.to_model()
 
-    @rollback(properties=["tasks"], files=["file"])
     def remove_task(self, id: str) -> None:
-        self.tasks.pop(id)
-        self._write()
-        self.pool.kill(id)
+        with self._lock, self._rollback(id):
+            self.tasks.pop(id)
+            self._write(id)
+            self.pool.kill(id)
 
-    @rollback(properties=["tasks"], files=["file"])
     def start_task(self, id: str) -> None:
-        task = self.tasks.get(id)
-        if task is None:
-            raise TaskNotExist(id)
+        with self._lock:
+            task = self.tasks.get(id)
+            if task is None:
+                raise TaskNotExist(id)
 
-        self.tasks[id].status = "Running"
-        self._write()
+            with self._rollback(id):
+                self.tasks.set_status(id, "Running")
+                # The runs scheduled before the task is started are not caught up after the daemon restarts.
+                task.last_run = datetime.datetime.now().strftime(TIMESTAMP_STRING_FORMAT)
+                self._write(id)
+                self._schedule(task)
 
+    def _schedule(self, task: TaskRecord) -> None:
+        id = task.id
+        func: Callable[..., Any] = partial(self._run_task, id)
+        if isinstance(self.pool, ShardedScheduler):
+            # The runs of tasks in the shard processes are recorded when the shards notify them.
+            func = do_order
+        elif isinstance(self.pool, AsyncScheduler):
+            func = partial(self._run_task_async, id)
+        elif self.aggregator is not None:
+            func = partial(self._aggregate_task, id)
         try:
             self.pool.submit(
                 key=id,
-                func=do_order,
+                func=func,
                 cycle=task.cycle,
                 weekday=task.weekday,
                 day=task.day,
@@ -137,6 +359,7 @@ class TaskManager:
                 exchange_name=task.exchange,
                 symbol=task.symbol,
                 amount=task.amount,
+                group=task.exchange,
             )
         except DoruError:
             raise TaskDuplicate(id)
@@ -150,14 +373,232 @@ class TaskManager:
             self.pool.kill(id)
             raise
 
-    @rollback(properties=["tasks"], files=["file"])
     def stop_task(self, id: str) -> None:
-        if self.tasks.get(id) is None:
-            raise TaskNotExist(id)
+        with self._lock:
+            if self.tasks.get(id) is None:
+                raise TaskNotExist(id)
+
+            with self._rollback(id):
+                self.tasks.set_status(id, "Stopped")
+                self._write(id)
+                self.pool.kill(id)
+
+    def _record_run(self, id: str, run_at: Optional[datetime.datetime] = None) -> None:
+        run_at = (run_at or datetime.datetime.now()).replace(second=0, microsecond=0)
+        with self._lock:
+            task = self.tasks.get(id)
+            if task is None:
+                return
+            # A catch-up run may finish after a later run, which is kept as the last run not to be caught up again.
+            if (
+                task.last_run is not None
+                and datetime.datetime.strptime(task.last_run, TIMESTAMP_STRING_FORMAT) >= run_at
+            ):
+                return
+            task.last_run = run_at.strftime(TIMESTAMP_STRING_FORMAT)
+            try:
+                self._write(id)
+            except Exception as e:
+                logger.error(f"Failed to record the last run: {e}")
+
+    def _run_task(self, id: str, run_at: Optional[datetime.datetime] = None, **kwargs) -> None:
+        """
+        Record the run time of the task and execute the order.
+        The run time is recorded first so that the order is not duplicated by the catch-up after a restart.
+        """
+        exchange_name = kwargs.get("exchange_name", "")
+        with recorder.run(id), recorder.span(exchange_name, "total", kwargs.get("symbol")):
+            with recorder.span(exchange_name, "record"):
+                self._record_run(id, run_at)
+            do_order(**kwargs)
+
+    async def _run_task_async(self, id: str, **kwargs) -> None:
+        exchange_name = kwargs.get("exchange_name", "")
+        with recorder.run(id), recorder.span(exchange_name, "total", kwargs.get("symbol")):
+            with recorder.span(exchange_name, "record"):
+                self._record_run(id)
+            await do_order_async(**kwargs)
+
+    def _aggregate_task(self, id: str, run_at: Optional[datetime.datetime] = None, **kwargs) -> None:
+        """
+        Record the run time of the task and hand its order over to the aggregator.
+        """
+        if self.aggregator is None:
+            raise DoruError("Orders are not aggregated.")
+        self._record_run(id, run_at)
+        exchange_name = kwargs["exchange_name"]
+        key = (exchange_name, kwargs["symbol"], registry.credential_fingerprint(exchange_name))
+        self.aggregator.submit(key, group=exchange_name, id=id, **kwargs)
+
+    def _run_aggregated(self, orders: List[Dict[str, Any]]) -> None:
+        exchange_name, symbol = orders[0]["exchange_name"], orders[0]["symbol"]
+        ids = ",".join(o["id"] for o in orders)
+        if len(orders) > 1:
+            logger.info(f"Aggregating orders: {{'exchange': {exchange_name}, 'symbol': {symbol}, 'ids': {ids}}}")
+        with recorder.run(ids), recorder.span(exchange_name, "total", symbol):
+            result = place_order(exchange_name, symbol, sum(o["amount"] for o in orders))
+        self._record_fills(orders, result)
+
+    def _record_fills(self, orders: List[Dict[str, Any]], result: Dict[str, Any]) -> None:
+        total = sum(o["amount"] for o in orders)
+        filled = result.get("filled") or 0.0
+        price = result.get("average") or result.get("price")
+        cost = result.get("cost") or filled * (price or 0.0)
+        executed_at = datetime.datetime.now().strftime(SECONDS_TIMESTAMP_STRING_FORMAT)
+        fills = [
+            OrderFill(
+                task_id=o["id"],
+                order_id=result["id"],
+                exchange=o["exchange_name"],
+                symbol=o["symbol"],
+                amount=o["amount"],
+                filled=filled * o["amount"] / total,
+                cost=cost * o["amount"] / total,
+                price=price,
+                tasks=len(orders),
+                executed_at=executed_at,
+            )
+            for o in orders
+        ]
+        with self._lock:
+            try:
+                self.history_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.history_file, "a") as f:
+                    f.writelines(fill.json() + "\n" for fill in fills)
+            except Exception as e:
+                logger.error(f"Failed to record the fills: {e}")
+
+    def get_history(self, task_id: Optional[str] = None) -> List[OrderFill]:
+        """
+        Return the fills of the orders of the task, or of all the tasks if `task_id` is None, in chronological order.
+        """
+        try:
+            with open(self.history_file, "r") as f:
+                fills = [OrderFill.parse_raw(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+        return [fill for fill in fills if task_id is None or fill.task_id == task_id]
+
+    def _catch_up(self, now: datetime.datetime) -> None:
+        if self._catch_up_policy == "skip":
+            return
+
+        # Find the missed runs of all running tasks in one pass. The run times are calculated by `next_run_time`
+        # as the scheduler does, so a run made by the scheduler is never replayed.
+        schedules: List[Tuple[str, Spec]] = []
+        last_runs: Dict[str, datetime.datetime] = {}
+        for t in self.tasks.find(status="Running"):
+            if t.last_run is not None:
+                schedules.append((t.id, (t.cycle, t.weekday, t.day, t.time)))
+                last_runs[t.id] = datetime.datetime.strptime(t.last_run, TIMESTAMP_STRING_FORMAT)
+        if not schedules:
+            return
+        start = min(last_runs.values()) + datetime.timedelta(minutes=1)
+        missed: List[Tuple[datetime.datetime, str]] = []
+        for run_at, key in upcoming_runs(schedules, start, now):
+            id = str(key)
+            if run_at > last_runs[id]:
+                missed.append((run_at, id))
+        if self._catch_up_policy == "once":
+            # Only the latest missed run is kept for each task
+            latest = {id: run_at for run_at, id in missed}
+            missed = sorted((run_at, id) for id, run_at in latest.items())
+
+        if missed:
+            logger.warning(f"Catching up {len(missed)} missed runs with the `{self._catch_up_policy}` policy.")
+            Thread(target=self._run_missed, args=(missed,), daemon=True).start()
+
+    def _run_missed(self, missed: List[Tuple[datetime.datetime, str]]) -> None:
+        for i, (run_at, id) in enumerate(missed):
+            task = self.tasks.get(id)
+            if task is None or task.status != "Running":
+                continue
+            if i > 0:
+                time.sleep(self._catch_up_interval)
+            logger.info(f"Running the missed task: {{'id': {id}, 'run_at': {run_at}}}")
+            if isinstance(self.pool, ShardedScheduler):
+                self.pool.execute(
+                    id,
+                    do_order,
+                    run_at=run_at,
+                    group=task.exchange,
+                    exchange_name=task.exchange,
+                    symbol=task.symbol,
+                    amount=task.amount,
+                )
+                continue
+            self.executor.submit(
+                partial(
+                    self._run_task,
+                    id,
+                    run_at=run_at,
+                    exchange_name=task.exchange,
+                    symbol=task.symbol,
+                    amount=task.amount,
+                ),
+                group=task.exchange,
+            )
+
+    def get_upcoming_runs(self, horizon: datetime.timedelta) -> List[UpcomingRun]:
+        """
+        Return the runs of the running tasks scheduled from now until `horizon` later in chronological order.
+        """
+        start = datetime.datetime.now()
+        schedules = [(t.id, (t.cycle, t.weekday, t.day, t.time)) for t in self.tasks.find(status="Running")]
+        runs = []
+        for run_at, id in upcoming_runs(schedules, start, start + horizon):
+            task = self.tasks[str(id)]
+            # The values come from validated tasks, so the validation is skipped.
+            runs.append(
+                UpcomingRun.construct(
+                    id=task.id,
+                    symbol=task.symbol,
+                    amount=task.amount,
+                    exchange=task.exchange,
+                    run_at=run_at.strftime(TIMESTAMP_STRING_FORMAT),
+                )
+            )
+        return runs
+
+    def get_load_report(self, horizon: datetime.timedelta) -> List[ExchangeLoad]:
+        """
+        Return the number of orders per second of each exchange from now until `horizon` later,
+        taking the spread offsets of the running tasks into account.
+        """
+        start = datetime.datetime.now()
+        schedules = [(t.id, (t.cycle, t.weekday, t.day, t.time)) for t in self.tasks.find(status="Running")]
+        offsets = {id: self.pool.spread_offset(id) for id, _ in schedules}
+        load = load_per_second(
+            (run_at + offsets[str(id)], self.tasks[str(id)].exchange)
+            for run_at, id in upcoming_runs(schedules, start, start + horizon)
+        )
+        report = []
+        for exchange, counter in sorted(load.items(), key=lambda item: str(item[0])):
+            peak_at, peak = counter.most_common(1)[0]
+            report.append(
+                ExchangeLoad(
+                    exchange=str(exchange),
+                    runs=sum(counter.values()),
+                    busy_seconds=len(counter),
+                    peak=peak,
+                    peak_at=peak_at.strftime(SECONDS_TIMESTAMP_STRING_FORMAT),
+                )
+            )
+        return report
+
+    def get_executor_stats(self) -> ExecutorStats:
+        if isinstance(self.pool, ShardedScheduler):
+            return ExecutorStats.parse_obj(self.pool.stats())
+        return ExecutorStats.parse_obj(self.executor.stats())
 
-        self.tasks[id].status = "Stopped"
-        self._write()
-        self.pool.kill(id)
+    def shutdown(self) -> None:
+        """
+        Stop scheduling the tasks, and close the storage after the running tasks finish and record their runs.
+        Pending tasks are discarded.
+        """
+        self.pool.shutdown()
+        self.executor.shutdown(wait=True)
+        self.storage.close()
 
     def _get_next_run(self, id: str) -> Optional[str]:
         next_run = self.pool.next_run(id)
@@ -166,5 +607,29 @@ class TaskManager:
         return None
 
 
-def create_task_manager(file: str = DORU_TASK_FILE, max_running_tasks: int = DORU_TASK_LIMIT) -> TaskManager:
-    return TaskManager(file, max_running_tasks)
+def create_task_manager(
+    file: str = DORU_TASK_FILE,
+    max_running_tasks: int = DORU_TASK_LIMIT,
+    max_workers: int = DORU_WORKER_LIMIT,
+    max_orders_per_exchange: int = DORU_EXCHANGE_CONCURRENCY,
+    catch_up_policy: CatchUpPolicy = DORU_CATCHUP_POLICY,  # type: ignore[assignment]
+    catch_up_interval: float = DORU_CATCHUP_INTERVAL,
+    spread_window: float = DORU_SPREAD_WINDOW,
+    scheduler_backend: SchedulerBackend = DORU_SCHEDULER_BACKEND,  # type: ignore[assignment]
+    shards: int = DORU_SHARDS,
+    aggregation_window: float = DORU_AGGREGATION_WINDOW,
+    history_file: str = DORU_HISTORY_FILE,
+) -> TaskManager:
+    return TaskManager(
+        file,
+        max_running_tasks,
+        max_workers,
+        max_orders_per_exchange,
+        catch_up_policy,
+        catch_up_interval,
+        spread_window,
+        scheduler_backend,
+        shards,
+        aggregation_window,
+        history_file,
+    )
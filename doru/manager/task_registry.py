@@ -0,0 +1,210 @@
+import sys
+from copy import copy
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, cast
+
+from doru.api.schema import Task
+from doru.type import Cycle, Status, Weekday
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    # The exchanges, symbols, cycles and times are shared by many tasks, so each of them is kept only once.
+    return None if value is None else sys.intern(value)
+
+
+class TaskRecord:
+    """
+    The compact in-memory form of a validated task, which is converted to `Task` only at the API boundary.
+    """
+
+    __slots__ = (
+        "symbol",
+        "amount",
+        "cycle",
+        "weekday",
+        "day",
+        "time",
+        "exchange",
+        "id",
+        "status",
+        "next_run",
+        "last_run",
+    )
+    symbol: str
+    amount: float
+    cycle: Cycle
+    weekday: Optional[Weekday]
+    day: Optional[int]
+    time: str
+    exchange: str
+    id: str
+    status: Status
+    next_run: Optional[str]
+    last_run: Optional[str]
+
+    def __init__(
+        self,
+        id: str,
+        symbol: str,
+        amount: float,
+        cycle: Cycle,
+        time: str,
+        exchange: str,
+        status: Status,
+        weekday: Optional[Weekday] = None,
+        day: Optional[int] = None,
+        next_run: Optional[str] = None,
+        last_run: Optional[str] = None,
+    ) -> None:
+        self.id = id
+        self.symbol = sys.intern(symbol)
+        self.amount = amount
+        self.cycle = cast(Cycle, sys.intern(cycle))
+        self.weekday = cast(Optional[Weekday], _intern(weekday))
+        self.day = day
+        self.time = sys.intern(time)
+        self.exchange = sys.intern(exchange)
+        self.status = cast(Status, sys.intern(status))
+        self.next_run = next_run
+        self.last_run = last_run
+
+    @classmethod
+    def from_model(cls, task: Task) -> "TaskRecord":
+        return cls(
+            id=task.id,
+            symbol=task.symbol,
+            amount=task.amount,
+            cycle=task.cycle,
+            weekday=task.weekday,
+            day=task.day,
+            time=task.time,
+            exchange=task.exchange,
+            status=task.status,
+            next_run=task.next_run,
+            last_run=task.last_run,
+        )
+
+    def to_model(self) -> Task:
+        # The values have been validated when the record was created, so the validation is skipped.
+        return Task.construct(**{name: getattr(self, name) for name in self.__slots__})
+
+    def dict(self, exclude_none: bool = False) -> Dict[str, Any]:
+        """
+        Return the fields in the same order as `Task.dict`.
+        """
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        return {k: v for k, v in fields.items() if v is not None} if exclude_none else fields
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, TaskRecord) and self.dict() == other.dict()
+
+    def __repr__(self) -> str:
+        return f"TaskRecord({self.dict(exclude_none=True)})"
+
+
+class TaskRegistry(Mapping[str, TaskRecord]):
+    """
+    The tasks keyed by their IDs with indexes by exchange, symbol and status, so that the tasks matching a filter
+    are found without scanning all the tasks.
+
+    The status of a task has to be changed with `set_status` to keep the indexes up to date.
+    The other fields are not indexed and can be assigned directly.
+    """
+
+    def __init__(self, records: Optional[List[TaskRecord]] = None) -> None:
+        self._records: Dict[str, TaskRecord] = {}
+        # the insertion order of the tasks, by which the filtered tasks are sorted
+        self._positions: Dict[str, int] = {}
+        self._next_position = 0
+        self._by_exchange: Dict[str, Dict[str, None]] = {}
+        self._by_symbol: Dict[str, Dict[str, None]] = {}
+        self._by_status: Dict[str, Dict[str, None]] = {}
+        for record in records or []:
+            self.add(record)
+
+    def __getitem__(self, id: str) -> TaskRecord:
+        return self._records[id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @staticmethod
+    def _index(index: Dict[str, Dict[str, None]], key: str, id: str) -> None:
+        index.setdefault(key, {})[id] = None
+
+    @staticmethod
+    def _unindex(index: Dict[str, Dict[str, None]], key: str, id: str) -> None:
+        ids = index.get(key)
+        if ids is not None:
+            ids.pop(id, None)
+            if not ids:
+                del index[key]
+
+    def add(self, record: TaskRecord) -> None:
+        if record.id in self._records:
+            self.pop(record.id)
+        self._records[record.id] = record
+        self._positions[record.id] = self._next_position
+        self._next_position += 1
+        self._index(self._by_exchange, record.exchange, record.id)
+        self._index(self._by_symbol, record.symbol, record.id)
+        self._index(self._by_status, record.status, record.id)
+
+    def pop(self, id: str) -> TaskRecord:
+        record = self._records.pop(id)
+        del self._positions[id]
+        self._unindex(self._by_exchange, record.exchange, id)
+        self._unindex(self._by_symbol, record.symbol, id)
+        self._unindex(self._by_status, record.status, id)
+        return record
+
+    def snapshot(self, id: str) -> Optional[Tuple[TaskRecord, int]]:
+        """
+        Return a copy of the task and its position to be restored later, or None if the task does not exist.
+        """
+        record = self._records.get(id)
+        return None if record is None else (copy(record), self._positions[id])
+
+    def restore(self, id: str, snapshot: Optional[Tuple[TaskRecord, int]]) -> None:
+        """
+        Put the task back as it was when the snapshot was taken, removing it if it did not exist then.
+        """
+        if id in self._records:
+            self.pop(id)
+        if snapshot is not None:
+            record, position = snapshot
+            self.add(record)
+            self._positions[id] = position
+
+    def set_status(self, id: str, status: Status) -> None:
+        record = self._records[id]
+        self._unindex(self._by_status, record.status, id)
+        record.status = cast(Status, sys.intern(status))
+        self._index(self._by_status, record.status, id)
+
+    def find(
+        self, exchange: Optional[str] = None, symbol: Optional[str] = None, status: Optional[Status] = None
+    ) -> List[TaskRecord]:
+        """
+        Return the tasks matching all the given conditions in the order in which they were added.
+        The smallest index of the conditions is scanned.
+        """
+        candidates = [
+            index.get(key, {})
+            for index, key in ((self._by_exchange, exchange), (self._by_symbol, symbol), (self._by_status, status))
+            if key is not None
+        ]
+        if not candidates:
+            # The tasks are almost always in order, unless some of them have been restored.
+            return sorted(self._records.values(), key=lambda r: self._positions[r.id])
+        ids = min(candidates, key=len)
+        records = [
+            self._records[id]
+            for id in ids
+            if (exchange is None or self._records[id].exchange == exchange)
+            and (symbol is None or self._records[id].symbol == symbol)
+            and (status is None or self._records[id].status == status)
+        ]
+        return sorted(records, key=lambda r: self._positions[r.id])
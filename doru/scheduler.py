@@ -1,15 +1,31 @@
-import calendar
+import asyncio
 import datetime
-import random
+import functools
+import heapq
+import itertools
 import re
 import time
+from collections import OrderedDict, deque
 from logging import getLogger
-from threading import Event, Thread
-from typing import Any, Callable, Dict, Optional, Union
+from threading import Condition, Event, Lock, RLock, Thread, Timer, current_thread
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
-from schedule import Job, ScheduleError, Scheduler, ScheduleValueError
+from schedule import CancelJob, Job, Scheduler, ScheduleValueError
+from typing_extensions import Protocol, TypedDict
 
 from doru.exceptions import DoruError
+from doru.timetable import Spec, add_months, next_run_time, spread_offset
 from doru.type import Cycle, Weekday
 
 logger = getLogger(__name__)
@@ -17,11 +33,51 @@ logger = getLogger(__name__)
 DEFAULT_TIME = "00:00"
 
 
+class JobScheduler(Protocol):
+    """
+    The interface shared by the schedulers, by which the jobs are submitted, started and killed by their keys.
+    """
+
+    def submit(
+        self,
+        key: str,
+        func: Callable[..., Any],
+        cycle: Cycle,
+        weekday: Optional[Weekday] = None,
+        day: Optional[int] = None,
+        time: str = DEFAULT_TIME,
+        *args: Any,
+        **kwargs: Any,
+    ) -> None:
+        ...
+
+    def start(self, key: str) -> None:
+        ...
+
+    def kill(self, key: str) -> None:
+        ...
+
+    def next_run(self, key: str) -> Optional[datetime.datetime]:
+        ...
+
+
+class PoolStats(TypedDict):
+    max_workers: int
+    workers: int
+    active_workers: int
+    queue_depth: int
+    utilization: float
+    busy_seconds: float
+    completed: int
+
+
 class MonthEnabledJob(Job):
     def __init__(self, interval: int, scheduler: Scheduler = None):
         super().__init__(interval, scheduler)
         # optional date on which this job runs
         self.on_date: Optional[int] = None
+        # the schedule of the job registered by `schedule_job`
+        self.spec: Optional[Spec] = None
 
     def date(self, date_str: str):
         if self.unit in ("weeks", "days", "hours", "minutes", "seconds") or self.start_day:  # type: ignore[has-type]
@@ -84,90 +140,26 @@ class MonthEnabledJob(Job):
         return self
 
     def _schedule_next_run(self) -> None:
-        if self.unit not in ("seconds", "minutes", "hours", "days", "weeks", "months"):
-            raise ScheduleValueError(
-                "Invalid unit (valid units are `seconds`, `minutes`, `hours`, `days`, `weeks`, and  `months`)"
-            )
-
-        if self.latest is not None:
-            if not (self.latest >= self.interval):
-                raise ScheduleError("`latest` is greater than `interval`")
-            interval = random.randint(self.interval, self.latest)
-        else:
-            interval = self.interval
-
-        if self.unit == "months":
-            # Convert monthly interval to daily
-            now = datetime.datetime.now()
-            year_months = [(now.year, now.month + i) for i in range(self.interval)]
-            days_interval = 0
-            for year, month in year_months:
-                while month > 12:
-                    year += 1
-                    month -= 12
-                days_interval += calendar.monthrange(year, month)[1]
-            self.period = datetime.timedelta(days=days_interval)
-        else:
-            self.period = datetime.timedelta(**{self.unit: interval})
-        self.next_run = datetime.datetime.now() + self.period
-
-        if self.start_day is not None:
-            if self.unit != "weeks":
-                raise ScheduleValueError("`unit` should be 'weeks'")
-            weekdays = (
-                "monday",
-                "tuesday",
-                "wednesday",
-                "thursday",
-                "friday",
-                "saturday",
-                "sunday",
-            )
-            if self.start_day not in weekdays:
-                raise ScheduleValueError("Invalid start day (valid start days are {})".format(weekdays))
-            weekday = weekdays.index(self.start_day)
-            days_ahead = weekday - self.next_run.weekday()
-            if days_ahead <= 0:  # Target day already happened this week
-                days_ahead += 7
-            self.next_run += datetime.timedelta(days_ahead) - self.period
-        if self.on_date is not None:
-            if self.unit != "months":
-                raise ScheduleValueError("`unit` should be 'months'")
-            kwargs = {"day": self.on_date}
-            self.next_run = self.next_run.replace(**kwargs)  # type: ignore[arg-type]
-        if self.at_time is not None:
-            if self.unit not in ("days", "hours", "minutes") and self.start_day is None and self.on_date is None:
-                raise ScheduleValueError("Invalid unit without specifying start day")
-            kwargs = {"second": self.at_time.second, "microsecond": 0}
-            if self.unit == "days" or self.start_day is not None or self.on_date is not None:
-                kwargs["hour"] = self.at_time.hour
-            if self.unit in ["days", "hours"] or self.start_day is not None or self.on_date is not None:
-                kwargs["minute"] = self.at_time.minute
-            self.next_run = self.next_run.replace(**kwargs)  # type:ignore
-
-            # Make sure we run at the specified time *today* (or *this hour*)
-            # as well. This accounts for when a job takes so long it finished
-            # in the next period.
-            if not self.last_run or (self.next_run - self.last_run) > self.period:
-                now = datetime.datetime.now()
-                if self.unit == "days" and self.at_time > now.time() and self.interval == 1:
-                    self.next_run = self.next_run - datetime.timedelta(days=1)
-                elif self.unit == "hours" and (
-                    self.at_time.minute > now.minute
-                    or (self.at_time.minute == now.minute and self.at_time.second > now.second)
-                ):
-                    self.next_run = self.next_run - datetime.timedelta(hours=1)
-                elif self.unit == "minutes" and self.at_time.second > now.second:
-                    self.next_run = self.next_run - datetime.timedelta(minutes=1)
-        if self.start_day is not None and self.at_time is not None:
-            # Let's see if we will still make that time we specified today
-            if (self.next_run - datetime.datetime.now()).days >= 7:
-                self.next_run -= self.period
-
-        if self.on_date is not None:
-            # Make sure that next_run is within the period specified by interval
-            if (self.next_run - datetime.datetime.now()).days >= days_interval:
-                self.next_run -= datetime.timedelta(days=days_interval)
+        """
+        The jobs registered by `schedule_job` run at the times calculated by `next_run_time`, which also lists
+        the upcoming runs and finds the missed runs. The other monthly jobs run on their date every `interval`
+        months, and the jobs of the other units are scheduled by the schedule library.
+        """
+        now = datetime.datetime.now()
+        if self.spec is not None:
+            cycle, weekday, day, at = self.spec
+            # A job that has just run is not run again at the same time.
+            after = now if self.last_run is None else now + datetime.timedelta(microseconds=1)
+            self.next_run = next_run_time(cycle, at, weekday, day, after=after)
+            return
+        if self.on_date is None:
+            super()._schedule_next_run()
+            return
+        if self.unit != "months":
+            raise ScheduleValueError("`unit` should be 'months'")
+        at_time = self.at_time or datetime.time()
+        next_run = datetime.datetime.combine(now.replace(day=self.on_date).date(), at_time)
+        self.next_run = next_run if next_run > now else add_months(next_run, self.interval)
 
 
 # ref: https://gist.github.com/mplewis/8483f1c24f2d6259aef6
@@ -203,6 +195,50 @@ class SafeScheduler(Scheduler):
         return job
 
 
+def schedule_job(
+    scheduler: Scheduler,
+    func: Callable[..., Any],
+    cycle: Cycle,
+    weekday: Optional[Weekday] = None,
+    day: Optional[int] = None,
+    time: str = DEFAULT_TIME,
+    *args,
+    **kwargs,
+) -> MonthEnabledJob:
+    """
+    Register a job that calls `func` on the specified cycle to the scheduler and return it.
+    """
+    job: MonthEnabledJob = scheduler.every()
+    # The schedule is set before the job is registered, when its first run is calculated.
+    job.spec = (cycle, weekday, day, time)
+    if cycle == "Daily":
+        return job.day.at(time).do(func, *args, **kwargs)
+    elif cycle == "Weekly":
+        if weekday is None:
+            raise DoruError("The weekday parameter should not be None in the weekly schedule.")
+
+        if weekday == "Sun":
+            return job.sunday.at(time).do(func, *args, **kwargs)
+        elif weekday == "Mon":
+            return job.monday.at(time).do(func, *args, **kwargs)
+        elif weekday == "Tue":
+            return job.tuesday.at(time).do(func, *args, **kwargs)
+        elif weekday == "Wed":
+            return job.wednesday.at(time).do(func, *args, **kwargs)
+        elif weekday == "Thu":
+            return job.thursday.at(time).do(func, *args, **kwargs)
+        elif weekday == "Fri":
+            return job.friday.at(time).do(func, *args, **kwargs)
+        elif weekday == "Sat":
+            return job.saturday.at(time).do(func, *args, **kwargs)
+    elif cycle == "Monthly":
+        if day is None:
+            raise DoruError("The day parameter should not be None in the monthly schedule.")
+
+        return job.date(f"{day:02}").at(time).do(func, *args, **kwargs)
+    raise DoruError(f"The cycle `{cycle}` is not supported.")
+
+
 # ref: https://schedule.readthedocs.io/en/stable/background-execution.html
 class ScheduleThread(Thread):
     """
@@ -267,31 +303,7 @@ class ScheduleThreadPool:
         **kwargs,
     ) -> ScheduleThread:
         scheduler = SafeScheduler()
-        if cycle == "Daily":
-            scheduler.every().day.at(time).do(func, *args, **kwargs)
-        elif cycle == "Weekly":
-            if weekday is None:
-                raise DoruError("The weekday parameter should not be None in the weekly schedule thread.")
-
-            if weekday == "Sun":
-                scheduler.every().sunday.at(time).do(func, *args, **kwargs)
-            elif weekday == "Mon":
-                scheduler.every().monday.at(time).do(func, *args, **kwargs)
-            elif weekday == "Tue":
-                scheduler.every().tuesday.at(time).do(func, *args, **kwargs)
-            elif weekday == "Wed":
-                scheduler.every().wednesday.at(time).do(func, *args, **kwargs)
-            elif weekday == "Thu":
-                scheduler.every().thursday.at(time).do(func, *args, **kwargs)
-            elif weekday == "Fri":
-                scheduler.every().friday.at(time).do(func, *args, **kwargs)
-            elif weekday == "Sat":
-                scheduler.every().saturday.at(time).do(func, *args, **kwargs)
-        elif cycle == "Monthly":
-            if day is None:
-                raise DoruError("The day parameter should not be None in the monthly schedule thread.")
-
-            scheduler.every().date(f"{day:02}").at(time).do(func, *args, **kwargs)
+        schedule_job(scheduler, func, cycle, weekday, day, time, *args, **kwargs)
         return ScheduleThread(scheduler, daemon=True)
 
     @property
@@ -343,3 +355,761 @@ class ScheduleThreadPool:
         except KeyError:
             logger.debug(f"The key `{key}` is missing.")
         return None
+
+
+class ExecutionPool:
+    """
+    An implementation of a bounded pool of worker threads that executes jobs handed over by a scheduler,
+    so that a long running job does not delay the dispatch of other jobs.
+
+    Jobs can be submitted with a group (e.g. the exchange name), and at most `max_jobs_per_group` jobs
+    in the same group run at the same time. Pending jobs are taken from the groups in round-robin order.
+    """
+
+    def __init__(self, max_workers: int, max_jobs_per_group: Optional[int] = None) -> None:
+        if max_workers < 1:
+            raise DoruError("The number of workers should be more than 0.")
+        if max_jobs_per_group is not None and max_jobs_per_group < 1:
+            raise DoruError("The number of jobs per group should be more than 0.")
+        self.max_workers = max_workers
+        self.max_jobs_per_group = max_jobs_per_group
+        self._pending: "OrderedDict[Optional[str], Deque[Callable[[], Any]]]" = OrderedDict()
+        self._running: Dict[Optional[str], int] = {}
+        self._queue_depth = 0
+        self._active_workers = 0
+        self._busy_seconds = 0.0
+        self._completed = 0
+        self._workers: List[Thread] = []
+        self._shutdown = False
+        self._condition = Condition()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue_depth
+
+    @property
+    def active_workers(self) -> int:
+        return self._active_workers
+
+    @property
+    def utilization(self) -> float:
+        return self._active_workers / self.max_workers
+
+    def stats(self) -> PoolStats:
+        with self._condition:
+            return {
+                "max_workers": self.max_workers,
+                "workers": len(self._workers),
+                "active_workers": self._active_workers,
+                "queue_depth": self._queue_depth,
+                "utilization": self.utilization,
+                "busy_seconds": self._busy_seconds,
+                "completed": self._completed,
+            }
+
+    def submit(self, func: Callable[[], Any], group: Optional[str] = None) -> None:
+        with self._condition:
+            if self._shutdown:
+                raise DoruError("Cannot submit a job after the execution pool has been shut down.")
+            self._pending.setdefault(group, deque()).append(func)
+            self._queue_depth += 1
+            if self._active_workers + self._queue_depth > len(self._workers) and len(self._workers) < self.max_workers:
+                worker = Thread(target=self._work, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify()
+
+    def shutdown(self, wait: bool = False) -> None:
+        """
+        Stop the workers after the running jobs finish. Pending jobs are discarded.
+        If `wait` is True, this method returns after the workers have stopped.
+        """
+        with self._condition:
+            self._shutdown = True
+            self._pending.clear()
+            self._queue_depth = 0
+            self._condition.notify_all()
+            # No worker is added after the pool has been shut down
+            workers = list(self._workers)
+        if wait:
+            for worker in workers:
+                if worker is not current_thread():
+                    worker.join()
+
+    def _is_runnable(self, group: Optional[str]) -> bool:
+        if group is None or self.max_jobs_per_group is None:
+            return True
+        return self._running.get(group, 0) < self.max_jobs_per_group
+
+    def _take(self) -> Optional[Tuple[Optional[str], Callable[[], Any]]]:
+        for group, jobs in self._pending.items():
+            if self._is_runnable(group):
+                func = jobs.popleft()
+                if jobs:
+                    # move the group to the end so that groups take turns
+                    self._pending.move_to_end(group)
+                else:
+                    del self._pending[group]
+                self._queue_depth -= 1
+                return group, func
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                job = self._take()
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._condition.wait()
+                    job = self._take()
+                group, func = job
+                self._running[group] = self._running.get(group, 0) + 1
+                self._active_workers += 1
+
+            start = time.monotonic()
+            try:
+                func()
+            except Exception as e:
+                logger.error(f"Failed to execute job: {str(e)}")
+            finally:
+                with self._condition:
+                    self._running[group] -= 1
+                    if self._running[group] == 0:
+                        del self._running[group]
+                    self._active_workers -= 1
+                    self._busy_seconds += time.monotonic() - start
+                    self._completed += 1
+                    # A job of the same group may have become runnable
+                    self._condition.notify()
+
+
+class JobAggregator:
+    """
+    Collect the jobs submitted with the same key within `window` seconds of the first one, and execute them
+    together as one call of `func` with the list of their arguments in the execution pool.
+    """
+
+    def __init__(self, window: float, executor: ExecutionPool, func: Callable[[List[Dict[str, Any]]], Any]) -> None:
+        if window <= 0:
+            raise DoruError("The aggregation window should be more than 0.")
+        self.window = window
+        self.executor = executor
+        self.func = func
+        self._batches: Dict[Hashable, List[Dict[str, Any]]] = {}
+        self._lock = Lock()
+
+    def submit(self, key: Hashable, group: Optional[str] = None, **kwargs: Any) -> None:
+        with self._lock:
+            batch = self._batches.get(key)
+            if batch is None:
+                batch = self._batches[key] = []
+                timer = Timer(self.window, self._flush, args=(key, group))
+                timer.daemon = True
+                timer.start()
+            batch.append(kwargs)
+
+    def _flush(self, key: Hashable, group: Optional[str]) -> None:
+        with self._lock:
+            batch = self._batches.pop(key)
+            self.executor.submit(functools.partial(self.func, batch), group=group)
+
+
+class ScheduleEntry:
+    """
+    A job managed by `HeapScheduler` together with its state.
+    The interface for checking the state is the same as `ScheduleThread`.
+    """
+
+    __slots__ = ("key", "job", "group", "offset", "started", "cancelled")
+
+    def __init__(
+        self,
+        key: str,
+        job: MonthEnabledJob,
+        group: Optional[str] = None,
+        offset: datetime.timedelta = datetime.timedelta(),
+    ) -> None:
+        self.key = key
+        self.job = job
+        self.group = group
+        # delay of the dispatch from the scheduled run time
+        self.offset = offset
+        self.started = False
+        self.cancelled = False
+
+    @property
+    def dispatch_time(self) -> datetime.datetime:
+        return self.job.next_run + self.offset
+
+    def is_started(self) -> bool:
+        return self.started
+
+    def is_alive(self) -> bool:
+        return self.started and not self.cancelled
+
+
+class HeapScheduler:
+    """
+    An implementation of a class that manages scheduled jobs in a single priority queue keyed by the next run time.
+    All jobs are dispatched by one thread, so the number of threads does not depend on the number of jobs.
+
+    Killed jobs are not removed from the queue immediately but skipped when they reach the head of the queue,
+    so both `start` and `kill` take O(log n) time.
+
+    The dispatcher thread sleeps until the earliest next run time instead of polling the queue,
+    and is woken up by a condition variable whenever the queue changes.
+
+    If an `ExecutionPool` is given, the dispatcher thread reschedules fired jobs and hands them over to the pool
+    instead of running them by itself, so the dispatch is not delayed by long running jobs.
+
+    If a spread window is set, each job is dispatched a little after its run time by an offset derived from
+    its key, so that jobs sharing a run time do not fire in the same second.
+    """
+
+    MAX_SPREAD_WINDOW = 3600
+
+    pool: Dict[str, ScheduleEntry]
+
+    def __init__(
+        self,
+        max_running_jobs: int,
+        max_idle_seconds: float = 60,
+        reschedule_on_failure: bool = True,
+        executor: Optional[ExecutionPool] = None,
+        spread_window: float = 0,
+    ) -> None:
+        """
+        The dispatcher thread sleeps at most `max_idle_seconds` at a time, so that a change of the system clock
+        or a suspend of the machine delays jobs by at most that time.
+        If reschedule_on_failure is True, jobs will be rescheduled for their next run as if they had completed
+        successfully. If False, they'll be canceled.
+        `spread_window` is the default window in seconds over which the dispatch of jobs is spread.
+        """
+        self._validate_spread_window(spread_window)
+        self.max_running_jobs = max_running_jobs
+        self.max_idle_seconds = max_idle_seconds
+        self.reschedule_on_failure = reschedule_on_failure
+        self.executor = executor
+        self.spread_window = spread_window
+        self.pool = {}
+        self._queue: List[Tuple[datetime.datetime, int, ScheduleEntry]] = []
+        self._sequence = itertools.count()
+        self._running_jobs_count = 0
+        self._condition = Condition(RLock())
+        self._thread: Optional[Thread] = None
+        self._stopped = False
+        # The `schedule` library needs a scheduler to build jobs.
+        # Jobs are unregistered from it right after they are built because they are managed in the queue.
+        self._builder = SafeScheduler()
+
+    @property
+    def running_jobs_count(self) -> int:
+        return self._running_jobs_count
+
+    def _validate_spread_window(self, spread_window: float) -> None:
+        if not 0 <= spread_window <= self.MAX_SPREAD_WINDOW:
+            raise DoruError(f"The spread window should be between 0 and {self.MAX_SPREAD_WINDOW} seconds.")
+
+    def _is_startable(self) -> bool:
+        return self._running_jobs_count < self.max_running_jobs
+
+    # The following four methods manage the queue of started jobs and are called with the lock held.
+    # Subclasses can override them to manage the queue with another data structure.
+    def _enqueue(self, entry: ScheduleEntry) -> None:
+        heapq.heappush(self._queue, (entry.dispatch_time, next(self._sequence), entry))
+
+    def _dequeue(self, entry: ScheduleEntry) -> None:
+        # Rebuild the queue when most of it consists of killed jobs so that it does not grow unboundedly.
+        if len(self._queue) > 2 * max(self._running_jobs_count, 1):
+            self._queue = [item for item in self._queue if not item[2].cancelled]
+            heapq.heapify(self._queue)
+
+    def _pop_due(self, now: datetime.datetime) -> List[ScheduleEntry]:
+        due: List[ScheduleEntry] = []
+        while self._queue and self._queue[0][0] <= now:
+            _, _, entry = heapq.heappop(self._queue)
+            if not entry.cancelled:
+                due.append(entry)
+        return due
+
+    def _next_dispatch_time(self) -> Optional[datetime.datetime]:
+        """
+        Return the time at which the dispatcher thread should wake up next, or None if no job is queued.
+        """
+        while self._queue and self._queue[0][2].cancelled:
+            heapq.heappop(self._queue)
+        if not self._queue:
+            return None
+        return self._queue[0][0]
+
+    def _push(self, entry: ScheduleEntry) -> None:
+        self._enqueue(entry)
+        self._condition.notify()
+
+    def _cancel(self, entry: ScheduleEntry) -> None:
+        if entry.is_alive():
+            self._running_jobs_count -= 1
+        entry.cancelled = True
+        self._dequeue(entry)
+        self._condition.notify()
+
+    def submit(
+        self,
+        key: str,
+        func: Callable[..., Any],
+        cycle: Cycle,
+        weekday: Optional[Weekday] = None,
+        day: Optional[int] = None,
+        time: str = DEFAULT_TIME,
+        *args,
+        group: Optional[str] = None,
+        spread_window: Optional[float] = None,
+        **kwargs,
+    ) -> None:
+        """
+        Jobs with the same `group` are executed concurrently up to the limit of the execution pool.
+        `spread_window` overrides the default spread window of the scheduler for this job.
+        """
+        if spread_window is None:
+            spread_window = self.spread_window
+        else:
+            self._validate_spread_window(spread_window)
+        with self._condition:
+            if key in self.pool:
+                # discard the cancelled job if it exists
+                if self.pool[key].is_started() and not self.pool[key].is_alive():
+                    del self.pool[key]
+                else:
+                    raise DoruError(f"The key `{key}` is a duplicate.")
+
+            try:
+                job = schedule_job(self._builder, func, cycle, weekday, day, time, *args, **kwargs)
+            finally:
+                self._builder.clear()
+            offset = datetime.timedelta(seconds=spread_offset(key, spread_window))
+            self.pool[key] = ScheduleEntry(key, job, group, offset)
+
+    def start(self, key: str) -> None:
+        with self._condition:
+            if not self._is_startable():
+                raise DoruError("Cannot start a new job because the number of running jobs has reached the limit.")
+
+            entry = self.pool.get(key)
+            if entry is None:
+                logger.debug(f"The key `{key}` is missing.")
+                return
+            if entry.is_started():
+                logger.debug(f"The key `{key}` has already started.")
+                return
+
+            entry.started = True
+            self._running_jobs_count += 1
+            self._push(entry)
+            self._ensure_dispatcher()
+
+    def _ensure_dispatcher(self) -> None:
+        if self._thread is None and not self._stopped:
+            self._thread = Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def kill(self, key: str) -> None:
+        with self._condition:
+            try:
+                entry = self.pool.pop(key)
+            except KeyError:
+                logger.debug(f"The key `{key}` is missing.")
+                return
+            self._cancel(entry)
+
+    def next_run(self, key: str) -> Optional[datetime.datetime]:
+        """
+        Return the time at which the job is dispatched next, including its spread offset.
+        """
+        try:
+            return self.pool[key].dispatch_time
+        except KeyError:
+            logger.debug(f"The key `{key}` is missing.")
+        return None
+
+    def spread_offset(self, key: str) -> datetime.timedelta:
+        try:
+            return self.pool[key].offset
+        except KeyError:
+            logger.debug(f"The key `{key}` is missing.")
+        return datetime.timedelta()
+
+    def shutdown(self) -> None:
+        """
+        Stop the dispatcher thread. Jobs are not dispatched automatically after this method is called,
+        but they can still be executed by calling `run_pending`.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def idle_seconds(self) -> Optional[float]:
+        """
+        Return the number of seconds until the earliest job should run, or None if no job is running.
+        """
+        with self._condition:
+            next_dispatch_time = self._next_dispatch_time()
+            if next_dispatch_time is None:
+                return None
+            return (next_dispatch_time - datetime.datetime.now()).total_seconds()
+
+    def _pop_pending(self) -> List[ScheduleEntry]:
+        now = datetime.datetime.now()
+        with self._condition:
+            return self._pop_due(now)
+
+    def _run_job(self, entry: ScheduleEntry) -> None:
+        job = entry.job
+        try:
+            ret = job.run()
+        except Exception as e:
+            logger.error(f"Failed to run job: {str(e)}")
+            if not self.reschedule_on_failure:
+                logger.warning("The job was canceled.")
+                ret = CancelJob
+            else:
+                job.last_run = datetime.datetime.now()
+                job._schedule_next_run()
+                ret = None
+
+        with self._condition:
+            if entry.cancelled:
+                return
+            if isinstance(ret, CancelJob) or ret is CancelJob:
+                self._cancel(entry)
+            else:
+                self._push(entry)
+
+    def _execute(self, entry: ScheduleEntry, func: Callable[[], Any]) -> None:
+        try:
+            func()
+        except Exception as e:
+            logger.error(f"Failed to run job: {str(e)}")
+            if not self.reschedule_on_failure:
+                logger.warning("The job was canceled.")
+                with self._condition:
+                    if not entry.cancelled:
+                        self._cancel(entry)
+
+    def _advance(self, entry: ScheduleEntry) -> Optional[Callable[[], Any]]:
+        """
+        Reschedule the fired job for its next run and return the function to be executed now,
+        or None if the job should not be executed.
+        """
+        job = entry.job
+        now = datetime.datetime.now()
+        if job._is_overdue(now):
+            with self._condition:
+                if not entry.cancelled:
+                    self._cancel(entry)
+            return None
+
+        func = job.job_func
+        job.last_run = now
+        job._schedule_next_run()
+        with self._condition:
+            if entry.cancelled:
+                return None
+            if job._is_overdue(job.next_run):
+                self._cancel(entry)
+            else:
+                self._push(entry)
+        return func
+
+    def _dispatch_job(self, entry: ScheduleEntry, executor: ExecutionPool) -> None:
+        func = self._advance(entry)
+        if func is not None:
+            executor.submit(functools.partial(self._execute, entry, func), group=entry.group)
+
+    def run_pending(self) -> None:
+        for entry in self._pop_pending():
+            if self.executor is None:
+                self._run_job(entry)
+            else:
+                self._dispatch_job(entry, self.executor)
+
+    def _wait_pending(self) -> bool:
+        """
+        Block until some job should run. Return False if the dispatcher thread should exit.
+        """
+        with self._condition:
+            while not self._stopped and self._running_jobs_count > 0:
+                idle_seconds = self.idle_seconds()
+                if idle_seconds is not None and idle_seconds <= 0:
+                    return True
+                timeout = self.max_idle_seconds if idle_seconds is None else min(idle_seconds, self.max_idle_seconds)
+                self._condition.wait(timeout)
+            self._thread = None
+            return False
+
+    def _run(self) -> None:
+        while self._wait_pending():
+            self.run_pending()
+
+
+class TimingWheelScheduler(HeapScheduler):
+    """
+    An implementation of `HeapScheduler` that manages started jobs in a hierarchical timing wheel
+    instead of a priority queue.
+
+    The wheel consists of `LEVELS` levels of `SLOTS` slots. A slot at level `l` covers `SLOTS ** l` ticks of one second,
+    and jobs in it are moved down to a lower level when the time reaches the slot. Inserting and cancelling a job
+    takes O(1) time regardless of the number of jobs, and all the jobs due in a tick are fired in one batch.
+    Jobs are fired at the beginning of the second following their dispatch time at the latest.
+
+    The dispatcher thread wakes up when a job is due or a slot of a higher level has to be moved down,
+    so it may wake up without firing any job.
+    """
+
+    SLOTS = 64
+    LEVELS = 4
+
+    def __init__(
+        self,
+        max_running_jobs: int,
+        max_idle_seconds: float = 60,
+        reschedule_on_failure: bool = True,
+        executor: Optional[ExecutionPool] = None,
+        spread_window: float = 0,
+    ) -> None:
+        super().__init__(max_running_jobs, max_idle_seconds, reschedule_on_failure, executor, spread_window)
+        self._bits = (self.SLOTS - 1).bit_length()
+        self._wheel: List[List[Dict[ScheduleEntry, int]]] = [
+            [{} for _ in range(self.SLOTS)] for _ in range(self.LEVELS)
+        ]
+        # job -> (level, slot) of the wheel in which the job is
+        self._locations: Dict[ScheduleEntry, Tuple[int, int]] = {}
+        # jobs that became due when they were inserted or moved down
+        self._due: Dict[ScheduleEntry, None] = {}
+        # the last tick that has been processed
+        self._tick = self._to_tick(datetime.datetime.now()) - 1
+
+    @staticmethod
+    def _to_tick(time: datetime.datetime) -> int:
+        return int(time.timestamp())
+
+    def _insert(self, entry: ScheduleEntry, expires: int) -> None:
+        delta = expires - self._tick
+        if delta <= 0:
+            self._due[entry] = None
+            return
+        # The job is moved down again when it reaches the slot if the delta exceeds the range of the wheel.
+        delta = min(delta, self.SLOTS**self.LEVELS - 1)
+        level = 0
+        while delta >= self.SLOTS ** (level + 1):
+            level += 1
+        slot = ((self._tick + delta) >> (self._bits * level)) & (self.SLOTS - 1)
+        self._wheel[level][slot][entry] = expires
+        self._locations[entry] = (level, slot)
+
+    def _rewind(self, tick: int) -> None:
+        """
+        Set the current tick to `tick`, which is before the current one when the system clock is turned back.
+        """
+        entries = [(entry, self._wheel[level][slot][entry]) for entry, (level, slot) in self._locations.items()]
+        for level in self._wheel:
+            for slot in level:
+                slot.clear()
+        self._locations.clear()
+        self._tick = tick
+        for entry, expires in entries:
+            self._insert(entry, expires)
+
+    def _enqueue(self, entry: ScheduleEntry) -> None:
+        tick = self._to_tick(datetime.datetime.now()) - 1
+        if not self._locations and not self._due:
+            # Skip the ticks of the idle period at once.
+            self._tick = tick
+        elif tick < self._tick:
+            self._rewind(tick)
+        dispatch_time = entry.dispatch_time
+        expires = self._to_tick(dispatch_time)
+        if expires < dispatch_time.timestamp():
+            expires += 1
+        self._insert(entry, expires)
+
+    def _dequeue(self, entry: ScheduleEntry) -> None:
+        self._due.pop(entry, None)
+        location = self._locations.pop(entry, None)
+        if location is not None:
+            level, slot = location
+            del self._wheel[level][slot][entry]
+
+    def _next_event_tick(self) -> Optional[int]:
+        """
+        Return the earliest tick at which a job is due or a slot of a higher level has to be moved down.
+        """
+        if not self._locations:
+            return None
+        earliest: Optional[int] = None
+        for level in range(self.LEVELS):
+            shift = self._bits * level
+            base = self._tick >> shift
+            # Jobs in the slot of the current tick at a higher level are moved down a whole round later.
+            for i in range(1, self.SLOTS + 1):
+                if self._wheel[level][(base + i) & (self.SLOTS - 1)]:
+                    tick = (base + i) << shift
+                    if earliest is None or tick < earliest:
+                        earliest = tick
+                    break
+        return earliest
+
+    def _process(self, tick: int) -> None:
+        self._tick = tick
+        # Move down the slots reached at higher levels first, and then fire the slot of the lowest level.
+        for level in range(self.LEVELS - 1, -1, -1):
+            shift = self._bits * level
+            if level > 0 and tick & ((1 << shift) - 1):
+                continue
+            slot = self._wheel[level][(tick >> shift) & (self.SLOTS - 1)]
+            if not slot:
+                continue
+            entries = list(slot.items())
+            slot.clear()
+            for entry, expires in entries:
+                del self._locations[entry]
+                self._insert(entry, expires)
+
+    def _pop_due(self, now: datetime.datetime) -> List[ScheduleEntry]:
+        target = self._to_tick(now)
+        if target < self._tick:
+            self._rewind(target)
+        while self._tick < target:
+            tick = self._next_event_tick()
+            if tick is None or tick > target:
+                self._tick = target
+                break
+            self._process(tick)
+        due = [entry for entry in self._due if not entry.cancelled]
+        self._due.clear()
+        return due
+
+    def _next_dispatch_time(self) -> Optional[datetime.datetime]:
+        if self._due:
+            return datetime.datetime.fromtimestamp(self._tick)
+        tick = self._next_event_tick()
+        if tick is None:
+            return None
+        return datetime.datetime.fromtimestamp(tick)
+
+
+def _is_coroutine_function(func: Callable[..., Any]) -> bool:
+    while isinstance(func, functools.partial):
+        func = func.func
+    return asyncio.iscoroutinefunction(func)
+
+
+class AsyncScheduler(HeapScheduler):
+    """
+    An implementation of `HeapScheduler` whose dispatcher runs as a task in an asyncio event loop
+    instead of a thread. The dispatcher is started by awaiting `run` in the event loop, e.g. in the lifespan
+    of the application, and jobs started before that are dispatched once it is started.
+
+    Coroutine functions are executed as tasks in the event loop, so waiting jobs do not occupy threads.
+    Other functions are executed by the execution pool, or by the default executor of the event loop if
+    no execution pool is given.
+
+    Jobs can be started and killed from any thread.
+    """
+
+    def __init__(
+        self,
+        max_running_jobs: int,
+        max_idle_seconds: float = 60,
+        reschedule_on_failure: bool = True,
+        executor: Optional[ExecutionPool] = None,
+        spread_window: float = 0,
+    ) -> None:
+        super().__init__(max_running_jobs, max_idle_seconds, reschedule_on_failure, executor, spread_window)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._semaphores: Dict[Optional[str], asyncio.Semaphore] = {}
+
+    def _ensure_dispatcher(self) -> None:
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None:
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def _push(self, entry: ScheduleEntry) -> None:
+        super()._push(entry)
+        self._ensure_dispatcher()
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        self._ensure_dispatcher()
+
+    def _semaphore(self, group: Optional[str]) -> Optional[asyncio.Semaphore]:
+        if self.executor is None or self.executor.max_jobs_per_group is None:
+            return None
+        if group not in self._semaphores:
+            self._semaphores[group] = asyncio.Semaphore(self.executor.max_jobs_per_group)
+        return self._semaphores[group]
+
+    async def _execute_async(self, entry: ScheduleEntry, func: Callable[[], Any]) -> None:
+        semaphore = self._semaphore(entry.group)
+        try:
+            if semaphore is None:
+                await func()
+            else:
+                async with semaphore:
+                    await func()
+        except Exception as e:
+            logger.error(f"Failed to run job: {str(e)}")
+            if not self.reschedule_on_failure:
+                logger.warning("The job was canceled.")
+                with self._condition:
+                    if not entry.cancelled:
+                        self._cancel(entry)
+
+    def _dispatch_async(self, entry: ScheduleEntry, loop: asyncio.AbstractEventLoop) -> None:
+        func = self._advance(entry)
+        if func is None:
+            return
+        if _is_coroutine_function(func):
+            task = loop.create_task(self._execute_async(entry, func))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif self.executor is not None:
+            self.executor.submit(functools.partial(self._execute, entry, func), group=entry.group)
+        else:
+            loop.run_in_executor(None, functools.partial(self._execute, entry, func))
+
+    async def run(self) -> None:
+        """
+        Dispatch jobs in the running event loop until `shutdown` is called.
+        The jobs being executed in the event loop are cancelled when this coroutine exits.
+        """
+        loop = asyncio.get_event_loop()
+        with self._condition:
+            if self._loop is not None:
+                raise DoruError("The scheduler is already running.")
+            self._loop = loop
+            self._wakeup = wakeup = asyncio.Event()
+        try:
+            while not self._stopped:
+                wakeup.clear()
+                idle_seconds = self.idle_seconds()
+                if idle_seconds is not None and idle_seconds <= 0:
+                    for entry in self._pop_pending():
+                        self._dispatch_async(entry, loop)
+                    continue
+                timeout = self.max_idle_seconds if idle_seconds is None else min(idle_seconds, self.max_idle_seconds)
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._condition:
+                self._loop = None
+                self._wakeup = None
+            self._semaphores.clear()
+            for task in list(self._tasks):
+                task.cancel()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
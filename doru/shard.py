@@ -0,0 +1,303 @@
+import datetime
+import functools
+import multiprocessing
+import sys
+import zlib
+from logging import getLogger
+from multiprocessing.connection import Connection
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from doru.exceptions import DoruError
+from doru.scheduler import DEFAULT_TIME, ExecutionPool, HeapScheduler, PoolStats
+from doru.type import Cycle, Weekday
+
+logger = getLogger(__name__)
+
+
+def shard_of(group: Optional[str], shards: int) -> int:
+    """
+    Return the index of the shard to which the jobs of `group` are assigned.
+    The hash is stable across processes unlike the built-in `hash` of strings.
+    """
+    return zlib.crc32((group or "").encode()) % shards
+
+
+def _run_job(
+    events: Any, key: str, run_at: Optional[datetime.datetime], func: Callable[..., Any], *args, **kwargs
+) -> Any:
+    # Notify the parent process of the run before executing the job.
+    events.put((key, run_at or datetime.datetime.now()))
+    return func(*args, **kwargs)
+
+
+def _serve(
+    conn: Connection,
+    events: Any,
+    max_workers: int,
+    max_jobs_per_group: Optional[int],
+    spread_window: float,
+) -> None:
+    """
+    The main function of a shard process. It executes the calls sent from the parent process one by one.
+    """
+    executor = ExecutionPool(max_workers=max_workers, max_jobs_per_group=max_jobs_per_group)
+    # The number of running jobs is limited by the parent process.
+    scheduler = HeapScheduler(max_running_jobs=sys.maxsize, executor=executor, spread_window=spread_window)
+
+    def execute(key: str, func: Callable[..., Any], *args, run_at=None, group=None, **kwargs) -> None:
+        executor.submit(functools.partial(_run_job, events, key, run_at, func, *args, **kwargs), group=group)
+
+    def submit(key: str, func: Callable[..., Any], *args, **kwargs) -> None:
+        scheduler.submit(key, functools.partial(_run_job, events, key, None, func), *args, **kwargs)
+
+    def shutdown() -> None:
+        scheduler.shutdown()
+        # The workers are daemon threads, so they are joined to let the running jobs finish before the process exits.
+        executor.shutdown(wait=True)
+
+    methods: Dict[str, Callable[..., Any]] = {
+        "submit": submit,
+        "start": scheduler.start,
+        "kill": scheduler.kill,
+        "next_run": scheduler.next_run,
+        "spread_offset": scheduler.spread_offset,
+        "execute": execute,
+        "stats": executor.stats,
+        "shutdown": shutdown,
+    }
+    while True:
+        try:
+            method, args, kwargs = conn.recv()
+        except EOFError:
+            break
+        try:
+            result = methods[method](*args, **kwargs)
+        except Exception as e:
+            conn.send((False, e))
+        else:
+            conn.send((True, result))
+        if method == "shutdown":
+            break
+    shutdown()
+
+
+class Shard:
+    """
+    A worker process that owns a scheduler and an execution pool, and the connection to it.
+    """
+
+    def __init__(self, process: Any, conn: Connection) -> None:
+        self.process = process
+        self.conn = conn
+        self.lock = Lock()
+
+    def call(self, method: str, *args, **kwargs) -> Any:
+        with self.lock:
+            self.conn.send((method, args, kwargs))
+            ok, result = self.conn.recv()
+        if not ok:
+            raise result
+        return result
+
+
+class ShardEntry:
+    """
+    A job managed by `ShardedScheduler` together with the index of the shard to which it is assigned.
+    The interface for checking the state is the same as `ScheduleEntry`.
+    """
+
+    __slots__ = ("key", "shard", "started")
+
+    def __init__(self, key: str, shard: int) -> None:
+        self.key = key
+        self.shard = shard
+        self.started = False
+
+    def is_started(self) -> bool:
+        return self.started
+
+    def is_alive(self) -> bool:
+        return self.started
+
+
+class ShardedScheduler:
+    """
+    An implementation of a class that distributes scheduled jobs over worker processes by the hash of their group
+    (e.g. the exchange name). Each process owns a scheduler and an execution pool, so the jobs of different groups
+    are executed on different cores without contending for the GIL.
+
+    The interface is the same as `HeapScheduler`, but the functions and the arguments of jobs should be picklable,
+    and they are executed in the worker processes. `on_run` is called with the key and the run time in the parent
+    process each time a job is executed.
+    """
+
+    pool: Dict[str, ShardEntry]
+
+    def __init__(
+        self,
+        shards: int,
+        max_running_jobs: int,
+        max_workers: int,
+        max_jobs_per_group: Optional[int] = None,
+        spread_window: float = 0,
+        on_run: Optional[Callable[[str, datetime.datetime], None]] = None,
+    ) -> None:
+        if shards < 1:
+            raise DoruError("The number of shards should be more than 0.")
+        self.max_running_jobs = max_running_jobs
+        self.on_run = on_run
+        self.pool = {}
+        self._running_jobs_count = 0
+        self._stopped = False
+        self._lock = Lock()
+        # Processes are spawned rather than forked because the parent process runs threads.
+        context = multiprocessing.get_context("spawn")
+        self._events: Any = context.Queue()
+        self._shards: List[Shard] = []
+        for _ in range(shards):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_serve,
+                args=(child_conn, self._events, max_workers, max_jobs_per_group, spread_window),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._shards.append(Shard(process, parent_conn))
+        self._listener = Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    @property
+    def running_jobs_count(self) -> int:
+        return self._running_jobs_count
+
+    def _listen(self) -> None:
+        while True:
+            event: Optional[Tuple[str, datetime.datetime]] = self._events.get()
+            if event is None:
+                return
+            if self.on_run is not None:
+                try:
+                    self.on_run(*event)
+                except Exception as e:
+                    logger.error(f"Failed to handle the run of a job: {str(e)}")
+
+    def _shard(self, key: str) -> Optional[Shard]:
+        entry = self.pool.get(key)
+        if entry is None:
+            logger.debug(f"The key `{key}` is missing.")
+            return None
+        return self._shards[entry.shard]
+
+    def submit(
+        self,
+        key: str,
+        func: Callable[..., Any],
+        cycle: Cycle,
+        weekday: Optional[Weekday] = None,
+        day: Optional[int] = None,
+        time: str = DEFAULT_TIME,
+        *args,
+        group: Optional[str] = None,
+        spread_window: Optional[float] = None,
+        **kwargs,
+    ) -> None:
+        with self._lock:
+            if key in self.pool:
+                raise DoruError(f"The key `{key}` is a duplicate.")
+            index = shard_of(group, len(self._shards))
+            self._shards[index].call(
+                "submit",
+                key,
+                func,
+                cycle,
+                weekday,
+                day,
+                time,
+                *args,
+                group=group,
+                spread_window=spread_window,
+                **kwargs,
+            )
+            self.pool[key] = ShardEntry(key, index)
+
+    def start(self, key: str) -> None:
+        with self._lock:
+            if self.running_jobs_count >= self.max_running_jobs:
+                raise DoruError("Cannot start a new job because the number of running jobs has reached the limit.")
+            shard = self._shard(key)
+            if shard is None or self.pool[key].is_started():
+                return
+            shard.call("start", key)
+            self.pool[key].started = True
+            self._running_jobs_count += 1
+
+    def kill(self, key: str) -> None:
+        with self._lock:
+            shard = self._shard(key)
+            if shard is None:
+                return
+            shard.call("kill", key)
+            if self.pool.pop(key).is_alive():
+                self._running_jobs_count -= 1
+
+    def next_run(self, key: str) -> Optional[datetime.datetime]:
+        shard = self._shard(key)
+        return None if shard is None else shard.call("next_run", key)
+
+    def spread_offset(self, key: str) -> datetime.timedelta:
+        shard = self._shard(key)
+        return datetime.timedelta() if shard is None else shard.call("spread_offset", key)
+
+    def execute(
+        self,
+        key: str,
+        func: Callable[..., Any],
+        *args,
+        run_at: Optional[datetime.datetime] = None,
+        group: Optional[str] = None,
+        **kwargs,
+    ) -> None:
+        """
+        Execute a job once in the shard of `group` regardless of the schedule.
+        `on_run` is called with `run_at` instead of the current time.
+        """
+        self._shards[shard_of(group, len(self._shards))].call(
+            "execute", key, func, *args, run_at=run_at, group=group, **kwargs
+        )
+
+    def stats(self) -> PoolStats:
+        """
+        Return the statistics of the execution pools of all the shards added together.
+        """
+        stats: List[PoolStats] = [shard.call("stats") for shard in self._shards]
+        max_workers = sum(s["max_workers"] for s in stats)
+        active_workers = sum(s["active_workers"] for s in stats)
+        return PoolStats(
+            max_workers=max_workers,
+            workers=sum(s["workers"] for s in stats),
+            active_workers=active_workers,
+            queue_depth=sum(s["queue_depth"] for s in stats),
+            utilization=active_workers / max_workers,
+            busy_seconds=sum(s["busy_seconds"] for s in stats),
+            completed=sum(s["completed"] for s in stats),
+        )
+
+    def shutdown(self) -> None:
+        """
+        Stop the shard processes after their running jobs finish. Pending jobs are discarded.
+        The scheduler is stopped only once.
+        """
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        for shard in self._shards:
+            try:
+                shard.call("shutdown")
+            except (EOFError, OSError) as e:
+                logger.warning(f"Failed to stop the shard process: {str(e)}")
+            shard.process.join()
+        self._events.put(None)
+        self._listener.join()
@@ -0,0 +1,373 @@
+"""
+A simulated exchange that can be selected with the exchange name `simulated`, so that the daemon can be run and
+load-tested without network.
+
+The behavior is configured by `DORU_SIMULATOR` with comma-separated `key=value` pairs.
+- latency: time taken by each request
+- fill_delay: time from the creation of an order until it is filled
+- error_rate: probability that a request fails with a network error
+- rate_limit: maximum number of requests per second, beyond which requests fail with a rate limit error
+- markets: number of spot markets
+- seed: seed of the random numbers
+
+The times are distributions in seconds written as `<value>` (fixed), `uniform:<min>:<max>`,
+`exponential:<mean>` or `lognormal:<median>:<sigma>`.
+e.g. `latency=lognormal:0.05:0.5,fill_delay=uniform:1:30,error_rate=0.01,rate_limit=20,markets=2000`
+"""
+import asyncio
+import math
+import random
+import time
+import zlib
+from collections import deque
+from logging import getLogger
+from threading import Lock
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+import ccxt
+import ccxt.async_support
+
+from doru.envs import DORU_SIMULATOR
+
+logger = getLogger(__name__)
+
+SIMULATED_EXCHANGE = "simulated"
+QUOTE = "USDT"
+SPREAD = 0.001
+
+
+class Distribution(NamedTuple):
+    kind: str
+    a: float
+    b: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "exponential":
+            return rng.expovariate(1 / self.a) if self.a > 0 else 0.0
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(self.a), self.b) if self.a > 0 else 0.0
+        return self.a
+
+    @classmethod
+    def parse(cls, value: str) -> "Distribution":
+        kind, *params = value.split(":")
+        if not params:
+            distribution = cls("fixed", float(kind))
+        elif kind in ("uniform", "lognormal") and len(params) == 2:
+            distribution = cls(kind, float(params[0]), float(params[1]))
+        elif kind == "exponential" and len(params) == 1:
+            distribution = cls(kind, float(params[0]))
+        else:
+            raise ValueError(f"Invalid distribution: {value}")
+        if distribution.a < 0 or distribution.b < 0 or (kind == "uniform" and distribution.b < distribution.a):
+            raise ValueError(f"Invalid distribution: {value}")
+        return distribution
+
+
+class SimulatorConfig(NamedTuple):
+    latency: Distribution = Distribution("fixed", 0.0)
+    fill_delay: Distribution = Distribution("fixed", 0.0)
+    error_rate: float = 0.0
+    # 0 for no limit
+    rate_limit: float = 0.0
+    markets: int = 100
+    seed: Optional[int] = None
+
+
+def parse_simulator_config(value: str) -> SimulatorConfig:
+    """
+    Parse the comma-separated `key=value` pairs of the configuration. The keys not given take the default values.
+    """
+    options: Dict[str, Any] = {}
+    for item in filter(None, (v.strip() for v in value.split(","))):
+        key, _, raw = item.partition("=")
+        if key in ("latency", "fill_delay"):
+            options[key] = Distribution.parse(raw)
+        elif key in ("error_rate", "rate_limit"):
+            options[key] = float(raw)
+        elif key in ("markets", "seed"):
+            options[key] = int(raw)
+        else:
+            raise ValueError(f"Unknown simulator option: {key}")
+    config = SimulatorConfig(**options)
+    if not 0 <= config.error_rate <= 1 or config.rate_limit < 0 or config.markets < 1:
+        raise ValueError(f"Invalid simulator configuration: {value}")
+    return config
+
+
+class SimulatedVenue:
+    """
+    The state of the simulated exchange shared by all its clients in the process.
+    """
+
+    def __init__(self, config: SimulatorConfig = SimulatorConfig()) -> None:
+        self.config = config
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(config.seed)
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        # the time at which each order is filled
+        self._fill_at: Dict[str, float] = {}
+        self._request_times: Deque[float] = deque()
+        self._lock = Lock()
+        symbols = ["BTC/USDT", "ETH/USDT"] + [f"SIM{i}/{QUOTE}" for i in range(config.markets)]
+        self.symbols = symbols[: config.markets]
+
+    def request(self) -> float:
+        """
+        Count a request and return the number of seconds it takes, or raise the error injected into it.
+        """
+        with self._lock:
+            self.requests += 1
+            if self.config.rate_limit > 0:
+                now = time.monotonic()
+                while self._request_times and now - self._request_times[0] >= 1:
+                    self._request_times.popleft()
+                if len(self._request_times) >= self.config.rate_limit:
+                    self.errors += 1
+                    raise ccxt.RateLimitExceeded(f"{SIMULATED_EXCHANGE} rate limit exceeded")
+                self._request_times.append(now)
+            if self.config.error_rate > 0 and self._rng.random() < self.config.error_rate:
+                self.errors += 1
+                raise ccxt.NetworkError(f"{SIMULATED_EXCHANGE} simulated network error")
+            return self.config.latency.sample(self._rng)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "orders": len(self._orders)}
+
+    def markets(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": symbol.replace("/", ""),
+                "symbol": symbol,
+                "base": symbol.split("/")[0],
+                "quote": QUOTE,
+                "type": "spot",
+                "spot": True,
+                "active": True,
+                "precision": {"amount": 8, "price": 8},
+                "limits": {"amount": {"min": 1e-8, "max": None}},
+            }
+            for symbol in self.symbols
+        ]
+
+    def _price(self, symbol: str) -> float:
+        if symbol not in self.symbols:
+            raise ccxt.BadSymbol(f"{SIMULATED_EXCHANGE} does not have market symbol {symbol}")
+        # A stable price for each symbol
+        return float(10 ** (zlib.crc32(symbol.encode()) % 5))
+
+    def ticker(self, symbol: str) -> Dict[str, Any]:
+        price = self._price(symbol)
+        timestamp = int(time.time() * 1000)
+        return {
+            "symbol": symbol,
+            "timestamp": timestamp,
+            "datetime": ccxt.Exchange.iso8601(timestamp),
+            "bid": price * (1 - SPREAD / 2),
+            "ask": price * (1 + SPREAD / 2),
+            "last": price,
+            "close": price,
+        }
+
+    def create_order(self, symbol: str, type: str, side: str, amount: float, price: Optional[float]) -> Dict[str, Any]:
+        market_price = self._price(symbol)
+        if price is None:
+            price = market_price
+        now = time.time()
+        with self._lock:
+            id = str(len(self._orders) + 1)
+            self._orders[id] = {
+                "id": id,
+                "clientOrderId": None,
+                "timestamp": int(now * 1000),
+                "datetime": ccxt.Exchange.iso8601(int(now * 1000)),
+                "lastTradeTimestamp": None,
+                "symbol": symbol,
+                "type": type,
+                "side": side,
+                "price": price,
+                "amount": amount,
+                "filled": 0.0,
+                "remaining": amount,
+                "cost": 0.0,
+                "average": None,
+                "status": "open",
+                "fee": None,
+                "trades": [],
+            }
+            self._fill_at[id] = now + self.config.fill_delay.sample(self._rng)
+            return dict(self._orders[id])
+
+    def _update(self, id: str) -> Dict[str, Any]:
+        order = self._orders.get(id)
+        if order is None:
+            raise ccxt.OrderNotFound(f"{SIMULATED_EXCHANGE} order {id} not found")
+        fill_at = self._fill_at[id]
+        if order["status"] == "open" and time.time() >= fill_at:
+            order.update(
+                status="closed",
+                filled=order["amount"],
+                remaining=0.0,
+                cost=order["amount"] * order["price"],
+                average=order["price"],
+                lastTradeTimestamp=int(fill_at * 1000),
+            )
+        return dict(order)
+
+    def fetch_order(self, id: str) -> Dict[str, Any]:
+        with self._lock:
+            return self._update(id)
+
+    def fetch_orders(
+        self, symbol: Optional[str], since: Optional[int], open_only: bool = False
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            orders = [
+                self._update(id)
+                for id, o in self._orders.items()
+                if (symbol is None or o["symbol"] == symbol) and (since is None or o["timestamp"] >= since)
+            ]
+        return [o for o in orders if o["status"] == "open"] if open_only else orders
+
+    def cancel_order(self, id: str) -> Dict[str, Any]:
+        with self._lock:
+            order = self._update(id)
+            if order["status"] != "open":
+                raise ccxt.OrderNotFound(f"{SIMULATED_EXCHANGE} order {id} is already {order['status']}")
+            self._orders[id]["status"] = "canceled"
+            return dict(self._orders[id])
+
+
+def _create_venue() -> SimulatedVenue:
+    try:
+        return SimulatedVenue(parse_simulator_config(DORU_SIMULATOR))
+    except ValueError as e:
+        logger.warning(f"The default simulator is used because of an invalid configuration: {e}")
+        return SimulatedVenue()
+
+
+venue = _create_venue()
+
+
+def _describe(base: Dict[str, Any]) -> Dict[str, Any]:
+    rate_limit = venue.config.rate_limit
+    return ccxt.Exchange.deep_extend(
+        base,
+        {
+            "id": SIMULATED_EXCHANGE,
+            "name": "Simulated",
+            "rateLimit": 1000 / rate_limit if rate_limit > 0 else 0,
+            "precisionMode": ccxt.DECIMAL_PLACES,
+            "has": {
+                "fetchMarkets": True,
+                "fetchTicker": True,
+                "fetchTickers": True,
+                "createOrder": True,
+                "fetchOrder": True,
+                "fetchOrders": True,
+                "fetchOpenOrders": True,
+                "cancelOrder": True,
+            },
+        },
+    )
+
+
+class simulated(ccxt.Exchange):
+    """
+    The ccxt client of the simulated exchange. Each request takes the simulated latency.
+    """
+
+    def describe(self) -> Dict[str, Any]:
+        return _describe(super().describe())
+
+    def _simulate(self) -> None:
+        # The requests are throttled like the HTTP requests of ccxt, which the simulated ones replace.
+        if self.enableRateLimit:
+            self.throttle()
+        latency = venue.request()
+        if latency > 0:
+            time.sleep(latency)
+
+    def fetch_markets(self, params={}):
+        self._simulate()
+        return venue.markets()
+
+    def fetch_ticker(self, symbol, params={}):
+        self._simulate()
+        return venue.ticker(symbol)
+
+    def fetch_tickers(self, symbols=None, params={}):
+        self._simulate()
+        return {s: venue.ticker(s) for s in (symbols or venue.symbols)}
+
+    def create_order(self, symbol, type, side, amount, price=None, params={}):
+        self._simulate()
+        return venue.create_order(symbol, type, side, amount, price)
+
+    def fetch_order(self, id, symbol=None, params={}):
+        self._simulate()
+        return venue.fetch_order(id)
+
+    def fetch_orders(self, symbol=None, since=None, limit=None, params={}):
+        self._simulate()
+        return venue.fetch_orders(symbol, since)
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        self._simulate()
+        return venue.fetch_orders(symbol, since, open_only=True)
+
+    def cancel_order(self, id, symbol=None, params={}):
+        self._simulate()
+        return venue.cancel_order(id)
+
+
+class async_simulated(ccxt.async_support.Exchange):
+    """
+    The asyncio counterpart of `simulated`.
+    """
+
+    def describe(self) -> Dict[str, Any]:
+        return _describe(super().describe())
+
+    async def _simulate(self) -> None:
+        if self.enableRateLimit:
+            await self.throttle()
+        latency = venue.request()
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+    async def fetch_markets(self, params={}):
+        await self._simulate()
+        return venue.markets()
+
+    async def fetch_ticker(self, symbol, params={}):
+        await self._simulate()
+        return venue.ticker(symbol)
+
+    async def fetch_tickers(self, symbols=None, params={}):
+        await self._simulate()
+        return {s: venue.ticker(s) for s in (symbols or venue.symbols)}
+
+    async def create_order(self, symbol, type, side, amount, price=None, params={}):
+        await self._simulate()
+        return venue.create_order(symbol, type, side, amount, price)
+
+    async def fetch_order(self, id, symbol=None, params={}):
+        await self._simulate()
+        return venue.fetch_order(id)
+
+    async def fetch_orders(self, symbol=None, since=None, limit=None, params={}):
+        await self._simulate()
+        return venue.fetch_orders(symbol, since)
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        await self._simulate()
+        return venue.fetch_orders(symbol, since, open_only=True)
+
+    async def cancel_order(self, id, symbol=None, params={}):
+        await self._simulate()
+        return venue.cancel_order(id)
@@ -0,0 +1,89 @@
+import difflib
+import re
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SEPARATORS = re.compile(r"[/\-_:\s]")
+
+
+def normalize(symbol: str) -> str:
+    """
+    Return the key of a symbol regardless of its case and separators, e.g. `BTCUSDT` for `btc-usdt`.
+    """
+    return SEPARATORS.sub("", symbol).upper()
+
+
+class SymbolIndex:
+    """
+    An index of the spot symbols of an exchange, which answers the membership of a symbol in constant time and
+    suggests the symbols close to an unknown one.
+    """
+
+    def __init__(self, symbols: Iterable[str]) -> None:
+        self.symbols = frozenset(symbols)
+        # normalized key -> symbol
+        self.keys: Dict[str, str] = {}
+        self.bases: Dict[str, List[str]] = {}
+        self.quotes: Dict[str, List[str]] = {}
+        for symbol in sorted(self.symbols):
+            base, _, quote = symbol.partition("/")
+            self.keys.setdefault(normalize(symbol), symbol)
+            self.bases.setdefault(base.upper(), []).append(symbol)
+            self.quotes.setdefault(quote.upper(), []).append(symbol)
+
+    def __contains__(self, symbol: object) -> bool:
+        return symbol in self.symbols
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def resolve(self, symbol: str) -> Optional[str]:
+        """
+        Return the symbol written as `symbol` with any case and separators, or None if it is not listed.
+        """
+        return symbol if symbol in self.symbols else self.keys.get(normalize(symbol))
+
+    def filter(self, base: Optional[str] = None, quote: Optional[str] = None) -> List[str]:
+        """
+        Return the sorted symbols of `base` and `quote` if given.
+        """
+        if base is not None:
+            symbols = self.bases.get(base.upper(), [])
+            return [s for s in symbols if quote is None or s.partition("/")[2].upper() == quote.upper()]
+        if quote is not None:
+            return list(self.quotes.get(quote.upper(), []))
+        return sorted(self.symbols)
+
+    def suggest(self, symbol: str, n: int = 5) -> List[str]:
+        """
+        Return up to `n` listed symbols close to `symbol`, the same symbol written differently and the symbols of
+        the same base currency first.
+        """
+        key = normalize(symbol)
+        base = SEPARATORS.split(symbol, 1)[0].upper()
+        candidates: List[str] = []
+        resolved = self.keys.get(key)
+        if resolved is not None:
+            candidates.append(resolved)
+        candidates += sorted(
+            self.bases.get(base, []), key=lambda s: -difflib.SequenceMatcher(None, key, normalize(s)).ratio()
+        )
+        candidates += [self.keys[k] for k in difflib.get_close_matches(key, self.keys, n=n)]
+        return list(dict.fromkeys(candidates))[:n]
+
+
+_indexes: Dict[str, Tuple[Dict[str, Any], SymbolIndex]] = {}
+_lock = Lock()
+
+
+def index_of(exchange: str, markets: Dict[str, Any]) -> SymbolIndex:
+    """
+    Return the index of the symbols of `markets`, which is built once for each set of the markets of `exchange`
+    loaded from the market cache.
+    """
+    with _lock:
+        entry = _indexes.get(exchange)
+        if entry is None or entry[0] is not markets:
+            entry = (markets, SymbolIndex(markets))
+            _indexes[exchange] = entry
+        return entry[1]
@@ -0,0 +1,137 @@
+import datetime
+import heapq
+import zlib
+from typing import Counter, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from doru.exceptions import DoruError
+from doru.type import Cycle, Weekday
+
+WEEKDAYS: Tuple[Weekday, ...] = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# (cycle, weekday, day, time)
+Spec = Tuple[Cycle, Optional[Weekday], Optional[int], str]
+
+
+def _parse_time(time: str) -> Tuple[int, int]:
+    hour, minute = time.split(":")
+    return int(hour), int(minute)
+
+
+def add_months(time: datetime.datetime, months: int) -> datetime.datetime:
+    """
+    Return the same day and time `months` months later. The day should exist in that month.
+    """
+    index = time.year * 12 + (time.month - 1) + months
+    return time.replace(year=index // 12, month=index % 12 + 1)
+
+
+def next_run_time(
+    cycle: Cycle,
+    time: str,
+    weekday: Optional[Weekday] = None,
+    day: Optional[int] = None,
+    after: Optional[datetime.datetime] = None,
+) -> datetime.datetime:
+    """
+    Return the earliest run time at or after `after` (now by default) of a task with the specified schedule.
+
+    The result is calculated directly from the schedule, so it does not depend on the previous run time.
+    The day of monthly tasks should be between 1 and 28, which exists in every month.
+    """
+    if after is None:
+        after = datetime.datetime.now()
+    hour, minute = _parse_time(time)
+    candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+    if cycle == "Daily":
+        if candidate < after:
+            candidate += datetime.timedelta(days=1)
+        return candidate
+    elif cycle == "Weekly":
+        if weekday is None:
+            raise DoruError("The weekday parameter should not be None in the weekly schedule.")
+        candidate += datetime.timedelta(days=(WEEKDAYS.index(weekday) - after.weekday()) % 7)
+        if candidate < after:
+            candidate += datetime.timedelta(days=7)
+        return candidate
+    elif cycle == "Monthly":
+        if day is None:
+            raise DoruError("The day parameter should not be None in the monthly schedule.")
+        candidate = candidate.replace(day=day)
+        if candidate < after:
+            candidate = add_months(candidate, 1)
+        return candidate
+    raise DoruError(f"The cycle `{cycle}` is not supported.")
+
+
+def iter_run_times(
+    cycle: Cycle,
+    time: str,
+    weekday: Optional[Weekday] = None,
+    day: Optional[int] = None,
+    after: Optional[datetime.datetime] = None,
+) -> Iterator[datetime.datetime]:
+    """
+    Yield the run times at or after `after` (now by default) of a task with the specified schedule in order.
+    """
+    first = next_run_time(cycle, time, weekday, day, after)
+    if cycle == "Monthly":
+        months = 0
+        while True:
+            yield add_months(first, months)
+            months += 1
+    period = datetime.timedelta(days=1 if cycle == "Daily" else 7)
+    run_time = first
+    while True:
+        yield run_time
+        run_time += period
+
+
+def upcoming_runs(
+    schedules: Iterable[Tuple[Hashable, Spec]],
+    start: datetime.datetime,
+    end: datetime.datetime,
+) -> List[Tuple[datetime.datetime, Hashable]]:
+    """
+    Return the run times in [start, end) of all the given `(key, (cycle, weekday, day, time))` schedules,
+    sorted by the run time.
+
+    The run times are calculated once per distinct schedule and shared by all the keys with that schedule,
+    so the cost mainly depends on the number of distinct schedules rather than the number of tasks.
+    """
+    keys_by_spec: Dict[Spec, List[Hashable]] = {}
+    for key, spec in schedules:
+        keys_by_spec.setdefault(spec, []).append(key)
+
+    runs_by_spec: List[List[Tuple[datetime.datetime, Hashable]]] = []
+    for spec, keys in keys_by_spec.items():
+        cycle, weekday, day, time = spec
+        runs: List[Tuple[datetime.datetime, Hashable]] = []
+        for run_time in iter_run_times(cycle, time, weekday, day, start):
+            if run_time >= end:
+                break
+            runs.extend((run_time, key) for key in keys)
+        runs_by_spec.append(runs)
+    return list(heapq.merge(*runs_by_spec, key=lambda run: run[0]))
+
+
+def spread_offset(key: str, window: float) -> float:
+    """
+    Return the offset in seconds in [0, window) by which the run of the job with `key` is delayed.
+
+    The offset is derived from a hash of the key, so jobs sharing a run time are spread evenly over the window
+    and each job keeps the same offset across restarts.
+    """
+    if window <= 0:
+        return 0.0
+    return zlib.crc32(key.encode()) / 2**32 * window
+
+
+def load_per_second(runs: Iterable[Tuple[datetime.datetime, Hashable]]) -> Dict[Hashable, Counter[datetime.datetime]]:
+    """
+    Count the `(run_time, group)` runs per group and per second.
+    """
+    load: Dict[Hashable, Counter[datetime.datetime]] = {}
+    for run_time, group in runs:
+        load.setdefault(group, Counter())[run_time.replace(microsecond=0)] += 1
+    return load
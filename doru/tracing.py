@@ -0,0 +1,136 @@
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from typing_extensions import TypedDict
+
+from doru.envs import DORU_SPAN_BUFFER_SIZE
+
+
+class Span(TypedDict):
+    # the ID of the task whose run the phase belongs to, or the IDs joined by commas for aggregated orders
+    run: Optional[str]
+    exchange: str
+    symbol: Optional[str]
+    phase: str
+    # the epoch time at which the phase started
+    started_at: float
+    seconds: float
+    succeeded: bool
+
+
+class PhaseLatency(TypedDict):
+    exchange: str
+    phase: str
+    count: int
+    failures: int
+    mean_seconds: float
+    p50_seconds: float
+    p90_seconds: float
+    p99_seconds: float
+    max_seconds: float
+
+
+_run: ContextVar[Optional[str]] = ContextVar("doru_run", default=None)
+
+
+class SpanRecorder:
+    """
+    A ring buffer of the timing spans of the phases of orders (e.g. fetching the ticker or waiting for the fill),
+    which keeps the last `size` spans in memory.
+
+    The spans are attributed to the task run entered with `run` in the same thread or coroutine. The spans of the
+    runs executed at the same time are kept apart because each run is executed in its own worker thread or task.
+    """
+
+    def __init__(self, size: int = DORU_SPAN_BUFFER_SIZE) -> None:
+        self.spans: Deque[Span] = deque(maxlen=size)
+        self._lock = Lock()
+
+    @staticmethod
+    @contextmanager
+    def run(id: str) -> Iterator[None]:
+        """
+        Attribute the spans recorded in the block to the run of the task.
+        """
+        token = _run.set(id)
+        try:
+            yield
+        finally:
+            _run.reset(token)
+
+    @contextmanager
+    def span(self, exchange: str, phase: str, symbol: Optional[str] = None) -> Iterator[None]:
+        """
+        Record the time taken by the block as a phase. The span is recorded even if the block raises an exception.
+        """
+        started_at = time.time()
+        start = time.perf_counter()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            self.record(
+                Span(
+                    run=_run.get(),
+                    exchange=exchange,
+                    symbol=symbol,
+                    phase=phase,
+                    started_at=started_at,
+                    seconds=time.perf_counter() - start,
+                    succeeded=succeeded,
+                )
+            )
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def recent(self, exchange: Optional[str] = None, run: Optional[str] = None, limit: int = 100) -> List[Span]:
+        """
+        Return the last `limit` spans in chronological order, filtered by the exchange and the task run if given.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        spans = [
+            s for s in spans if (exchange is None or s["exchange"] == exchange) and (run is None or s["run"] == run)
+        ]
+        return spans[-limit:] if limit > 0 else []
+
+    def summary(self) -> List[PhaseLatency]:
+        """
+        Return the percentiles of the time taken by each phase on each exchange over the spans in the buffer.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        groups: Dict[Tuple[str, str], List[Span]] = defaultdict(list)
+        for s in spans:
+            groups[(s["exchange"], s["phase"])].append(s)
+        summary = []
+        for (exchange, phase), group in sorted(groups.items()):
+            seconds = sorted(s["seconds"] for s in group)
+            summary.append(
+                PhaseLatency(
+                    exchange=exchange,
+                    phase=phase,
+                    count=len(seconds),
+                    failures=sum(not s["succeeded"] for s in group),
+                    mean_seconds=sum(seconds) / len(seconds),
+                    p50_seconds=seconds[len(seconds) * 50 // 100],
+                    p90_seconds=seconds[len(seconds) * 90 // 100],
+                    p99_seconds=seconds[len(seconds) * 99 // 100],
+                    max_seconds=seconds[-1],
+                )
+            )
+        return summary
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+recorder = SpanRecorder()
@@ -3,3 +3,5 @@ from typing_extensions import Literal
 Cycle = Literal["Daily", "Weekly", "Monthly"]
 Status = Literal["Running", "Stopped"]
 Weekday = Literal["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
+CatchUpPolicy = Literal["skip", "once", "all"]
+SchedulerBackend = Literal["heap", "wheel", "async"]
@@ -0,0 +1,51 @@
+import math
+from typing import Dict
+from unittest.mock import MagicMock
+
+import pytest
+
+import doru.exchange
+from doru.cache import MarketCache, TickerCache
+from doru.exchange import Market
+from doru.limiter import TokenBucket
+
+SPOT_MARKETS: Dict[str, Market] = {
+    symbol: {"symbol": symbol, "precision": {"amount": 4}} for symbol in ["BTC/JPY", "ETH/BTC", "ETH/JPY", "XRP/JPY"]
+}
+
+
+def pytest_configure(config):
+    # Some test modules validate tasks on import, which is before any fixture is set up.
+    doru.exchange.market_cache = MarketCache(ttl=0, directory=None)
+
+
+@pytest.fixture(autouse=True)
+def market_cache(tmpdir, mocker) -> MarketCache:
+    # Keep the markets cached by a test away from the other tests and the cache directory of the user.
+    cache = MarketCache(directory=str(tmpdir.join("cache")))
+    mocker.patch("doru.exchange.market_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def ticker_cache(mocker) -> TickerCache:
+    # The tickers are neither reused nor batched unless a test does so explicitly.
+    cache = TickerCache(max_age=0, window=0)
+    mocker.patch("doru.exchange.ticker_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def rate_limiter(mocker) -> TokenBucket:
+    # The tests replacing the ccxt instances are not throttled by their default rate limit.
+    limiter = TokenBucket(math.inf)
+    mocker.patch("doru.exchange.rate_limiter_of", return_value=limiter)
+    # The clients created before have their own limiters.
+    doru.exchange.registry.clear()
+    return limiter
+
+
+@pytest.fixture
+def spot_markets(mocker) -> MagicMock:
+    # The markets of every exchange are fixed instead of being fetched from the live exchange.
+    return mocker.patch("doru.exchange.Exchange._fetch_spot_markets", return_value=SPOT_MARKETS)
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+from doru.cache import MarketCache, TickerCache
+
+MARKETS: Dict[str, Any] = {"BTC/USDT": {"symbol": "BTC/USDT", "precision": {"amount": 5}}}
+
+
+@pytest.fixture
+def cache(tmpdir) -> MarketCache:
+    return MarketCache(ttl=60, directory=str(tmpdir))
+
+
+def test_get_load_markets_only_when_missing_or_expired(cache: MarketCache, freezer, mocker):
+    load = mocker.Mock(return_value=MARKETS)
+    assert cache.get("binance", load) == MARKETS
+    assert cache.get("binance", load) == MARKETS
+    load.assert_called_once()
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+    freezer.tick(60)
+    cache.get("binance", load)
+    assert load.call_count == 2
+    cache.get("binance", load, refresh=True)
+    assert load.call_count == 3
+    assert cache.stats() == {"hits": 1, "misses": 3, "entries": 1}
+
+
+def test_get_read_snapshot_written_by_another_process(cache: MarketCache, tmpdir, mocker):
+    cache.get("binance", mocker.Mock(return_value=MARKETS))
+    with open(tmpdir.join("markets", "binance.json")) as f:
+        assert json.load(f)["markets"] == MARKETS
+
+    load = mocker.Mock(return_value={})
+    assert MarketCache(ttl=60, directory=str(tmpdir)).get("binance", load) == MARKETS
+    load.assert_not_called()
+    # A snapshot is not used when the cache is disabled.
+    assert MarketCache(ttl=0, directory=str(tmpdir)).get("binance", load) == {}
+
+
+def test_peek_return_expired_markets_without_loading(cache: MarketCache, tmpdir, freezer, mocker):
+    assert cache.peek("binance") is None
+    cache.get("binance", mocker.Mock(return_value=MARKETS))
+    freezer.tick(3600)
+    assert cache.peek("binance") == MARKETS
+    assert MarketCache(ttl=60, directory=str(tmpdir)).peek("binance") == MARKETS
+    assert cache.stats() == {"hits": 0, "misses": 1, "entries": 1}
+
+
+def test_get_ignore_broken_snapshot(cache: MarketCache, tmpdir, mocker, caplog):
+    tmpdir.mkdir("markets").join("binance.json").write("{")
+    assert cache.get("binance", mocker.Mock(return_value=MARKETS)) == MARKETS
+    assert "Failed to read the market cache of binance" in caplog.text
+
+
+def test_get_refresh_markets_once_for_concurrent_calls(cache: MarketCache):
+    calls = []
+
+    def load() -> Dict[str, Any]:
+        calls.append(1)
+        time.sleep(0.2)
+        return MARKETS
+
+    threads = [threading.Thread(target=cache.get, args=("binance", load)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert cache.stats() == {"hits": 4, "misses": 1, "entries": 1}
+
+
+def test_get_not_cache_markets_when_loading_fails(cache: MarketCache, mocker):
+    with pytest.raises(Exception):
+        cache.get("binance", mocker.Mock(side_effect=Exception))
+    assert cache.get("binance", mocker.Mock(return_value=MARKETS)) == MARKETS
+
+
+def test_invalidate(cache: MarketCache, tmpdir, mocker):
+    cache.get("binance", mocker.Mock(return_value=MARKETS))
+    cache.get("kraken", mocker.Mock(return_value=MARKETS))
+    cache.invalidate("binance")
+    assert not tmpdir.join("markets", "binance.json").exists()
+    assert tmpdir.join("markets", "kraken.json").exists()
+
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+    assert tmpdir.join("markets").listdir() == []
+
+
+def test_get_async_refresh_markets_once_for_concurrent_calls(cache: MarketCache):
+    calls = []
+
+    async def load() -> Dict[str, Any]:
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return MARKETS
+
+    async def main() -> None:
+        results = await asyncio.gather(*[cache.get_async("binance", load) for _ in range(5)])
+        assert results == [MARKETS] * 5
+
+    asyncio.run(main())
+    assert len(calls) == 1
+    assert cache.stats() == {"hits": 4, "misses": 1, "entries": 1}
+
+
+def ticker_of(symbol: str) -> Dict[str, Any]:
+    return {"symbol": symbol, "bid": 100, "last": 101}
+
+
+def run_in_threads(target, args_list) -> List[Any]:
+    results: List[Any] = [None] * len(args_list)
+
+    def run(i: int) -> None:
+        try:
+            results[i] = target(*args_list[i])
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(args_list))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_ticker_cache_reuse_ticker_until_max_age(freezer, mocker):
+    cache = TickerCache(max_age=1, window=0)
+    fetch_one = mocker.Mock(side_effect=ticker_of)
+    assert cache.get("binance", "BTC/USDT", fetch_one) == ticker_of("BTC/USDT")
+    freezer.tick(1)
+    cache.get("binance", "BTC/USDT", fetch_one)
+    fetch_one.assert_called_once()
+    freezer.tick(0.5)
+    cache.get("binance", "BTC/USDT", fetch_one)
+    assert fetch_one.call_count == 2
+    assert cache.stats() == {"hits": 1, "coalesced": 0, "requests": 2}
+
+
+def test_ticker_cache_coalesce_concurrent_requests_for_same_symbol():
+    cache = TickerCache(max_age=0, window=0)
+    calls = []
+
+    def fetch_one(symbol: str) -> Dict[str, Any]:
+        calls.append(symbol)
+        time.sleep(0.2)
+        return ticker_of(symbol)
+
+    results = run_in_threads(cache.get, [("binance", "BTC/USDT", fetch_one)] * 5)
+    assert results == [ticker_of("BTC/USDT")] * 5
+    assert calls == ["BTC/USDT"]
+    assert cache.stats() == {"hits": 0, "coalesced": 4, "requests": 1}
+    # The ticker is not reused after the response because max_age is 0.
+    cache.get("binance", "BTC/USDT", fetch_one)
+    assert len(calls) == 2
+
+
+def test_ticker_cache_batch_symbols_requested_in_window(mocker):
+    cache = TickerCache(max_age=60, window=0.2)
+    fetch_one = mocker.Mock(side_effect=ticker_of)
+    # The exchange does not return the ticker of ETH/BTC, which is fetched alone.
+    fetch_many = mocker.Mock(side_effect=lambda symbols: {s: ticker_of(s) for s in symbols if s != "ETH/BTC"})
+    symbols = ["BTC/USDT", "ETH/USDT", "BTC/USDT", "ETH/BTC"]
+    results = run_in_threads(cache.get, [("binance", s, fetch_one, fetch_many) for s in symbols])
+    assert results == [ticker_of(s) for s in symbols]
+    fetch_many.assert_called_once()
+    assert sorted(fetch_many.call_args[0][0]) == ["BTC/USDT", "ETH/BTC", "ETH/USDT"]
+    fetch_one.assert_called_once_with("ETH/BTC")
+
+    # A single symbol is fetched alone after the window, and the cached tickers are not fetched again.
+    cache.get("kraken", "BTC/USD", fetch_one, fetch_many)
+    fetch_one.assert_called_with("BTC/USD")
+    cache.get("binance", "ETH/USDT", fetch_one, fetch_many)
+    assert fetch_many.call_count == 1 and fetch_one.call_count == 2
+
+
+def test_ticker_cache_raise_error_to_all_waiters(mocker):
+    cache = TickerCache(max_age=60, window=0.1)
+    fetch_many = mocker.Mock(side_effect=Exception("error"))
+    results = run_in_threads(cache.get, [("binance", s, ticker_of, fetch_many) for s in ["BTC/USDT", "ETH/USDT"]])
+    assert [str(r) for r in results] == ["error", "error"]
+    # The failure is not cached.
+    assert cache.get("binance", "BTC/USDT", ticker_of) == ticker_of("BTC/USDT")
+
+
+def test_ticker_cache_get_async_batch_symbols_requested_in_window():
+    cache = TickerCache(max_age=0, window=0.1)
+    batches = []
+
+    async def fetch_one(symbol: str) -> Dict[str, Any]:
+        raise AssertionError("fetch_one should not be called")
+
+    async def fetch_many(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        batches.append(sorted(symbols))
+        return {s: ticker_of(s) for s in symbols}
+
+    async def main() -> None:
+        symbols = ["BTC/USDT", "ETH/USDT", "BTC/USDT"]
+        results = await asyncio.gather(*[cache.get_async("binance", s, fetch_one, fetch_many) for s in symbols])
+        assert results == [ticker_of(s) for s in symbols]
+
+    asyncio.run(main())
+    assert batches == [["BTC/USDT", "ETH/USDT"]]
+    assert cache.stats() == {"hits": 0, "coalesced": 1, "requests": 1}
@@ -5,8 +5,9 @@ from click.testing import CliRunner
 from requests import HTTPError, RequestException
 
 from doru.api.client import Client
-from doru.api.schema import Task
+from doru.api.schema import SymbolValidation, Task, UpcomingRun
 from doru.cli import cli
+from doru.exchange import get_exchange
 
 TEST_DATA: List[Task] = [
     Task(
@@ -42,6 +43,12 @@ TEST_DATA: List[Task] = [
 ]
 
 
+@pytest.fixture(autouse=True)
+def daemon_not_running(mocker):
+    # The symbols are validated locally unless a test mocks the validation by the daemon.
+    mocker.patch("doru.api.client.Client.validate_symbol", side_effect=RequestException)
+
+
 @pytest.mark.parametrize("exchange, cycle, amount, symbol", [["bitbank", "Daily", "1", "BTC/JPY"]])
 def test_add_with_valid_amount_succeed(exchange, cycle, amount, symbol, mocker):
     mocker.patch("doru.api.client.Client.add_task", return_value=TEST_DATA[1])
@@ -136,6 +143,63 @@ def test_add_with_invalid_symbol_fail(exchange, cycle, amount, symbol):
     assert result.exit_code != 0
 
 
+def test_add_with_invalid_symbol_suggest_symbols(spot_markets):
+    result = CliRunner().invoke(cli, args=["add", "-e", "bitbank", "-c", "Daily", "-a", "1", "-s", "btc-jpy"])
+    assert result.exit_code != 0
+    assert "Did you mean BTC/JPY" in result.output and "doru symbols bitbank" in result.output
+
+
+def test_add_validate_symbol_with_daemon(mocker):
+    mocker.patch("doru.api.client.Client.add_task", return_value=TEST_DATA[0])
+    mocker.patch("doru.api.client.Client.start_task", return_value=None)
+    validate = mocker.patch(
+        "doru.api.client.Client.validate_symbol",
+        return_value=SymbolValidation(exchange="bitbank", symbol="BTC/JPY", valid=True),
+    )
+    fetch = mocker.patch("doru.exchange.Exchange.symbol_index", side_effect=Exception("network"))
+    result = CliRunner().invoke(cli, args=["add", "-e", "bitbank", "-c", "Daily", "-a", "1", "-s", "BTC/JPY"])
+    assert result.exit_code == 0
+    validate.assert_called_once_with("bitbank", "BTC/JPY")
+    fetch.assert_not_called()
+
+    validate.return_value = SymbolValidation(
+        exchange="bitbank", symbol="BTC/USDT", valid=False, suggestions=["BTC/JPY"]
+    )
+    result = CliRunner().invoke(cli, args=["add", "-e", "bitbank", "-c", "Daily", "-a", "1", "-s", "BTC/USDT"])
+    assert result.exit_code != 0
+    assert "Did you mean BTC/JPY" in result.output
+    fetch.assert_not_called()
+
+
+def test_symbols_succeed(spot_markets):
+    result = CliRunner().invoke(cli, args=["symbols", "bitbank"])
+    assert result.exit_code == 0
+    assert result.output.split() == ["BTC/JPY", "ETH/BTC", "ETH/JPY", "XRP/JPY"]
+    result = CliRunner().invoke(cli, args=["symbols", "bitbank", "--base", "eth", "-q", "JPY"])
+    assert result.exit_code == 0
+    assert result.output.split() == ["ETH/JPY"]
+
+
+def test_symbols_with_invalid_exchange_fail():
+    result = CliRunner().invoke(cli, args=["symbols", "invalid_exchange"])
+    assert result.exit_code != 0
+
+
+def test_complete_symbol_only_from_cached_markets(spot_markets):
+    ctx = cli.make_context("doru", ["add", "-e", "bitbank"], resilient_parsing=True)
+    add = cli.get_command(ctx, "add")
+    assert add is not None
+    sub_ctx = add.make_context("add", ["-e", "bitbank"], parent=ctx, resilient_parsing=True)
+    symbol = next(p for p in add.params if p.name == "symbol")
+    assert symbol.shell_complete(sub_ctx, "eth") == []
+    spot_markets.assert_not_called()
+
+    get_exchange("bitbank").fetch_spot_symbols()
+    assert [c.value for c in symbol.shell_complete(sub_ctx, "eth")] == ["ETH/BTC", "ETH/JPY"]
+    assert [c.value for c in symbol.shell_complete(sub_ctx, "xrp-j")] == ["XRP/JPY"]
+    spot_markets.assert_called_once()
+
+
 @pytest.mark.parametrize("id", ["1"])
 def test_remove_with_valid_id_succeed(id, mocker):
     mocker.patch("doru.api.client.Client.remove_task", return_value=None)
@@ -334,6 +398,34 @@ def test_list_with_exception_fail(mocker):
     assert result.exit_code != 0
 
 
+def test_upcoming_succeed(mocker):
+    runs = [
+        UpcomingRun(id="2", symbol="ETH/JPY", amount=20000, exchange="bitflyer", run_at="2022-01-01 00:00"),
+        UpcomingRun(id="2", symbol="ETH/JPY", amount=20000, exchange="bitflyer", run_at="2022-01-08 00:00"),
+    ]
+    mock = mocker.patch("doru.api.client.Client.get_upcoming_runs", return_value=runs)
+    result = CliRunner().invoke(cli, args=["upcoming", "-H", "30"])
+    assert result.exit_code == 0
+    mock.assert_called_once_with(30)
+
+    lines = result.stdout.split("\n")
+    assert lines[0].split() == ["Invest", "Date", "ID", "Symbol", "Amount", "Exchange"]
+    assert lines[2].split() == ["2022-01-01", "00:00", "2", "ETH/JPY", "20000", "bitflyer"]
+    assert lines[3].split() == ["2022-01-08", "00:00", "2", "ETH/JPY", "20000", "bitflyer"]
+
+
+@pytest.mark.parametrize("horizon", ["0", "367", "invalid"])
+def test_upcoming_with_invalid_horizon_fail(horizon):
+    result = CliRunner().invoke(cli, args=["upcoming", "-H", horizon])
+    assert result.exit_code != 0
+
+
+def test_upcoming_with_exception_fail(mocker):
+    mocker.patch("doru.api.client.Client.get_upcoming_runs", side_effect=Exception)
+    result = CliRunner().invoke(cli, args=["upcoming"])
+    assert result.exit_code != 0
+
+
 @pytest.mark.parametrize("exchange, expected_key, expected_secret", [("bitbank", "xxxxxxxxxx", "yyyyyyyyyy")])
 @pytest.mark.parametrize(
     "key, secret",
@@ -452,10 +544,11 @@ def test_daemon_terminate_fail_when_terminate_raise_exception(mocker):
 
 def test_top_level_help():
     result = CliRunner().invoke(cli, args=["--help"])
-    assert "add     Add a task to accumulate crypto." in result.stdout
-    assert "remove  Remove a task to accumulate crypto." in result.stdout
-    assert "start   Start tasks to accumulate crypto." in result.stdout
-    assert "stop    Stop tasks to accumulate crypto." in result.stdout
-    assert "list    Display tasks to accumulate crypto." in result.stdout
-    assert "cred    Add or remove credentials for the exchanges." in result.stdout
-    assert "daemon  Start or terminate the background process for this application." in result.stdout
+    assert "add       Add a task to accumulate crypto." in result.stdout
+    assert "remove    Remove a task to accumulate crypto." in result.stdout
+    assert "start     Start tasks to accumulate crypto." in result.stdout
+    assert "stop      Stop tasks to accumulate crypto." in result.stdout
+    assert "list      Display tasks to accumulate crypto." in result.stdout
+    assert "upcoming  Display upcoming investments of running tasks." in result.stdout
+    assert "cred      Add or remove credentials for the exchanges." in result.stdout
+    assert "daemon    Start or terminate the background process for this application." in result.stdout
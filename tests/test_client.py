@@ -135,3 +135,49 @@ def test_add_task_with_missing_required_key_fail(exchange, cycle, time, amount,
     with pytest.raises(KeyError) as e:
         d.add_task(exchange, cycle, time, amount, symbol)
     assert e
+
+
+def test_get_upcoming_runs_succeed(mocker):
+    data = [{"id": "2", "symbol": "ETH/JPY", "amount": 20000, "exchange": "bitflyer", "run_at": "2022-01-01 00:00"}]
+
+    def get_response(*args, **kwargs):
+        return MockResponse(data, 200)
+
+    mock = mocker.patch("doru.api.session.SessionWithSocket.get", side_effect=get_response)
+    d = create_client()
+    result = d.get_upcoming_runs(7)
+    assert [r.dict() for r in result] == data
+    mock.assert_called_once_with("schedule/upcoming", params={"horizon": 7})
+
+
+def test_validate_symbol_succeed(mocker):
+    data = {"exchange": "bitbank", "symbol": "BTC/USDT", "valid": False, "suggestions": ["BTC/JPY"]}
+
+    def get_response(*args, **kwargs):
+        return MockResponse(data, 200)
+
+    mock = mocker.patch("doru.api.session.SessionWithSocket.get", side_effect=get_response)
+    result = create_client().validate_symbol("bitbank", "BTC/USDT")
+    assert result.dict() == data
+    mock.assert_called_once_with("symbols/validate", params={"exchange": "bitbank", "symbol": "BTC/USDT"})
+
+
+def test_add_task_without_fetching_markets(mocker):
+    mocker.patch(
+        "doru.api.session.SessionWithSocket.post",
+        side_effect=lambda *args, **kwargs: MockResponse(TEST_DATA[0].dict(), 201),
+    )
+    fetch = mocker.patch("doru.exchange.Exchange.symbol_index", side_effect=Exception("network"))
+    assert create_client().add_task("bitbank", "Daily", "00:00", 1, "BTC/JPY") == TEST_DATA[0]
+    fetch.assert_not_called()
+
+
+def test_start_all_tasks_start_only_stopped_tasks(mocker):
+    get = mocker.patch(
+        "doru.api.session.SessionWithSocket.get",
+        side_effect=lambda *args, **kwargs: MockResponse([TEST_DATA[0].dict()], 200),
+    )
+    post = mocker.patch("doru.api.session.SessionWithSocket.post", return_value=MockResponse({}, 204))
+    create_client().start_all_tasks()
+    get.assert_called_once_with("tasks", params={"status": "Stopped"})
+    post.assert_called_once_with(f"tasks/{TEST_DATA[0].id}/start")
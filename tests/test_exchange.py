@@ -1,11 +1,27 @@
+import asyncio
 import datetime
+import json
 import logging
 import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict
 
 import ccxt
 import pytest
 
-from doru.exchange import Exchange, get_exchange
+from doru.cache import MarketCache, TickerCache
+from doru.exchange import (
+    AsyncExchange,
+    Exchange,
+    ExchangeRegistry,
+    OrderTracker,
+    PollSchedule,
+    get_async_exchange,
+    get_exchange,
+    registry,
+)
+from doru.manager.credential_manager import create_credential_manager
 
 EXCHANGE_NAME = os.environ.get("EXCHANGE", "binance")
 EXCHANGE_APIKEY = os.environ.get("EXCHANGE_APIKEY", "")
@@ -281,14 +297,17 @@ TICKER_VALUE_2 = {
 @pytest.fixture
 def exchange(mocker):
     mocker.patch(
-        "doru.exchange.Exchange._read_credential", return_value={"apiKey": EXCHANGE_APIKEY, "secret": EXCHANGE_SECRET}
+        "doru.exchange.ExchangeRegistry.read_credential",
+        return_value={"apiKey": EXCHANGE_APIKEY, "secret": EXCHANGE_SECRET},
     )
     mocker.patch("doru.exchange.Exchange._get_exchange_instance", return_value=ccxt.Exchange())
+    mocker.patch("doru.exchange.market_cache", MarketCache(ttl=0, directory=None))
+    registry.clear()
     return get_exchange(EXCHANGE_NAME)
 
 
 def test_init_with_valid_exchange_name_succeed(mocker):
-    mocker.patch("doru.exchange.Exchange._read_credential", return_value={"key": "", "secret": ""})
+    mocker.patch("doru.exchange.ExchangeRegistry.read_credential", return_value={"key": "", "secret": ""})
     exchange = Exchange("binance")
     assert isinstance(exchange.exchange, ccxt.Exchange)
 
@@ -301,7 +320,7 @@ def test_init_with_valid_exchange_name_succeed(mocker):
 
 
 def test_init_with_invalid_exchange_name_fail(mocker):
-    mocker.patch("doru.exchange.Exchange._read_credential", return_value={"key": "", "secret": ""})
+    mocker.patch("doru.exchange.ExchangeRegistry.read_credential", return_value={"key": "", "secret": ""})
     with pytest.raises(ValueError):
         Exchange("invalid_exchange")
 
@@ -397,3 +416,273 @@ def test_wait_order_complete_return_None_when_fetch_order_fail(exchange: Exchang
     result = exchange.wait_order_complete("hogehoge", "BTC/USD", datetime.timedelta(seconds=3), tick=1)
     assert result is None
     assert "The order status is unknown" in caplog.text
+
+
+def write_credential(file, key: str, secret: str) -> None:
+    with open(file, "w") as f:
+        json.dump({"binance": {"key": key, "secret": secret}}, f)
+
+
+def test_registry_reuse_client_until_credential_changes(tmpdir, mocker):
+    file = str(tmpdir.join("credential.json"))
+    write_credential(file, "key", "secret")
+    exchange_registry = ExchangeRegistry(file)
+    manager_mock = mocker.patch("doru.exchange.create_credential_manager", wraps=create_credential_manager)
+
+    client = exchange_registry.get("binance")
+    assert client.exchange.apiKey == "key"
+    assert exchange_registry.get("binance") is client
+    # The credential file is read only once while it is not modified.
+    manager_mock.assert_called_once()
+
+    write_credential(file, "new_key", "new_secret")
+    os.utime(file, ns=(0, 0))
+    new_client = exchange_registry.get("binance")
+    assert new_client is not client
+    assert new_client.exchange.apiKey == "new_key"
+    assert manager_mock.call_count == 2
+    assert exchange_registry.get("okx") is not new_client
+    assert set(exchange_registry.clients) == {"binance", "okx"}
+
+    exchange_registry.clear()
+    assert exchange_registry.clients == {}
+
+
+def test_create_order_refresh_cached_markets_without_symbol(exchange: Exchange, tmpdir, mocker):
+    mocker.patch("doru.exchange.market_cache", MarketCache(ttl=60, directory=str(tmpdir)))
+    mocker.patch("ccxt.Exchange.fetch_ticker", return_value=TICKER_VALUE)
+    mocker.patch("ccxt.Exchange.create_order", return_value={"id": "hogehoge"})
+    fetch_mock = mocker.patch("ccxt.Exchange.fetch_markets", return_value=MARKETS_VALUE[1:])
+    assert "BTC/USD" not in exchange.fetch_spot_symbols()
+
+    fetch_mock.return_value = MARKETS_VALUE
+    assert exchange.create_order("BTC/USD", 1000) == "hogehoge"
+    assert fetch_mock.call_count == 2
+    exchange.create_order("BTC/USD", 1000)
+    assert fetch_mock.call_count == 2
+
+
+def returning(value: Any = None, exception: Any = None) -> Callable[..., Awaitable[Any]]:
+    # An asynchronous replacement of the methods of the ccxt classes
+    async def method(*args: Any, **kwargs: Any) -> Any:
+        if exception is not None:
+            raise exception
+        return value
+
+    return method
+
+
+@pytest.fixture
+def async_exchange(mocker):
+    mocker.patch(
+        "doru.exchange.ExchangeRegistry.read_credential",
+        return_value={"apiKey": EXCHANGE_APIKEY, "secret": EXCHANGE_SECRET},
+    )
+    mocker.patch("doru.exchange.AsyncExchange._get_exchange_instance", return_value=ccxt.async_support.Exchange())
+    return AsyncExchange(EXCHANGE_NAME)
+
+
+def test_async_exchange_use_async_ccxt_class(mocker):
+    mocker.patch("doru.exchange.ExchangeRegistry.read_credential", return_value={})
+    exchange = AsyncExchange("binance")
+    assert isinstance(exchange.exchange, ccxt.async_support.binance)
+    assert exchange.exchange.precisionMode == ccxt.DECIMAL_PLACES
+    with pytest.raises(ValueError):
+        AsyncExchange("invalid_exchange")
+
+
+def test_async_exchange_create_order(async_exchange: AsyncExchange, mocker):
+    mocker.patch("ccxt.async_support.Exchange.fetch_ticker", returning(TICKER_VALUE_2))
+    mocker.patch("ccxt.async_support.Exchange.fetch_markets", returning(MARKETS_VALUE))
+    create_order_mock = mocker.patch("ccxt.async_support.Exchange.create_order", return_value=None)
+    create_order_mock.side_effect = returning({"id": "hogehoge"})
+
+    async def main() -> None:
+        async with async_exchange:
+            assert await async_exchange.fetch_spot_symbols() == ["BTC/USD", "ETH/USD"]
+            assert await async_exchange.create_order("BTC/USD", 1000) == "hogehoge"
+
+    asyncio.run(main())
+    create_order_mock.assert_called_once()
+    assert create_order_mock.call_args[1]["price"] == TICKER_VALUE_2["last"]
+
+
+def test_async_exchange_create_order_fail_with_exception(async_exchange: AsyncExchange, mocker, caplog):
+    mocker.patch("ccxt.async_support.Exchange.fetch_ticker", returning(exception=Exception("error")))
+    with pytest.raises(Exception):
+        asyncio.run(async_exchange.create_order("BTC/USD", 1000))
+    assert "Failed to create order: error" in caplog.text
+
+
+@pytest.mark.parametrize("status", ["closed", "canceled", "open"])
+def test_async_exchange_wait_order_complete(async_exchange: AsyncExchange, status, mocker):
+    mocker.patch("ccxt.async_support.Exchange.fetch_order", returning({"status": status}))
+    result = asyncio.run(
+        async_exchange.wait_order_complete("hogehoge", "BTC/USD", datetime.timedelta(seconds=0.2), tick=0.1)
+    )
+    assert result == status
+
+    mocker.patch("ccxt.async_support.Exchange.fetch_order", returning(exception=Exception))
+    result = asyncio.run(
+        async_exchange.wait_order_complete("hogehoge", "BTC/USD", datetime.timedelta(seconds=0.2), tick=0.1)
+    )
+    assert result is None
+
+
+def test_async_exchange_cancel_order_retry(async_exchange: AsyncExchange, mocker):
+    cancel_mock = mocker.patch("ccxt.async_support.Exchange.cancel_order", side_effect=returning(exception=Exception))
+    with pytest.raises(Exception):
+        asyncio.run(async_exchange.cancel_order("hogehoge", "BTC/USD", tries=3, delay=0))
+    assert cancel_mock.call_count == 3
+
+
+def test_registry_close_async_clients(mocker):
+    mocker.patch("doru.exchange.ExchangeRegistry.read_credential", return_value={})
+    close_mock = mocker.patch("doru.exchange.AsyncExchange.close", side_effect=returning())
+    registry.clear()
+
+    async def main() -> None:
+        client = await get_async_exchange("binance")
+        assert await get_async_exchange("binance") is client
+        await registry.close_async()
+
+    asyncio.run(main())
+    close_mock.assert_called_once()
+    assert registry.async_clients == {}
+
+
+def order_tracker(mocker, has: Dict[str, Any]) -> OrderTracker:
+    ccxt_exchange = mocker.Mock()
+    ccxt_exchange.has = has
+    return OrderTracker(ccxt_exchange)
+
+
+def test_order_tracker_fetch_orders_by_symbol(mocker):
+    tracker = order_tracker(mocker, {"fetchOrders": True})
+    tracker.exchange.fetch_orders.return_value = [
+        {"id": "1", "status": "closed"},
+        {"id": "2", "status": "open"},
+        {"id": "3", "status": "canceled"},
+    ]
+    futures = [tracker.track(id, "BTC/USD", schedule=PollSchedule.fixed(0.1)) for id in ("1", "2", "3")]
+    assert futures[0].result(timeout=1) == {"id": "1", "status": "closed"}
+    assert futures[2].result(timeout=1) == {"id": "3", "status": "canceled"}
+    assert set(tracker.orders) == {"2"}
+    tracker.exchange.fetch_order.assert_not_called()
+
+    tracker.exchange.fetch_orders.return_value = [{"id": "2", "status": "closed"}]
+    assert futures[1].result(timeout=1)["status"] == "closed"
+    assert tracker.orders == {}
+
+
+def test_order_tracker_fetch_finished_orders_missing_from_open_orders(mocker):
+    tracker = order_tracker(mocker, {"fetchOpenOrders": True})
+    tracker.exchange.fetch_open_orders.return_value = [{"id": "1", "status": "open"}]
+    tracker.exchange.fetch_order.return_value = {"id": "2", "status": "closed"}
+    tracker.track("1", "BTC/USD", schedule=PollSchedule.fixed(0.1))
+    assert tracker.wait("2", "BTC/USD", datetime.timedelta(seconds=1), schedule=PollSchedule.fixed(0.1)) == {
+        "id": "2",
+        "status": "closed",
+    }
+    tracker.exchange.fetch_order.assert_called_with("2", "BTC/USD")
+    assert set(tracker.orders) == {"1"}
+    assert tracker.untrack("1") == {"id": "1", "status": "open"}
+
+
+def test_order_tracker_return_last_status_when_timeout(mocker):
+    tracker = order_tracker(mocker, {})
+    tracker.exchange.fetch_order.return_value = {"id": "1", "status": "open"}
+    assert tracker.wait("1", "BTC/USD", datetime.timedelta(seconds=0.5), schedule=PollSchedule.fixed(0.1)) == {
+        "id": "1",
+        "status": "open",
+    }
+    assert tracker.orders == {}
+
+    tracker.exchange.fetch_order.side_effect = Exception
+    assert tracker.wait("2", "BTC/USD", datetime.timedelta(seconds=0.3), schedule=PollSchedule.fixed(0.1)) is None
+
+
+def test_poll_schedule():
+    schedule = PollSchedule(1, 2, 5)
+    delays = [schedule.next_delay()]
+    for _ in range(4):
+        delays.append(schedule.next_delay(delays[-1]))
+    assert delays == [1, 2, 4, 5, 5]
+    assert PollSchedule.fixed(3).next_delay(3) == 3
+
+
+def test_order_tracker_back_off_and_record_time_to_fill(mocker):
+    tracker = order_tracker(mocker, {})
+    tracker.exchange.fetch_order.return_value = {"id": "1", "status": "open"}
+    future = tracker.track("1", "BTC/USD", PollSchedule(0.1, 2, 0.4))
+    time.sleep(0.65)
+    # polled after 0.1, 0.3 and 0.7 seconds
+    assert tracker.exchange.fetch_order.call_count == 2
+    assert tracker.orders["1"].delay == 0.4
+
+    tracker.exchange.fetch_order.return_value = {"id": "1", "status": "closed", "timestamp": 1000}
+    future.result(timeout=1)
+    tracker.track("2", "BTC/USD", PollSchedule.fixed(0.1))
+    tracker.exchange.fetch_order.return_value = {
+        "id": "2",
+        "status": "closed",
+        "timestamp": 1000,
+        "lastTradeTimestamp": 4000,
+    }
+    tracker.wait("2", "BTC/USD", datetime.timedelta(seconds=1))
+    stats = tracker.stats("binance")
+    assert stats["fills"] == 2 and stats["max_seconds"] == 3
+    # The time at which the fill is found is used if the exchange does not report the time of the last trade.
+    assert 0.7 <= tracker.fill_seconds[0] < 1.5
+
+
+def test_exchange_requests_are_throttled_by_shared_limiter(mocker, rate_limiter):
+    mocker.patch("doru.exchange.ExchangeRegistry.read_credential", return_value={"apiKey": "key", "secret": "secret"})
+    # the HTTP requests of ccxt
+    fetch_mock = mocker.patch.object(ccxt.binance, "fetch", return_value={"serverTime": 1})
+    acquire_spy = mocker.spy(rate_limiter, "acquire")
+    exchange = Exchange("binance")
+    assert exchange.exchange.enableRateLimit is True
+    assert AsyncExchange("binance").limiter is exchange.limiter
+
+    # Each request takes the cost of its endpoint, including the requests made inside ccxt.
+    exchange.exchange.fetch_time()
+    exchange.exchange.request("time", config={"cost": 5})
+    assert fetch_mock.call_count == 2
+    assert [c.args for c in acquire_spy.call_args_list] == [(1,), (5,)]
+
+
+def test_async_exchange_requests_are_throttled_by_shared_limiter(mocker, rate_limiter):
+    mocker.patch("doru.exchange.ExchangeRegistry.read_credential", return_value={})
+    mocker.patch.object(ccxt.async_support.binance, "fetch", returning({"serverTime": 1}))
+    acquire_spy = mocker.spy(rate_limiter, "acquire_async")
+
+    async def main() -> None:
+        async with AsyncExchange("binance") as exchange:
+            # ccxt sets its event loop on the hook when the session is opened.
+            exchange.exchange.open()
+            await exchange.exchange.fetch_time()
+            await exchange.exchange.request("time", config={"cost": 5})
+
+    asyncio.run(main())
+    assert [c.args for c in acquire_spy.call_args_list] == [(1,), (5,)]
+
+
+def test_exchange_fetch_tickers_of_simultaneous_orders_together(mocker):
+    mocker.patch("doru.exchange.ExchangeRegistry.read_credential", return_value={})
+    mocker.patch("doru.exchange.ticker_cache", TickerCache(max_age=1, window=0.2))
+    tickers = {symbol: dict(TICKER_VALUE, symbol=symbol) for symbol in ["BTC/USDT", "ETH/USDT"]}
+    fetch_tickers_mock = mocker.patch.object(ccxt.binance, "fetch_tickers", return_value=tickers)
+    fetch_ticker_mock = mocker.patch.object(ccxt.binance, "fetch_ticker")
+    exchange = Exchange("binance")
+
+    symbols = ["BTC/USDT", "ETH/USDT", "BTC/USDT"]
+    threads = [threading.Thread(target=exchange._fetch_ticker, args=(s,)) for s in symbols]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    fetch_tickers_mock.assert_called_once()
+    fetch_ticker_mock.assert_not_called()
+    assert exchange._fetch_ticker("ETH/USDT")["symbol"] == "ETH/USDT"
+    fetch_tickers_mock.assert_called_once()
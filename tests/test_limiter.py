@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+from typing import List
+
+import pytest
+
+from doru.limiter import TokenBucket, rate_limiter_of
+
+
+def test_token_bucket_delay_requests_beyond_rate():
+    bucket = TokenBucket(rate=10, capacity=2)
+    start = time.monotonic()
+    waits = [bucket.acquire() for _ in range(4)]
+    assert waits[:2] == [0, 0]
+    assert waits[2] == pytest.approx(0.1, abs=0.02)
+    assert time.monotonic() - start == pytest.approx(0.2, abs=0.05)
+
+
+def test_token_bucket_queue_requests_from_threads_and_coroutines():
+    bucket = TokenBucket(rate=20)
+    finished: List[float] = []
+    start = time.monotonic()
+
+    def request() -> None:
+        bucket.acquire()
+        finished.append(time.monotonic() - start)
+
+    async def main() -> None:
+        await asyncio.gather(*[bucket.acquire_async() for _ in range(3)])
+        finished.append(time.monotonic() - start)
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for t in threads:
+        t.start()
+    asyncio.run(main())
+    for t in threads:
+        t.join()
+    # 6 requests at 20 per second with a burst of 1 take 0.25 seconds.
+    assert max(finished) == pytest.approx(0.25, abs=0.05)
+
+
+def test_token_bucket_with_invalid_rate_raise_exception():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+    assert TokenBucket(rate=float("inf")).acquire() == 0
+
+
+def test_rate_limiter_of_share_bucket_by_exchange_and_key():
+    bucket = rate_limiter_of("binance", "key", 50)
+    assert bucket.rate == 20
+    assert rate_limiter_of("binance", "key", 50) is bucket
+    assert rate_limiter_of("binance", "other_key", 50) is not bucket
+    assert rate_limiter_of("kraken", "key", 50) is not bucket
@@ -1,12 +1,17 @@
 import json
+from datetime import timedelta
 from typing import Any, Dict
 
 import pytest
 from fastapi.testclient import TestClient
 
 from doru.api.app import create_app
+from doru.api.schema import OrderFill
 from doru.manager.credential_manager import CredentialManager, create_credential_manager
 from doru.manager.task_manager import TaskManager, create_task_manager
+from doru.scheduler import AsyncScheduler
+from doru.shard import ShardedScheduler
+from doru.tracing import SpanRecorder
 
 TASK_DATA = {
     "1": {
@@ -77,6 +82,20 @@ def test_get_tasks_succeed(task_manager, tasks, mocker):
         assert res.json() == list(tasks.values())
 
 
+@pytest.mark.parametrize("tasks", [TASK_DATA])
+def test_get_tasks_filtered_succeed(task_manager, tasks, mocker):
+    mocker.patch("doru.manager.task_manager.TaskManager._get_next_run", return_value="2022-01-01 00:00")
+    with app.container.task_manager.override(task_manager):
+        client = TestClient(app)
+        running = [t for t in tasks.values() if t["status"] == "Running"]
+        res = client.get("/tasks", params={"status": "Running"})
+        assert res.is_success
+        assert res.json() == running
+        res = client.get("/tasks", params={"exchange": "unknown"})
+        assert res.is_success and res.json() == []
+        assert client.get("/tasks", params={"status": "invalid"}).status_code == 422
+
+
 @pytest.mark.parametrize("tasks", [TASK_DATA])
 @pytest.mark.parametrize(
     "new_task",
@@ -277,6 +296,183 @@ def test_delete_task_with_unexpected_error_fail(task_manager, id, mocker):
         assert res.json()["detail"] == "An internal error has occurred."
 
 
+@pytest.mark.freeze_time("2023-01-01 00:00:00")
+@pytest.mark.parametrize("tasks", [TASK_DATA])
+def test_get_upcoming_runs_succeed(task_manager):
+    with app.container.task_manager.override(task_manager):
+        client = TestClient(app)
+        res = client.get("/schedule/upcoming", params={"horizon": 3})
+        assert res.is_success
+        # Only the running task is listed
+        assert res.json() == [
+            {"id": "1", "symbol": "BTC/JPY", "amount": 10000, "exchange": "bitbank", "run_at": run_at}
+            for run_at in ("2023-01-01 00:00", "2023-01-02 00:00", "2023-01-03 00:00")
+        ]
+
+
+@pytest.mark.parametrize("tasks", [TASK_DATA])
+@pytest.mark.parametrize("horizon", [0, 367, "invalid"])
+def test_get_upcoming_runs_with_invalid_horizon_fail(task_manager, horizon):
+    with app.container.task_manager.override(task_manager):
+        client = TestClient(app)
+        res = client.get("/schedule/upcoming", params={"horizon": horizon})
+        assert res.is_error
+
+
+@pytest.mark.parametrize("tasks", [TASK_DATA])
+def test_lifespan_runs_async_scheduler(task_file):
+    manager = create_task_manager(task_file, scheduler_backend="async")
+    assert isinstance(manager.pool, AsyncScheduler)
+    with app.container.task_manager.override(manager):
+        with TestClient(app) as client:
+            assert client.get("/keepalive").is_success
+            assert manager.pool._loop is not None
+            assert manager.pool.pool["1"].is_alive()
+        assert manager.pool._loop is None
+
+
+@pytest.mark.parametrize("tasks", [TASK_DATA])
+def test_lifespan_stops_shard_processes(task_file):
+    manager = create_task_manager(task_file, shards=1)
+    assert isinstance(manager.pool, ShardedScheduler)
+    with app.container.task_manager.override(manager):
+        with TestClient(app) as client:
+            assert client.get("/keepalive").is_success
+            assert all(shard.process.is_alive() for shard in manager.pool._shards)
+        assert not any(shard.process.is_alive() for shard in manager.pool._shards)
+
+
+@pytest.mark.parametrize("tasks", [TASK_DATA])
+def test_lifespan_closes_task_storage(task_file, mocker):
+    manager = create_task_manager(str(task_file).replace(".json", ".db"))
+    close = mocker.spy(manager.storage, "close")
+    with app.container.task_manager.override(manager):
+        with TestClient(app) as client:
+            assert client.get("/keepalive").is_success
+            close.assert_not_called()
+        close.assert_called_once()
+
+
+@pytest.mark.parametrize("tasks", [TASK_DATA])
+def test_get_load_report_succeed(task_manager):
+    with app.container.task_manager.override(task_manager):
+        client = TestClient(app)
+        res = client.get("/stats/load", params={"horizon": 7})
+        assert res.is_success
+        assert res.json() == [r.dict() for r in task_manager.get_load_report(timedelta(days=7))]
+
+        res = client.get("/stats/load", params={"horizon": 0})
+        assert res.status_code == 422
+
+
+@pytest.mark.parametrize("tasks", [TASK_DATA])
+def test_get_executor_stats_succeed(task_manager):
+    with app.container.task_manager.override(task_manager):
+        client = TestClient(app)
+        res = client.get("/stats/executor")
+        assert res.is_success
+        data = res.json()
+        assert data["max_workers"] == task_manager.executor.max_workers
+        assert data["queue_depth"] == 0 and data["active_workers"] == 0 and data["utilization"] == 0
+
+
+def test_get_cache_stats_succeed(mocker):
+    mocker.patch("doru.cache.MarketCache.stats", return_value={"hits": 3, "misses": 1, "entries": 1})
+    client = TestClient(app)
+    res = client.get("/stats/cache")
+    assert res.is_success
+    assert res.json() == {"hits": 3, "misses": 1, "entries": 1}
+
+
+def test_get_fill_stats_succeed(mocker):
+    stats = {
+        "exchange": "binance",
+        "fills": 2,
+        "mean_seconds": 3,
+        "p50_seconds": 4,
+        "p90_seconds": 4,
+        "max_seconds": 4,
+    }
+    mocker.patch("doru.exchange.ExchangeRegistry.fill_stats", return_value=[stats])
+    client = TestClient(app)
+    res = client.get("/stats/fills")
+    assert res.is_success
+    assert res.json() == [stats]
+
+
+def test_get_symbol_validation_succeed(spot_markets):
+    client = TestClient(app)
+    res = client.get("/symbols/validate", params={"exchange": "bitbank", "symbol": "BTC/JPY"})
+    assert res.is_success
+    assert res.json() == {"exchange": "bitbank", "symbol": "BTC/JPY", "valid": True, "suggestions": []}
+
+    res = client.get("/symbols/validate", params={"exchange": "bitbank", "symbol": "btc-jpy"})
+    assert res.is_success
+    assert res.json()["valid"] is False and res.json()["suggestions"][0] == "BTC/JPY"
+    # the markets are cached by the daemon
+    spot_markets.assert_called_once()
+
+
+def test_get_symbol_validation_with_invalid_exchange_fail():
+    client = TestClient(app)
+    res = client.get("/symbols/validate", params={"exchange": "invalid", "symbol": "BTC/JPY"})
+    assert res.status_code == 400
+    assert client.get("/symbols/validate", params={"exchange": "bitbank"}).status_code == 422
+
+
+def test_get_symbol_validation_with_exception_fail(mocker):
+    mocker.patch("doru.exchange.Exchange.symbol_index", side_effect=Exception)
+    client = TestClient(app)
+    res = client.get("/symbols/validate", params={"exchange": "bitbank", "symbol": "BTC/JPY"})
+    assert res.status_code == 500
+
+
+def test_get_latency_stats_and_spans_succeed(mocker):
+    recorder = SpanRecorder()
+    mocker.patch("doru.api.router.recorder", recorder)
+    with recorder.run("1"), recorder.span("binance", "ticker", "BTC/USDT"):
+        pass
+    with recorder.span("kraken", "ticker"):
+        pass
+    client = TestClient(app)
+    res = client.get("/stats/latency")
+    assert res.is_success
+    assert [(s["exchange"], s["phase"], s["count"]) for s in res.json()] == [
+        ("binance", "ticker", 1),
+        ("kraken", "ticker", 1),
+    ]
+
+    res = client.get("/spans", params={"exchange": "binance"})
+    assert res.is_success
+    assert [(s["run"], s["symbol"]) for s in res.json()] == [("1", "BTC/USDT")]
+    assert client.get("/spans", params={"limit": 0}).status_code == 422
+
+
+@pytest.mark.parametrize("tasks", [TASK_DATA])
+def test_get_history_succeed(task_manager, tasks, mocker):
+    fill = {
+        "task_id": "1",
+        "order_id": "order",
+        "exchange": "bitbank",
+        "symbol": "BTC/JPY",
+        "amount": 10000,
+        "filled": 0.01,
+        "cost": 10000,
+        "price": 1000000,
+        "tasks": 2,
+        "executed_at": "2022-01-01 00:00:01",
+    }
+    get_history_mock = mocker.patch(
+        "doru.manager.task_manager.TaskManager.get_history", return_value=[OrderFill.parse_obj(fill)]
+    )
+    with app.container.task_manager.override(task_manager):
+        client = TestClient(app)
+        res = client.get("/history", params={"task_id": "1"})
+        assert res.is_success
+        assert res.json() == [fill]
+        get_history_mock.assert_called_once_with("1")
+
+
 @pytest.mark.parametrize("credentials", [CREDENTIAL_DATA])
 @pytest.mark.parametrize(
     "new_cred",
@@ -1,12 +1,23 @@
 import time
 from datetime import date, datetime, timedelta
 from logging import ERROR, WARNING
+from typing import Dict, List, Tuple
 
 import pytest
 import schedule
 
 from doru.exceptions import DoruError
-from doru.scheduler import SafeScheduler, ScheduleThread, ScheduleThreadPool
+from doru.scheduler import (
+    AsyncScheduler,
+    ExecutionPool,
+    HeapScheduler,
+    JobAggregator,
+    SafeScheduler,
+    ScheduleThread,
+    ScheduleThreadPool,
+    TimingWheelScheduler,
+)
+from doru.timetable import upcoming_runs
 
 MAX_RUNNING_THREADS = 3
 
@@ -40,6 +51,15 @@ def thread_pool():
     return pool
 
 
+@pytest.fixture
+def heap_scheduler():
+    scheduler = HeapScheduler(MAX_RUNNING_THREADS)
+    scheduler.submit("1", lambda x: x, "Daily")
+    scheduler.submit("2", lambda x: x, "Daily")
+    yield scheduler
+    scheduler.shutdown()
+
+
 @pytest.fixture
 def counter():
     return Count()
@@ -331,3 +351,588 @@ def test_schedule_thread_pool_next_run_with_valid_key_succeed(thread_pool: Sched
 def test_schedule_thread_pool_next_run_with_not_submitted_thread_retrun_none(thread_pool: ScheduleThreadPool, key):
     thread_pool.pool[key] = ScheduleThread(SafeScheduler())
     assert thread_pool.next_run(key) is None
+
+
+@pytest.mark.parametrize("key", ["3"])
+def test_heap_scheduler_submit_with_new_key_succeed(heap_scheduler: HeapScheduler, key):
+    heap_scheduler.submit(key, lambda x: x, "Daily")
+    assert key in heap_scheduler.pool
+    assert heap_scheduler.running_jobs_count == 0
+
+
+@pytest.mark.freeze_time("2023-01-01 00:01:00")
+@pytest.mark.parametrize(
+    "cycle, weekday, day, time, expected",
+    [
+        ("Daily", None, None, "00:00", datetime(2023, 1, 2, 0, 0)),
+        ("Daily", None, None, "00:02", datetime(2023, 1, 1, 0, 2)),
+        ("Weekly", "Sun", None, "00:02", datetime(2023, 1, 1, 0, 2)),
+        ("Weekly", "Wed", None, "00:00", datetime(2023, 1, 4, 0, 0)),
+        ("Monthly", None, 1, "00:00", datetime(2023, 2, 1, 0, 0)),
+        ("Monthly", None, 2, "00:00", datetime(2023, 1, 2, 0, 0)),
+    ],
+)
+def test_heap_scheduler_next_run_with_valid_key_succeed(
+    heap_scheduler: HeapScheduler, cycle, weekday, day, time, expected
+):
+    heap_scheduler.submit("3", lambda x: x, cycle, weekday=weekday, day=day, time=time)
+    assert heap_scheduler.next_run("3") == expected
+
+
+@pytest.mark.parametrize("key", ["1"])
+def test_heap_scheduler_submit_with_duplicate_key_raise_exception(heap_scheduler: HeapScheduler, key):
+    with pytest.raises(DoruError):
+        heap_scheduler.submit(key, lambda x: x, "Daily")
+
+    heap_scheduler.start(key)
+    with pytest.raises(DoruError):
+        heap_scheduler.submit(key, lambda x: x, "Daily")
+
+
+@pytest.mark.parametrize("cycle", ["Weekly", "Monthly"])
+def test_heap_scheduler_submit_without_date_param_raise_exception(heap_scheduler: HeapScheduler, cycle):
+    with pytest.raises(DoruError):
+        heap_scheduler.submit("3", lambda x: x, cycle)
+    assert "3" not in heap_scheduler.pool
+
+
+def test_heap_scheduler_start_uses_single_dispatcher_thread(heap_scheduler: HeapScheduler):
+    import threading
+
+    threads_before = threading.active_count()
+    heap_scheduler.start("1")
+    heap_scheduler.start("2")
+    assert heap_scheduler.running_jobs_count == 2
+    assert heap_scheduler.pool["1"].is_alive() and heap_scheduler.pool["2"].is_alive()
+    assert threading.active_count() <= threads_before + 1
+
+
+def test_heap_scheduler_start_when_running_jobs_reach_limit_raise_exception(heap_scheduler: HeapScheduler):
+    heap_scheduler.submit("3", lambda x: x, "Daily")
+    heap_scheduler.submit("4", lambda x: x, "Daily")
+    heap_scheduler.start("1")
+    heap_scheduler.start("2")
+    heap_scheduler.start("3")
+    with pytest.raises(DoruError):
+        heap_scheduler.start("4")
+
+    # killing a running job frees a slot
+    heap_scheduler.kill("1")
+    heap_scheduler.start("4")
+    assert heap_scheduler.running_jobs_count == 3
+
+
+@pytest.mark.parametrize("key", ["3"])
+def test_heap_scheduler_start_and_kill_with_invalid_key_only_output_debug_log(
+    heap_scheduler: HeapScheduler, key, caplog
+):
+    from logging import DEBUG
+
+    from doru.scheduler import logger
+
+    logger.setLevel(DEBUG)
+
+    heap_scheduler.start(key)
+    heap_scheduler.kill(key)
+    assert f"The key `{key}` is missing." in caplog.text
+    assert heap_scheduler.next_run(key) is None
+
+
+def test_heap_scheduler_run_pending_runs_only_due_jobs(freezer, counter):
+    heap_scheduler = HeapScheduler(MAX_RUNNING_THREADS)
+    # Stop the dispatcher thread so that jobs are only run by `run_pending` in this test.
+    heap_scheduler.shutdown()
+    freezer.move_to("2023-01-01 00:00:00")
+    heap_scheduler.submit("1", good_job, "Daily", time="00:01", count=counter)
+    heap_scheduler.submit("2", good_job, "Daily", time="00:02", count=counter)
+    heap_scheduler.submit("3", good_job, "Daily", time="00:01", count=counter)
+    for key in ("1", "2", "3"):
+        heap_scheduler.start(key)
+    heap_scheduler.kill("3")
+
+    heap_scheduler.run_pending()
+    assert counter.value == 0
+
+    freezer.move_to("2023-01-01 00:01:00")
+    heap_scheduler.run_pending()
+    assert counter.value == 1
+    assert heap_scheduler.next_run("1") == datetime(2023, 1, 2, 0, 1)
+    assert heap_scheduler.next_run("2") == datetime(2023, 1, 1, 0, 2)
+
+    freezer.move_to("2023-01-01 00:02:00")
+    heap_scheduler.run_pending()
+    assert counter.value == 2
+
+
+@pytest.mark.parametrize("scheduler_class", [HeapScheduler, TimingWheelScheduler])
+@pytest.mark.parametrize(
+    "now, expected",
+    [
+        ("2023-01-31 12:00:00", datetime(2023, 2, 28, 9, 0)),
+        ("2023-01-29 12:00:00", datetime(2023, 2, 28, 9, 0)),
+        ("2023-05-31 12:00:00", datetime(2023, 6, 28, 9, 0)),
+    ],
+)
+def test_scheduler_run_monthly_jobs_at_upcoming_runs(freezer, counter, scheduler_class, now, expected):
+    scheduler = scheduler_class(MAX_RUNNING_THREADS)
+    scheduler.shutdown()
+    freezer.move_to(now)
+    scheduler.submit("1", good_job, "Monthly", day=28, time="09:00", count=counter)
+    scheduler.start("1")
+    start = datetime.now()
+    runs = [
+        run_at for run_at, _ in upcoming_runs([("1", ("Monthly", None, 28, "09:00"))], start, start + timedelta(90))
+    ]
+    assert scheduler.next_run("1") == runs[0] == expected
+
+    freezer.move_to(runs[0])
+    scheduler.run_pending()
+    assert counter.value == 1
+    assert scheduler.next_run("1") == runs[1]
+
+
+def test_heap_scheduler_run_pending_with_job_exception_reschedule_job(freezer, counter, caplog):
+    heap_scheduler = HeapScheduler(MAX_RUNNING_THREADS)
+    heap_scheduler.shutdown()
+    freezer.move_to("2023-01-01 00:00:00")
+    heap_scheduler.submit("1", bad_job, "Daily", time="00:01", count=counter)
+    heap_scheduler.start("1")
+
+    freezer.move_to("2023-01-01 00:01:00")
+    heap_scheduler.run_pending()
+    assert counter.value == 1
+    assert ("doru.scheduler", ERROR, "Failed to run job: bad job") in caplog.record_tuples
+    assert heap_scheduler.next_run("1") == datetime(2023, 1, 2, 0, 1)
+    assert heap_scheduler.pool["1"].is_alive()
+
+
+def test_heap_scheduler_run_pending_with_job_exception_cancel_job(freezer, counter, caplog):
+    heap_scheduler = HeapScheduler(MAX_RUNNING_THREADS, reschedule_on_failure=False)
+    heap_scheduler.shutdown()
+    freezer.move_to("2023-01-01 00:00:00")
+    heap_scheduler.submit("1", bad_job, "Daily", time="00:01", count=counter)
+    heap_scheduler.start("1")
+
+    freezer.move_to("2023-01-01 00:01:00")
+    heap_scheduler.run_pending()
+    assert ("doru.scheduler", WARNING, "The job was canceled.") in caplog.record_tuples
+    assert not heap_scheduler.pool["1"].is_alive()
+    assert heap_scheduler.running_jobs_count == 0
+
+    # the cancelled job can be submitted again
+    heap_scheduler.submit("1", good_job, "Daily", count=counter)
+    assert not heap_scheduler.pool["1"].is_started()
+
+
+def test_heap_scheduler_spread_window_delays_jobs_by_offset(freezer, counter):
+    heap_scheduler = HeapScheduler(MAX_RUNNING_THREADS, spread_window=30)
+    heap_scheduler.shutdown()
+    freezer.move_to("2023-01-01 00:00:00")
+    heap_scheduler.submit("1", good_job, "Daily", time="00:01", count=counter)
+    heap_scheduler.submit("2", good_job, "Daily", time="00:01", spread_window=0, count=counter)
+    heap_scheduler.start("1")
+    heap_scheduler.start("2")
+    offset = heap_scheduler.spread_offset("1")
+    assert timedelta(0) < offset < timedelta(seconds=30)
+    assert heap_scheduler.spread_offset("2") == timedelta(0)
+    assert heap_scheduler.next_run("1") == datetime(2023, 1, 1, 0, 1) + offset
+
+    freezer.move_to("2023-01-01 00:01:00")
+    heap_scheduler.run_pending()
+    assert counter.value == 1
+
+    freezer.move_to(datetime(2023, 1, 1, 0, 1) + offset)
+    heap_scheduler.run_pending()
+    assert counter.value == 2
+    # the job is rescheduled for the next run of the schedule, not a day after the delayed run
+    assert heap_scheduler.next_run("1") == datetime(2023, 1, 2, 0, 1) + offset
+
+
+@pytest.mark.parametrize("spread_window", [-1, 3601])
+def test_heap_scheduler_with_invalid_spread_window_raise_exception(spread_window):
+    with pytest.raises(DoruError):
+        HeapScheduler(MAX_RUNNING_THREADS, spread_window=spread_window)
+    with pytest.raises(DoruError):
+        HeapScheduler(MAX_RUNNING_THREADS).submit("1", lambda: None, "Daily", spread_window=spread_window)
+
+
+def test_heap_scheduler_dispatcher_thread_sleeps_until_next_run(counter):
+    heap_scheduler = HeapScheduler(MAX_RUNNING_THREADS)
+    heap_scheduler.submit("1", good_job, "Daily", count=counter)
+    heap_scheduler.pool["1"].job.next_run = datetime.now() + timedelta(seconds=0.5)
+    heap_scheduler.start("1")
+
+    time.sleep(0.2)
+    assert counter.value == 0
+    idle_seconds = heap_scheduler.idle_seconds()
+    assert idle_seconds is not None and 0 < idle_seconds <= 0.5
+
+    time.sleep(0.8)
+    assert counter.value == 1
+    # The job has been rescheduled to the next day
+    idle_seconds = heap_scheduler.idle_seconds()
+    assert idle_seconds is not None and idle_seconds > 60
+    heap_scheduler.shutdown()
+
+
+def test_heap_scheduler_dispatcher_thread_wakes_up_when_queue_changes(counter):
+    heap_scheduler = HeapScheduler(MAX_RUNNING_THREADS)
+    heap_scheduler.submit("1", good_job, "Daily", count=counter)
+    heap_scheduler.submit("2", good_job, "Daily", count=counter)
+    heap_scheduler.start("1")
+
+    # A job that runs earlier than the sleeping dispatcher expects is still executed on time.
+    heap_scheduler.pool["2"].job.next_run = datetime.now() + timedelta(seconds=0.2)
+    heap_scheduler.start("2")
+    time.sleep(0.5)
+    assert counter.value == 1
+
+    # The dispatcher thread exits as soon as no job is running.
+    heap_scheduler.kill("1")
+    heap_scheduler.kill("2")
+    time.sleep(0.2)
+    assert heap_scheduler._thread is None
+    assert heap_scheduler.idle_seconds() is None
+
+
+def test_timing_wheel_scheduler_run_pending_runs_only_due_jobs(freezer, counter):
+    scheduler = TimingWheelScheduler(10)
+    scheduler.shutdown()
+    freezer.move_to("2023-01-01 00:00:00")
+    scheduler.submit("1", good_job, "Daily", time="00:01", count=counter)
+    scheduler.submit("2", good_job, "Weekly", weekday="Mon", count=counter)
+    scheduler.submit("3", good_job, "Monthly", day=2, count=counter)
+    scheduler.submit("4", good_job, "Daily", time="00:01", count=counter)
+    for key in ("1", "2", "3", "4"):
+        scheduler.start(key)
+    scheduler.kill("4")
+    assert len(scheduler._locations) == 3
+
+    freezer.move_to("2023-01-01 00:00:59")
+    scheduler.run_pending()
+    assert counter.value == 0
+
+    freezer.move_to("2023-01-01 00:01:00")
+    scheduler.run_pending()
+    assert counter.value == 1
+    assert scheduler.next_run("1") == datetime(2023, 1, 2, 0, 1)
+
+    freezer.move_to("2023-01-02 00:00:30")
+    scheduler.run_pending()
+    assert counter.value == 3
+
+    # all the jobs due in the skipped period are fired in a batch
+    freezer.move_to("2023-02-02 00:00:01")
+    scheduler.run_pending()
+    assert counter.value == 6
+    assert scheduler.next_run("3") == datetime(2023, 3, 2)
+
+
+def test_timing_wheel_scheduler_when_clock_is_turned_back(freezer, counter):
+    scheduler = TimingWheelScheduler(10)
+    scheduler.shutdown()
+    freezer.move_to("2023-01-01 00:00:00")
+    scheduler.submit("1", good_job, "Daily", time="00:10", count=counter)
+    scheduler.start("1")
+
+    freezer.move_to("2022-12-31 23:00:00")
+    scheduler.run_pending()
+    scheduler.submit("2", good_job, "Daily", time="23:30", count=counter)
+    scheduler.start("2")
+    scheduler.run_pending()
+    assert counter.value == 0
+
+    freezer.move_to("2022-12-31 23:30:00")
+    scheduler.run_pending()
+    assert counter.value == 1
+
+
+def test_timing_wheel_scheduler_fires_same_jobs_as_heap_scheduler(freezer):
+    import random
+
+    fired: Dict[str, List[Tuple[str, datetime]]] = {"heap": [], "wheel": []}
+    for name, scheduler in (
+        ("heap", HeapScheduler(1000, spread_window=60)),
+        ("wheel", TimingWheelScheduler(1000, spread_window=60)),
+    ):
+        scheduler.shutdown()
+        rand = random.Random(0)
+        freezer.move_to("2023-01-01 12:34:56")
+        for i in range(200):
+            scheduler.submit(
+                str(i),
+                lambda name=name, key=str(i): fired[name].append((key, datetime.now())),
+                rand.choice(["Daily", "Weekly", "Monthly"]),
+                weekday=rand.choice(["Sun", "Wed"]),
+                day=rand.randint(1, 28),
+                time=f"{rand.randint(0, 23):02}:{rand.randint(0, 59):02}",
+            )
+            scheduler.start(str(i))
+        for key in rand.sample(range(200), 20):
+            scheduler.kill(str(key))
+        for _ in range(2000):
+            freezer.tick(timedelta(seconds=rand.choice([1, 59, 3600, 5000])))
+            scheduler.run_pending()
+    assert fired["heap"] and sorted(fired["heap"]) == sorted(fired["wheel"])
+
+
+def test_timing_wheel_scheduler_dispatcher_thread_fires_due_jobs(counter):
+    scheduler = TimingWheelScheduler(MAX_RUNNING_THREADS)
+    scheduler.submit("1", good_job, "Daily", count=counter)
+    scheduler.pool["1"].job.next_run = datetime.now() + timedelta(seconds=0.2)
+    scheduler.start("1")
+    # jobs are fired at the beginning of the second following the dispatch time at the latest
+    time.sleep(1.5)
+    assert counter.value == 1
+    idle_seconds = scheduler.idle_seconds()
+    assert idle_seconds is not None and idle_seconds > 60
+    scheduler.shutdown()
+
+
+def test_async_scheduler_runs_coroutines_in_event_loop_and_functions_in_executor():
+    import asyncio
+    import threading
+
+    threads: Dict[str, threading.Thread] = {}
+
+    async def coroutine_job():
+        await asyncio.sleep(0)
+        threads["coroutine"] = threading.current_thread()
+
+    def sync_job():
+        threads["function"] = threading.current_thread()
+
+    async def main() -> None:
+        executor = ExecutionPool(max_workers=1)
+        scheduler = AsyncScheduler(MAX_RUNNING_THREADS, executor=executor)
+        scheduler.submit("1", coroutine_job, "Daily")
+        scheduler.submit("2", sync_job, "Daily")
+        for key in ("1", "2"):
+            scheduler.pool[key].job.next_run = datetime.now() + timedelta(seconds=0.1)
+            scheduler.start(key)
+        dispatcher = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(0.5)
+        scheduler.shutdown()
+        await dispatcher
+        executor.shutdown()
+        # no dispatcher thread is created
+        assert scheduler._thread is None
+        assert scheduler.next_run("1") == scheduler.next_run("2")
+        next_run = scheduler.next_run("1")
+        assert next_run is not None and next_run > datetime.now()
+
+    asyncio.run(main())
+    assert threads["coroutine"] is threading.current_thread()
+    assert threads["function"] is not threading.current_thread()
+
+
+def test_async_scheduler_is_woken_up_by_jobs_started_in_another_thread(counter):
+    import asyncio
+    import threading
+
+    async def job(count: Count):
+        count.increment()
+
+    async def main() -> None:
+        scheduler = AsyncScheduler(MAX_RUNNING_THREADS)
+        dispatcher = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(0.1)
+
+        def start():
+            scheduler.submit("1", job, "Daily", count=counter)
+            scheduler.pool["1"].job.next_run = datetime.now() + timedelta(seconds=0.1)
+            scheduler.start("1")
+
+        thread = threading.Thread(target=start)
+        thread.start()
+        thread.join()
+        # the dispatcher sleeps for at most 60 seconds unless it is woken up
+        await asyncio.sleep(0.5)
+        assert counter.value == 1
+        with pytest.raises(DoruError):
+            await scheduler.run()
+        scheduler.shutdown()
+        await dispatcher
+
+    asyncio.run(main())
+
+
+def test_async_scheduler_cancels_failed_coroutine_job(counter, caplog):
+    import asyncio
+
+    async def job(count: Count):
+        bad_job(count)
+
+    async def main() -> None:
+        scheduler = AsyncScheduler(MAX_RUNNING_THREADS, reschedule_on_failure=False)
+        scheduler.submit("1", job, "Daily", count=counter)
+        scheduler.pool["1"].job.next_run = datetime.now()
+        scheduler.start("1")
+        dispatcher = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(0.2)
+        assert not scheduler.pool["1"].is_alive()
+        scheduler.shutdown()
+        await dispatcher
+
+    asyncio.run(main())
+    assert counter.value == 1
+    assert ("doru.scheduler", ERROR, "Failed to run job: bad job") in caplog.record_tuples
+
+
+def test_execution_pool_runs_jobs_in_worker_threads(counter):
+    import threading
+
+    pool = ExecutionPool(max_workers=2)
+    threads = []
+    done = threading.Event()
+
+    def job():
+        threads.append(threading.current_thread())
+        good_job(counter)
+        if counter.value == 3:
+            done.set()
+
+    for _ in range(3):
+        pool.submit(job)
+    assert done.wait(1)
+    assert threading.current_thread() not in threads
+    assert pool.stats()["workers"] <= 2
+    pool.shutdown()
+
+
+def test_execution_pool_limits_jobs_per_group():
+    import threading
+
+    pool = ExecutionPool(max_workers=4, max_jobs_per_group=1)
+    release = threading.Event()
+    started = []
+
+    def job(name: str):
+        started.append(name)
+        release.wait(1)
+
+    pool.submit(lambda: job("a1"), group="a")
+    pool.submit(lambda: job("a2"), group="a")
+    pool.submit(lambda: job("b1"), group="b")
+    time.sleep(0.2)
+    # Only one job of the group `a` runs at a time
+    assert sorted(started) == ["a1", "b1"]
+    stats = pool.stats()
+    assert stats["active_workers"] == 2 and stats["queue_depth"] == 1 and stats["utilization"] == 0.5
+
+    release.set()
+    time.sleep(0.2)
+    assert sorted(started) == ["a1", "a2", "b1"]
+    stats = pool.stats()
+    assert stats["active_workers"] == 0 and stats["queue_depth"] == 0 and stats["completed"] == 3
+    pool.shutdown()
+
+
+def test_execution_pool_logs_failed_jobs(counter, caplog):
+    pool = ExecutionPool(max_workers=1)
+    pool.submit(lambda: bad_job(counter))
+    pool.submit(lambda: good_job(counter))
+    time.sleep(0.2)
+    assert counter.value == 2
+    assert ("doru.scheduler", ERROR, "Failed to execute job: bad job") in caplog.record_tuples
+
+    pool.shutdown()
+    with pytest.raises(DoruError):
+        pool.submit(lambda: good_job(counter))
+
+
+def test_execution_pool_shutdown_wait_for_running_jobs(counter):
+    import threading
+
+    pool = ExecutionPool(max_workers=1)
+    started = threading.Event()
+
+    def slow_job():
+        started.set()
+        time.sleep(0.2)
+        good_job(counter)
+
+    pool.submit(slow_job)
+    pool.submit(lambda: good_job(counter))
+    assert started.wait(1)
+    pool.shutdown(wait=True)
+    # The running job completes, and the pending job is discarded
+    assert counter.value == 1
+    assert pool.stats()["completed"] == 1
+
+
+@pytest.mark.parametrize("max_workers, max_jobs_per_group", [(0, None), (1, 0)])
+def test_execution_pool_with_invalid_limit_raise_exception(max_workers, max_jobs_per_group):
+    with pytest.raises(DoruError):
+        ExecutionPool(max_workers, max_jobs_per_group)
+
+
+def test_heap_scheduler_hands_jobs_over_to_execution_pool(freezer, counter):
+    import threading
+
+    release = threading.Event()
+
+    def slow_job(count: Count):
+        release.wait(1)
+        count.increment()
+
+    executor = ExecutionPool(max_workers=2)
+    heap_scheduler = HeapScheduler(MAX_RUNNING_THREADS, executor=executor)
+    heap_scheduler.shutdown()
+    freezer.move_to("2023-01-01 00:00:00")
+    heap_scheduler.submit("1", slow_job, "Daily", time="00:01", group="binance", count=counter)
+    heap_scheduler.start("1")
+
+    freezer.move_to("2023-01-01 00:01:00")
+    heap_scheduler.run_pending()
+    # The job is rescheduled without waiting for the execution to finish
+    assert counter.value == 0
+    assert heap_scheduler.next_run("1") == datetime(2023, 1, 2, 0, 1)
+    assert heap_scheduler.pool["1"].group == "binance"
+
+    release.set()
+    time.sleep(0.2)
+    assert counter.value == 1
+    executor.shutdown()
+
+
+def test_heap_scheduler_cancels_failed_job_executed_in_execution_pool(freezer, counter, caplog):
+    executor = ExecutionPool(max_workers=1)
+    heap_scheduler = HeapScheduler(MAX_RUNNING_THREADS, reschedule_on_failure=False, executor=executor)
+    heap_scheduler.shutdown()
+    freezer.move_to("2023-01-01 00:00:00")
+    heap_scheduler.submit("1", bad_job, "Daily", time="00:01", count=counter)
+    heap_scheduler.start("1")
+
+    freezer.move_to("2023-01-01 00:01:00")
+    heap_scheduler.run_pending()
+    time.sleep(0.2)
+    assert counter.value == 1
+    assert ("doru.scheduler", WARNING, "The job was canceled.") in caplog.record_tuples
+    assert not heap_scheduler.pool["1"].is_alive()
+    executor.shutdown()
+
+
+def test_job_aggregator_executes_jobs_with_same_key_together():
+    import threading
+
+    batches = []
+    done = threading.Event()
+
+    def func(batch):
+        batches.append(batch)
+        if len(batches) == 2:
+            done.set()
+
+    pool = ExecutionPool(max_workers=2)
+    aggregator = JobAggregator(0.2, pool, func)
+    aggregator.submit(("binance", "BTC/USDT"), group="binance", id="1")
+    aggregator.submit(("binance", "ETH/USDT"), group="binance", id="2")
+    aggregator.submit(("binance", "BTC/USDT"), group="binance", id="3")
+    assert batches == []
+    assert done.wait(1)
+    assert sorted(batches, key=len) == [[{"id": "2"}], [{"id": "1"}, {"id": "3"}]]
+    pool.shutdown()
+
+    with pytest.raises(DoruError):
+        JobAggregator(0, pool, func)
@@ -0,0 +1,118 @@
+import os
+import time
+import zlib
+from datetime import datetime
+from typing import List, Tuple
+
+import pytest
+
+from doru.exceptions import DoruError
+from doru.shard import ShardedScheduler, shard_of
+
+
+def write_pid(path: str) -> None:
+    with open(path, "w") as f:
+        f.write(str(os.getpid()))
+
+
+def write_pid_later(path: str, delay: float) -> None:
+    time.sleep(delay)
+    write_pid(path)
+
+
+@pytest.fixture
+def sharded_scheduler():
+    scheduler = ShardedScheduler(2, max_running_jobs=2, max_workers=2)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_shard_of_is_stable():
+    assert shard_of("bitbank", 4) == zlib.crc32(b"bitbank") % 4
+    assert shard_of(None, 4) == shard_of("", 4)
+    assert {shard_of(e, 2) for e in ("binance", "bitbank", "bitflyer", "coincheck", "kraken")} == {0, 1}
+
+
+def test_sharded_scheduler_with_invalid_shards_raise_exception():
+    with pytest.raises(DoruError):
+        ShardedScheduler(0, max_running_jobs=1, max_workers=1)
+
+
+def test_sharded_scheduler_routes_jobs_to_shards(sharded_scheduler: ShardedScheduler):
+    sharded_scheduler.submit("1", write_pid, "Daily", time="12:00", group="bitbank", path="unused")
+    sharded_scheduler.submit("2", write_pid, "Weekly", weekday="Mon", group="binance", path="unused")
+    sharded_scheduler.submit("3", write_pid, "Daily", group="bitflyer", path="unused")
+    assert sharded_scheduler.pool["1"].shard == shard_of("bitbank", 2)
+    assert sharded_scheduler.pool["2"].shard == shard_of("binance", 2)
+    with pytest.raises(DoruError):
+        sharded_scheduler.submit("1", write_pid, "Daily", group="bitbank", path="unused")
+
+    sharded_scheduler.start("1")
+    sharded_scheduler.start("2")
+    assert sharded_scheduler.running_jobs_count == 2
+    with pytest.raises(DoruError):
+        sharded_scheduler.start("3")
+
+    next_run = sharded_scheduler.next_run("1")
+    assert next_run is not None and next_run.strftime("%H:%M") == "12:00"
+    next_run = sharded_scheduler.next_run("2")
+    assert next_run is not None and next_run.weekday() == 0
+
+    sharded_scheduler.kill("1")
+    assert "1" not in sharded_scheduler.pool
+    assert sharded_scheduler.next_run("1") is None
+    sharded_scheduler.start("3")
+    assert sharded_scheduler.pool["3"].is_alive()
+
+
+def test_sharded_scheduler_propagates_exception_in_shard(sharded_scheduler: ShardedScheduler):
+    with pytest.raises(DoruError):
+        sharded_scheduler.submit("1", write_pid, "Weekly", group="bitbank", path="unused")
+    assert "1" not in sharded_scheduler.pool
+
+
+def test_sharded_scheduler_executes_jobs_in_shard_process(sharded_scheduler: ShardedScheduler, tmpdir):
+    runs: List[Tuple[str, datetime]] = []
+    sharded_scheduler.on_run = lambda key, run_at: runs.append((key, run_at))
+    path = str(tmpdir.join("pid"))
+    sharded_scheduler.execute("1", write_pid, path, run_at=datetime(2023, 1, 1), group="bitbank")
+
+    for _ in range(100):
+        if runs and sharded_scheduler.stats()["completed"] == 1:
+            break
+        time.sleep(0.1)
+    assert runs == [("1", datetime(2023, 1, 1))]
+    with open(path) as f:
+        assert int(f.read()) != os.getpid()
+    assert sharded_scheduler.stats()["max_workers"] == 4
+
+
+def test_sharded_scheduler_counts_running_jobs(sharded_scheduler: ShardedScheduler):
+    sharded_scheduler.submit("1", write_pid, "Daily", group="bitbank", path="unused")
+    sharded_scheduler.submit("2", write_pid, "Daily", group="binance", path="unused")
+    sharded_scheduler.start("1")
+    sharded_scheduler.start("1")
+    assert sharded_scheduler.running_jobs_count == 1
+    sharded_scheduler.kill("2")
+    assert sharded_scheduler.running_jobs_count == 1
+    sharded_scheduler.kill("1")
+    assert sharded_scheduler.running_jobs_count == 0
+
+
+def test_sharded_scheduler_shutdown_stops_processes_once(sharded_scheduler: ShardedScheduler):
+    sharded_scheduler.shutdown()
+    assert not any(shard.process.is_alive() for shard in sharded_scheduler._shards)
+    # the fixture shuts the scheduler down again
+    sharded_scheduler.shutdown()
+
+
+def test_sharded_scheduler_shutdown_completes_running_jobs(sharded_scheduler: ShardedScheduler, tmpdir):
+    path = str(tmpdir.join("pid"))
+    sharded_scheduler.execute("1", write_pid_later, path, 0.5, group="bitbank")
+    for _ in range(100):
+        if sharded_scheduler.stats()["active_workers"] == 1:
+            break
+        time.sleep(0.01)
+    sharded_scheduler.shutdown()
+    with open(path) as f:
+        assert int(f.read()) != os.getpid()
@@ -0,0 +1,110 @@
+import asyncio
+import datetime
+import time
+
+import ccxt
+import pytest
+
+from doru.api.schema import TaskCreate
+from doru.exchange import AsyncExchange, Exchange
+from doru.simulator import (
+    Distribution,
+    SimulatedVenue,
+    SimulatorConfig,
+    parse_simulator_config,
+)
+
+
+@pytest.fixture
+def venue(request, mocker) -> SimulatedVenue:
+    config = getattr(request, "param", SimulatorConfig(markets=10, seed=0))
+    venue = SimulatedVenue(config)
+    mocker.patch("doru.simulator.venue", venue)
+    mocker.patch("doru.exchange.ExchangeRegistry.read_credential", return_value={})
+    return venue
+
+
+def test_parse_simulator_config():
+    config = parse_simulator_config("latency=lognormal:0.05:0.5, fill_delay=uniform:1:30,error_rate=0.01,markets=5")
+    assert config == SimulatorConfig(
+        latency=Distribution("lognormal", 0.05, 0.5),
+        fill_delay=Distribution("uniform", 1, 30),
+        error_rate=0.01,
+        markets=5,
+    )
+    assert parse_simulator_config("") == SimulatorConfig()
+    assert parse_simulator_config("latency=0.1").latency == Distribution("fixed", 0.1)
+
+
+@pytest.mark.parametrize(
+    "value", ["latency=normal:1:2", "latency=uniform:2:1", "error_rate=2", "markets=0", "foo=1", "rate_limit=x"]
+)
+def test_parse_simulator_config_with_invalid_value_raise_exception(value):
+    with pytest.raises(ValueError):
+        parse_simulator_config(value)
+
+
+@pytest.mark.parametrize("venue", [SimulatorConfig(markets=10, fill_delay=Distribution("fixed", 0.3))], indirect=True)
+def test_exchange_place_order_on_simulated_exchange(venue: SimulatedVenue):
+    exchange = Exchange("simulated")
+    symbols = exchange.fetch_spot_symbols()
+    assert len(symbols) == 10 and "BTC/USDT" in symbols
+
+    order_id = exchange.create_order("BTC/USDT", 1000)
+    assert exchange.fetch_order(order_id, "BTC/USDT")["status"] == "open"
+    assert exchange.wait_order_complete(order_id, "BTC/USDT", tick=0.1) == "closed"
+    order = exchange.fetch_order(order_id, "BTC/USDT")
+    assert order["filled"] == order["amount"] and order["cost"] == pytest.approx(1000, rel=0.01)
+
+    with pytest.raises(Exception):
+        exchange.create_order("UNKNOWN/USDT", 1000)
+
+
+@pytest.mark.parametrize("venue", [SimulatorConfig(fill_delay=Distribution("fixed", 60))], indirect=True)
+def test_cancel_order_on_simulated_exchange(venue: SimulatedVenue):
+    exchange = Exchange("simulated")
+    order_id = exchange.create_order("ETH/USDT", 1000)
+    assert exchange.wait_order_complete(order_id, "ETH/USDT", datetime.timedelta(seconds=0.1), tick=0.01) == "open"
+    exchange.exchange.cancel_order(order_id, "ETH/USDT")
+    assert exchange.fetch_order(order_id, "ETH/USDT")["status"] == "canceled"
+    with pytest.raises(ccxt.OrderNotFound):
+        exchange.exchange.cancel_order(order_id, "ETH/USDT")
+
+
+@pytest.mark.parametrize("venue", [SimulatorConfig(error_rate=1)], indirect=True)
+def test_simulated_exchange_inject_errors(venue: SimulatedVenue):
+    with pytest.raises(ccxt.NetworkError):
+        Exchange("simulated").exchange.fetch_ticker("BTC/USDT")
+    assert venue.requests == venue.errors == 1
+
+
+@pytest.mark.parametrize(
+    "venue", [SimulatorConfig(rate_limit=2, latency=Distribution("uniform", 0.01, 0.02))], indirect=True
+)
+def test_simulated_exchange_enforce_rate_limit(venue: SimulatedVenue):
+    client = Exchange("simulated").exchange
+    assert client.rateLimit == 500
+    start = time.monotonic()
+    client.fetch_ticker("BTC/USDT")
+    client.fetch_ticker("BTC/USDT")
+    assert time.monotonic() - start >= 0.02
+    with pytest.raises(ccxt.RateLimitExceeded):
+        client.fetch_ticker("BTC/USDT")
+
+
+def test_async_exchange_place_order_on_simulated_exchange(venue: SimulatedVenue):
+    async def main() -> None:
+        async with AsyncExchange("simulated") as exchange:
+            assert len(await exchange.fetch_spot_symbols()) == 10
+            order_id = await exchange.create_order("BTC/USDT", 1000)
+            assert await exchange.wait_order_complete(order_id, "BTC/USDT", tick=0.01) == "closed"
+
+    asyncio.run(main())
+    assert venue.requests == 4
+
+
+def test_validate_task_on_simulated_exchange(venue: SimulatedVenue):
+    task = TaskCreate(symbol="SIM0/USDT", amount=100, cycle="Daily", time="00:00", exchange="simulated")
+    assert task.exchange == "simulated"
+    with pytest.raises(ValueError):
+        TaskCreate(symbol="SIM10/USDT", amount=100, cycle="Daily", time="00:00", exchange="simulated")
@@ -0,0 +1,113 @@
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from doru.manager.storage import (
+    JsonTaskStorage,
+    SqliteTaskStorage,
+    TaskStorage,
+    create_task_storage,
+)
+from doru.manager.task_registry import TaskRecord, TaskRegistry
+
+TASKS = {
+    "1": {
+        "id": "1",
+        "symbol": "BTC/JPY",
+        "amount": 10000.0,
+        "cycle": "Daily",
+        "time": "00:00",
+        "exchange": "bitbank",
+        "status": "Running",
+        "last_run": "2022-01-01 00:00",
+    },
+    "2": {
+        "id": "2",
+        "symbol": "ETH/JPY",
+        "amount": 1000.0,
+        "cycle": "Weekly",
+        "weekday": "Mon",
+        "time": "23:59",
+        "exchange": "bitflyer",
+        "status": "Stopped",
+    },
+}
+
+
+@pytest.fixture
+def legacy_file(tmpdir) -> Path:
+    file = Path(tmpdir) / "task.json"
+    with open(file, "w") as f:
+        json.dump(TASKS, f)
+    return file
+
+
+def test_create_task_storage_by_file_name(tmpdir):
+    assert isinstance(create_task_storage(Path(tmpdir) / "task.json"), JsonTaskStorage)
+    assert isinstance(create_task_storage(Path(tmpdir) / "task.db"), SqliteTaskStorage)
+
+
+def test_sqlite_storage_migrate_json_file_once(tmpdir, legacy_file: Path):
+    file = Path(tmpdir) / "task.db"
+    storage = SqliteTaskStorage(file, legacy_file=legacy_file)
+    assert storage.load() == list(TASKS.values())
+    assert not legacy_file.exists() and legacy_file.with_name("task.json.migrated").exists()
+    assert sqlite3.connect(str(file)).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    # The file put back is not imported again.
+    legacy_file.with_name("task.json.migrated").rename(legacy_file)
+    registry = TaskRegistry([TaskRecord(**v) for v in storage.load()])
+    registry.pop("1")
+    storage.save(registry, ["1"])
+    assert SqliteTaskStorage(file, legacy_file=legacy_file).load() == [TASKS["2"]]
+    assert legacy_file.exists()
+
+
+def test_sqlite_storage_not_created_with_invalid_json_file(tmpdir, legacy_file: Path):
+    legacy_file.write_text("{")
+    file = Path(tmpdir) / "task.db"
+    with pytest.raises(ValueError):
+        SqliteTaskStorage(file, legacy_file=legacy_file)
+    assert legacy_file.exists()
+    # The import is tried again after the file is fixed.
+    with open(legacy_file, "w") as f:
+        json.dump(TASKS, f)
+    assert SqliteTaskStorage(file, legacy_file=legacy_file).load() == list(TASKS.values())
+
+
+def test_sqlite_storage_save_only_given_tasks(tmpdir):
+    storage = SqliteTaskStorage(Path(tmpdir) / "task.db")
+    registry = TaskRegistry([TaskRecord(**v) for v in TASKS.values()])  # type: ignore[arg-type]
+    storage.save(registry, ["2", "1"])
+    # the tasks are loaded in the order in which they were stored first
+    assert [t["id"] for t in storage.load()] == ["2", "1"]
+
+    registry.set_status("2", "Running")
+    registry["1"].last_run = "2022-02-01 00:00"
+    storage.save(registry, ["2"])
+    assert [(t["status"], t.get("last_run")) for t in storage.load()] == [
+        ("Running", None),
+        ("Running", "2022-01-01 00:00"),
+    ]
+
+    registry.pop("2")
+    storage.save(registry, ["2", "1"])
+    assert storage.load() == [dict(TASKS["1"], last_run="2022-02-01 00:00")]
+
+
+def test_sqlite_storage_close_connection(tmpdir):
+    storage = SqliteTaskStorage(Path(tmpdir) / "task.db")
+    storage.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        storage.load()
+
+
+def test_incomplete_storage_fail():
+    class LoadOnlyStorage(TaskStorage):
+        def load(self):
+            return []
+
+    with pytest.raises(TypeError):
+        LoadOnlyStorage()  # type: ignore[abstract]
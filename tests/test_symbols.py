@@ -0,0 +1,52 @@
+import pytest
+
+from doru.symbols import SymbolIndex, index_of, normalize
+
+SYMBOLS = ["BTC/USDT", "ETH/USDT", "ETH/BTC", "BTC/JPY", "XRP/JPY", "1INCH/USDT"]
+
+
+@pytest.fixture
+def index() -> SymbolIndex:
+    return SymbolIndex(SYMBOLS)
+
+
+def test_normalize():
+    assert normalize("btc-usdt") == normalize("BTC_USDT") == normalize("btc/usdt ") == "BTCUSDT"
+
+
+def test_lookup_and_resolve(index: SymbolIndex):
+    assert "BTC/USDT" in index and "btc/usdt" not in index and "BTC/EUR" not in index
+    assert len(index) == len(SYMBOLS)
+    assert index.resolve("BTC/USDT") == "BTC/USDT"
+    assert index.resolve("btc-usdt") == index.resolve("btcusdt") == "BTC/USDT"
+    assert index.resolve("BTC/EUR") is None
+
+
+def test_filter_by_base_and_quote(index: SymbolIndex):
+    assert index.filter() == sorted(SYMBOLS)
+    assert index.filter(base="eth") == ["ETH/BTC", "ETH/USDT"]
+    assert index.filter(quote="JPY") == ["BTC/JPY", "XRP/JPY"]
+    assert index.filter(base="BTC", quote="JPY") == ["BTC/JPY"]
+    assert index.filter(base="DOGE") == []
+
+
+@pytest.mark.parametrize(
+    "symbol, expected",
+    [
+        ("btc-usdt", "BTC/USDT"),
+        ("BTC/USD", "BTC/USDT"),
+        ("XRP/USDT", "XRP/JPY"),
+        ("1INCH/USD", "1INCH/USDT"),
+    ],
+)
+def test_suggest_close_symbols(index: SymbolIndex, symbol, expected):
+    suggestions = index.suggest(symbol, n=3)
+    assert suggestions[0] == expected and len(suggestions) <= 3
+    assert index.suggest("ZZZZZZZZZZ") == []
+
+
+def test_index_of_build_index_once_for_each_markets():
+    markets = {s: {"symbol": s} for s in SYMBOLS}
+    index = index_of("binance", markets)
+    assert index_of("binance", markets) is index
+    assert index_of("binance", dict(markets)) is not index
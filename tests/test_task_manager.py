@@ -1,5 +1,9 @@
+import asyncio
+import datetime
 import json
-from typing import Any, Dict
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict
 
 import pytest
 
@@ -13,10 +17,25 @@ from doru.exceptions import (
     TaskDuplicate,
     TaskNotExist,
 )
-from doru.exchange import OrderStatus
-from doru.manager.task_manager import TaskManager, create_task_manager, do_order
+from doru.exchange import OrderStatus, PollSchedule
+from doru.manager.task_manager import (
+    TaskManager,
+    create_task_manager,
+    do_order,
+    do_order_async,
+    place_order,
+)
+from doru.scheduler import (
+    AsyncScheduler,
+    HeapScheduler,
+    TimingWheelScheduler,
+    _is_coroutine_function,
+)
+from doru.shard import ShardedScheduler
+from doru.simulator import SimulatedVenue, SimulatorConfig
+from doru.tracing import SpanRecorder
 
-TEST_DATA = {
+TEST_DATA: Dict[str, Dict[str, Any]] = {
     "1": {
         "id": "1",
         "symbol": "BTC/JPY",
@@ -75,6 +94,90 @@ def test_init_with_valid_task_file_succeed(task_file, tasks):
             assert t["id"] in m.pool.pool
 
 
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_init_and_get_tasks_without_exchange_requests(task_file, mocker):
+    fetch = mocker.patch("doru.exchange.Exchange._fetch_spot_markets", side_effect=Exception("network"))
+    m = create_task_manager(task_file)
+    assert [t.id for t in m.get_tasks()] == list(TEST_DATA)
+    # the responses are validated against Task as well
+    assert [Task.parse_obj(t.dict()) for t in m.get_tasks()] == m.get_tasks()
+    fetch.assert_not_called()
+
+
+def test_task_create_validate_symbol_but_task_not(mocker):
+    mocker.patch(
+        "doru.exchange.Exchange._fetch_spot_markets",
+        return_value={"BTC/JPY": {"symbol": "BTC/JPY", "precision": {"amount": 4}}},
+    )
+    data = {"symbol": "XRP/JPY", "amount": 1, "cycle": "Daily", "time": "00:00", "exchange": "bitbank"}
+    with pytest.raises(ValueError):
+        TaskCreate.parse_obj(data)
+    assert Task.parse_obj({**data, "id": "1", "status": "Stopped"}).symbol == "XRP/JPY"
+    with pytest.raises(ValueError):
+        Task.parse_obj({**data, "id": "1", "status": "Stopped", "exchange": "unknown"})
+
+
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_init_with_database_import_task_file(task_file):
+    file = str(task_file).replace(".json", ".db")
+    m = create_task_manager(file)
+    assert {k: v.dict(exclude_none=True) for (k, v) in m.tasks.items()} == TEST_DATA
+    assert m.pool.pool["1"].is_alive()
+
+    m.start_task("2")
+    m.stop_task("1")
+    m.remove_task("3")
+    new_task = m.add_task(TaskCreate(symbol="ETH/JPY", amount=1, cycle="Daily", time="00:00", exchange="bitbank"))
+    m.pool.kill("2")
+    tasks = create_task_manager(file).get_tasks()
+    assert [(t.id, t.status) for t in tasks] == [("1", "Stopped"), ("2", "Running"), (new_task.id, "Stopped")]
+
+
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_database_rolled_back_when_start_fail(task_file):
+    file = str(task_file).replace(".json", ".db")
+    m = create_task_manager(file, max_running_tasks=1)
+    with pytest.raises(MoreThanMaxRunningTasks):
+        m.start_task("2")
+    assert [t.id for t in m.get_tasks(status="Running")] == ["1"]
+    assert [t.id for t in m.get_tasks()] == ["1", "2", "3"]
+    m.pool.kill("1")
+    assert create_task_manager(file).tasks["2"].status == "Stopped"
+
+
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_init_with_shards(task_file):
+    m = create_task_manager(task_file, shards=2)
+    try:
+        assert isinstance(m.pool, ShardedScheduler)
+        assert m.pool.pool["1"].is_alive()
+        assert m.get_tasks()[0].next_run is not None
+        m.start_task("2")
+        assert m.pool.running_jobs_count == 2
+        m.stop_task("1")
+        assert "1" not in m.pool.pool
+        assert m.get_executor_stats().max_workers == 2 * m.executor.max_workers
+    finally:
+        m.pool.shutdown()
+
+
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+@pytest.mark.parametrize("backend, scheduler_class", [("heap", HeapScheduler), ("wheel", TimingWheelScheduler)])
+def test_init_with_scheduler_backend(task_file, backend, scheduler_class):
+    m = create_task_manager(task_file, scheduler_backend=backend)
+    assert type(m.pool) is scheduler_class
+    assert m.pool.pool["1"].is_alive()
+
+
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_init_with_async_backend_place_orders_in_event_loop(task_file):
+    m = create_task_manager(task_file, scheduler_backend="async")
+    assert isinstance(m.pool, AsyncScheduler)
+    job = m.pool.pool["1"].job.job_func
+    assert job is not None and _is_coroutine_function(job)
+    m.pool.shutdown()
+
+
 def test_init_without_task_file_succeed(tmpdir, caplog):
     from logging import WARNING
 
@@ -82,7 +185,7 @@ def test_init_without_task_file_succeed(tmpdir, caplog):
     file = f"{d}/task.json"
     m = create_task_manager(file)
 
-    assert m.tasks == {}
+    assert dict(m.tasks) == {}
     assert [
         ("doru.manager.task_manager", WARNING, "Task file for this application could not be found.")
     ] == caplog.record_tuples
@@ -90,6 +193,35 @@ def test_init_without_task_file_succeed(tmpdir, caplog):
         assert json.load(f) == {}
 
 
+def test_init_without_database_succeed(tmpdir, caplog):
+    m = create_task_manager(f"{tmpdir.mkdir('tmp')}/task.db")
+    assert dict(m.tasks) == {}
+    # The database is created with the storage, so it is not missing.
+    assert caplog.record_tuples == []
+
+
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_shutdown_wait_for_running_tasks_and_close_storage(task_file, mocker):
+    file = str(task_file).replace(".json", ".db")
+    m = create_task_manager(file)
+    started, finished = threading.Event(), threading.Event()
+
+    def slow_order(**kwargs):
+        started.set()
+        time.sleep(0.2)
+        finished.set()
+
+    mocker.patch("doru.manager.task_manager.do_order", side_effect=slow_order)
+    close = mocker.spy(m.storage, "close")
+    m.executor.submit(lambda: m._run_task("1", exchange_name="bitbank", symbol="BTC/JPY", amount=10000))
+    assert started.wait(1)
+    m.shutdown()
+    assert finished.is_set()
+    close.assert_called_once()
+    # The run is recorded before the storage is closed.
+    assert create_task_manager(file, catch_up_policy="skip").tasks["1"].last_run is not None
+
+
 def test_init_with_invalid_json_file_raise_exception(tmpdir):
     from pathlib import Path
 
@@ -340,6 +472,29 @@ def test_get_tasks_succeed(task_manager: TaskManager, tasks, mocker):
     assert t == [Task.parse_obj(v) for v in tasks.values()]
 
 
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_get_tasks_not_change_records(task_manager: TaskManager, mocker):
+    mocker.patch("doru.manager.task_manager.TaskManager._get_next_run", return_value="2023-01-01 00:00")
+    assert [t.next_run for t in task_manager.get_tasks()] == ["2023-01-01 00:00"] * 3
+    assert [r.next_run for r in task_manager.tasks.values()] == ["2022-01-01 00:00"] * 3
+
+
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_get_tasks_filtered_succeed(task_manager: TaskManager):
+    assert [t.id for t in task_manager.get_tasks(exchange="bitflyer")] == ["2", "3"]
+    assert [t.id for t in task_manager.get_tasks(status="Running")] == ["1"]
+    assert [t.id for t in task_manager.get_tasks(exchange="bitflyer", symbol="ETH/JPY", status="Stopped")] == [
+        "2",
+        "3",
+    ]
+    assert task_manager.get_tasks(exchange="bitflyer", status="Running") == []
+
+    task_manager.start_task("2")
+    assert [t.id for t in task_manager.get_tasks(status="Running")] == ["1", "2"]
+    task_manager.stop_task("1")
+    assert [t.id for t in task_manager.get_tasks(status="Stopped")] == ["1", "3"]
+
+
 @pytest.mark.parametrize("tasks", [TEST_DATA])
 @pytest.mark.parametrize(
     "new_task", [TaskCreate(symbol="ETH/JPY", amount=1, cycle="Daily", time="00:00", exchange="bitbank")]
@@ -419,8 +574,11 @@ def test_start_task_with_valid_id_succeed(task_manager: TaskManager, id):
     assert task_manager.pool.pool[id].is_alive()
     assert task_manager.pool.pool[id].is_started()
     assert task_manager.tasks[id].status == "Running"
+    assert task_manager.tasks[id].last_run is not None
     with open(task_manager.file, "r") as f:
-        assert json.load(f)[id]["status"] == "Running"
+        data = json.load(f)[id]
+        assert data["status"] == "Running"
+        assert data["last_run"] == task_manager.tasks[id].last_run
 
 
 @pytest.mark.parametrize("tasks, id", [(TEST_DATA, "9999")])
@@ -465,6 +623,134 @@ def test_start_task_more_than_max_running_tasks_raise_exception(task_file, tasks
         assert json.load(f) == tasks
 
 
+@pytest.mark.freeze_time("2022-01-10 12:00:00")
+@pytest.mark.parametrize("tasks, id", [(TEST_DATA, "1")])
+def test_run_task_record_last_run(task_manager: TaskManager, id, mocker):
+    do_order_mock = mocker.patch("doru.manager.task_manager.do_order")
+    task_manager._run_task(id, exchange_name="bitbank", symbol="BTC/JPY", amount=10000)
+    do_order_mock.assert_called_once_with(exchange_name="bitbank", symbol="BTC/JPY", amount=10000)
+    assert task_manager.tasks[id].last_run == "2022-01-10 12:00"
+    with open(task_manager.file, "r") as f:
+        assert json.load(f)[id]["last_run"] == "2022-01-10 12:00"
+
+
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_change_tasks_wait_for_running_task_record(task_manager: TaskManager, spot_markets):
+    new_task = TaskCreate(symbol="ETH/JPY", amount=1, cycle="Daily", time="00:00", exchange="bitbank")
+    changes = [
+        threading.Thread(target=task_manager.add_task, args=(new_task,)),
+        threading.Thread(target=task_manager.start_task, args=("2",)),
+        threading.Thread(target=task_manager.stop_task, args=("1",)),
+        threading.Thread(target=task_manager.remove_task, args=("3",)),
+    ]
+    # a worker thread recording a run holds the lock
+    with task_manager._lock:
+        for t in changes:
+            t.start()
+        time.sleep(0.1)
+        assert all(t.is_alive() for t in changes)
+        assert {k: v.dict(exclude_none=True) for (k, v) in task_manager.tasks.items()} == TEST_DATA
+    for t in changes:
+        t.join()
+    assert len(task_manager.tasks) == 3 and "3" not in task_manager.tasks
+    assert task_manager.tasks["1"].status == "Stopped" and task_manager.tasks["2"].status == "Running"
+
+
+@pytest.mark.freeze_time("2022-01-10 12:00:00")
+@pytest.mark.parametrize("tasks, id", [(TEST_DATA, "1")])
+def test_run_task_keep_latest_last_run(task_manager: TaskManager, id, mocker):
+    mocker.patch("doru.manager.task_manager.do_order")
+    task_manager._run_task(id, exchange_name="bitbank", symbol="BTC/JPY", amount=10000)
+    # a catch-up run finishing after the regular run
+    task_manager._run_task(id, run_at=datetime.datetime(2022, 1, 9), exchange_name="bitbank", symbol="BTC/JPY")
+    assert task_manager.tasks[id].last_run == "2022-01-10 12:00"
+    with open(task_manager.file, "r") as f:
+        assert json.load(f)[id]["last_run"] == "2022-01-10 12:00"
+
+
+@pytest.mark.parametrize("tasks, id", [(TEST_DATA, "1")])
+def test_run_task_execute_order_even_if_writing_fails(task_manager: TaskManager, id, mocker, caplog):
+    do_order_mock = mocker.patch("doru.manager.task_manager.do_order")
+    mocker.patch("doru.manager.task_manager.TaskManager._write", side_effect=Exception("error"))
+    task_manager._run_task(id, exchange_name="bitbank", symbol="BTC/JPY", amount=10000)
+    do_order_mock.assert_called_once()
+    assert "Failed to record the last run: error" in caplog.text
+
+
+@pytest.mark.freeze_time("2022-01-10 12:00:00")
+@pytest.mark.parametrize(
+    "tasks, policy, expected",
+    [
+        ({"1": {**TEST_DATA["1"], "last_run": "2022-01-07 12:00"}}, "skip", []),
+        ({"1": {**TEST_DATA["1"], "last_run": "2022-01-07 12:00"}}, "once", ["2022-01-10 00:00"]),
+        (
+            {"1": {**TEST_DATA["1"], "last_run": "2022-01-07 12:00"}},
+            "all",
+            ["2022-01-08 00:00", "2022-01-09 00:00", "2022-01-10 00:00"],
+        ),
+        ({"1": {**TEST_DATA["1"], "last_run": "2022-01-10 00:00"}}, "all", []),
+        ({"1": {**TEST_DATA["1"], "status": "Stopped", "last_run": "2022-01-07 12:00"}}, "all", []),
+        ({"1": TEST_DATA["1"]}, "all", []),
+    ],
+)
+def test_init_catch_up_missed_runs(task_file, policy, expected, mocker):
+    run_missed_mock = mocker.patch("doru.manager.task_manager.TaskManager._run_missed")
+    create_task_manager(task_file, catch_up_policy=policy, catch_up_interval=0)
+    if expected:
+        run_missed_mock.assert_called_once()
+        missed = run_missed_mock.call_args[0][0]
+        assert [(run_at.strftime("%Y-%m-%d %H:%M"), id) for run_at, id in missed] == [(e, "1") for e in expected]
+    else:
+        run_missed_mock.assert_not_called()
+
+
+@pytest.mark.parametrize("tasks", [{"3": {**TEST_DATA["3"], "status": "Running", "time": "09:00"}}])
+@pytest.mark.parametrize("start", ["2023-01-29 12:00:00", "2023-01-31 12:00:00"])
+def test_init_catch_up_nothing_after_scheduled_run(task_file, freezer, start, mocker):
+    mocker.patch("doru.manager.task_manager.do_order")
+    run_missed_mock = mocker.patch("doru.manager.task_manager.TaskManager._run_missed")
+    freezer.move_to(start)
+    m = create_task_manager(task_file, catch_up_policy="all", catch_up_interval=0)
+    run_at = m.pool.next_run("3")
+    assert run_at == datetime.datetime(2023, 2, 28, 9, 0)
+    freezer.move_to(run_at)
+    m._run_task("3", run_at=run_at, exchange_name="bitflyer", symbol="ETH/JPY", amount=100)
+    m.pool.shutdown()
+    # restarted before the next run on 03-28
+    freezer.move_to("2023-03-10 12:00:00")
+    create_task_manager(task_file, catch_up_policy="all", catch_up_interval=0)
+    run_missed_mock.assert_not_called()
+
+
+@pytest.mark.freeze_time("2022-01-10 12:00:00")
+@pytest.mark.parametrize(
+    "tasks",
+    [{str(i): {**TEST_DATA["1"], "id": str(i), "time": "13:00"} for i in range(100)}],
+)
+@pytest.mark.parametrize("spread_window, max_peak", [(0, 100), (60, 10)])
+def test_get_load_report(task_file, spread_window, max_peak):
+    m = create_task_manager(task_file, max_running_tasks=100, spread_window=spread_window)
+    report = m.get_load_report(datetime.timedelta(days=2))
+    assert len(report) == 1
+    assert report[0].exchange == "bitbank"
+    assert report[0].runs == 200
+    assert report[0].peak <= max_peak
+    assert report[0].peak_at.startswith("2022-01-10 13:00")
+
+
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_run_missed_submit_running_tasks(task_manager: TaskManager, mocker):
+    submit_mock = mocker.patch.object(task_manager.executor, "submit")
+    run_at = datetime.datetime(2022, 1, 1)
+    task_manager._run_missed([(run_at, "1"), (run_at, "2"), (run_at, "9999")])
+    # Only the running task is executed
+    submit_mock.assert_called_once()
+    assert submit_mock.call_args[1]["group"] == "bitbank"
+    func = submit_mock.call_args[0][0]
+    assert func.args == ("1",)
+    assert func.keywords == {"run_at": run_at, "exchange_name": "bitbank", "symbol": "BTC/JPY", "amount": 10000}
+
+
 @pytest.mark.parametrize("tasks, id", [(TEST_DATA, "1"), (TEST_DATA, "2")])
 def test_stop_task_with_valid_id_succeed(task_manager: TaskManager, id):
     task_manager.stop_task(id)
@@ -553,3 +839,129 @@ def test_do_order_exception_when_order_status_is_open(order_status, mocker):
     mocker.patch("doru.exchange.Exchange.cancel_order", side_effect=Exception)
     with pytest.raises(DoruError):
         do_order(exchange_name="binance", symbol="BTC/USD", amount=100)
+
+
+def returning(value: Any = None, exception: Any = None) -> Callable[..., Awaitable[Any]]:
+    async def method(*args: Any, **kwargs: Any) -> Any:
+        if exception is not None:
+            raise exception
+        return value
+
+    return method
+
+
+@pytest.mark.parametrize(
+    "order_status,exception",
+    [
+        (OrderStatus.CLOSED.value, None),
+        (OrderStatus.CANCELED.value, OrderNotComplete),
+        (OrderStatus.OPEN.value, OrderNotComplete),
+        (None, OrderStatusUnknown),
+    ],
+)
+def test_do_order_async(order_status, exception, mocker):
+    create_order_mock = mocker.patch("doru.exchange.AsyncExchange.create_order", side_effect=returning("test_id"))
+    mocker.patch("doru.exchange.AsyncExchange.wait_order_complete", side_effect=returning(order_status))
+    mocker.patch("doru.exchange.AsyncExchange.cancel_order", side_effect=returning())
+    if exception is None:
+        asyncio.run(do_order_async(exchange_name="binance", symbol="BTC/USD", amount=100))
+    else:
+        with pytest.raises(exception):
+            asyncio.run(do_order_async(exchange_name="binance", symbol="BTC/USD", amount=100))
+    # The orders not completed are retried like `do_order`.
+    assert create_order_mock.call_count == (5 if exception is OrderNotComplete else 1)
+
+
+def test_do_order_async_raise_exception(mocker):
+    with pytest.raises(ValueError):
+        asyncio.run(do_order_async(exchange_name="binance", symbol="BTC/USD"))
+
+    mocker.patch("doru.exchange.AsyncExchange.create_order", side_effect=returning(exception=Exception))
+    with pytest.raises(OrderNotCreated):
+        asyncio.run(do_order_async(exchange_name="binance", symbol="BTC/USD", amount=100))
+
+    mocker.patch("doru.exchange.AsyncExchange.create_order", side_effect=returning("test_id"))
+    mocker.patch("doru.exchange.AsyncExchange.wait_order_complete", side_effect=returning(OrderStatus.OPEN.value))
+    mocker.patch("doru.exchange.AsyncExchange.cancel_order", side_effect=returning(exception=Exception))
+    with pytest.raises(DoruError):
+        asyncio.run(do_order_async(exchange_name="binance", symbol="BTC/USD", amount=100))
+
+
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_aggregate_tasks_into_one_order_and_record_fills(task_file, tmpdir, mocker):
+    mocker.patch("doru.exchange.ExchangeRegistry.credential_fingerprint", return_value="fingerprint")
+    place_order_mock = mocker.patch(
+        "doru.manager.task_manager.place_order",
+        side_effect=lambda exchange_name, symbol, amount: {
+            "id": symbol,
+            "status": "closed",
+            "filled": amount / 1000000,
+            "average": 1000000,
+            "cost": amount,
+        },
+    )
+    history_file = tmpdir.join("history.jsonl")
+    m = create_task_manager(task_file, aggregation_window=0.2, history_file=str(history_file))
+    # The running task is dispatched to the aggregator.
+    assert isinstance(m.pool, HeapScheduler)
+    assert m.pool.pool["1"].job.job_func.func == m._aggregate_task
+
+    m._aggregate_task("1", exchange_name="bitbank", symbol="BTC/JPY", amount=10000)
+    m._aggregate_task("2", exchange_name="bitbank", symbol="BTC/JPY", amount=30000)
+    m._aggregate_task("3", exchange_name="bitbank", symbol="ETH/JPY", amount=100)
+    time.sleep(0.5)
+    assert sorted(c[0] for c in place_order_mock.call_args_list) == [
+        ("bitbank", "BTC/JPY", 40000),
+        ("bitbank", "ETH/JPY", 100),
+    ]
+    assert m.tasks["2"].last_run is not None
+
+    fills = {fill.task_id: fill for fill in m.get_history()}
+    assert fills["1"].order_id == fills["2"].order_id == "BTC/JPY"
+    assert fills["1"].filled == pytest.approx(0.01) and fills["2"].filled == pytest.approx(0.03)
+    assert fills["1"].cost == pytest.approx(10000) and fills["1"].tasks == 2
+    assert fills["3"].tasks == 1
+    assert [fill.task_id for fill in m.get_history("2")] == ["2"]
+
+
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_aggregation_ignored_with_async_backend(task_file):
+    assert create_task_manager(task_file, aggregation_window=1).aggregator is not None
+    assert create_task_manager(task_file, aggregation_window=1, scheduler_backend="async").aggregator is None
+
+
+def test_place_order_return_completed_order(mocker):
+    result = {"id": "test_id", "status": OrderStatus.CLOSED.value, "filled": 0.1}
+    mocker.patch("doru.exchange.Exchange.create_order", return_value="test_id")
+    mocker.patch("doru.exchange.Exchange.wait_order", return_value=result)
+    assert place_order("binance", "BTC/USD", 100) == result
+
+    mocker.patch("doru.exchange.Exchange.wait_order", return_value=None)
+    with pytest.raises(OrderStatusUnknown):
+        place_order("binance", "BTC/USD", 100)
+
+
+@pytest.mark.parametrize("tasks", [TEST_DATA])
+def test_run_task_record_spans_of_phases(task_manager: TaskManager, mocker):
+    mocker.patch("doru.simulator.venue", SimulatedVenue(SimulatorConfig(markets=10)))
+    mocker.patch("doru.exchange.ExchangeRegistry.read_credential", return_value={})
+    mocker.patch("doru.exchange.poll_schedule_of", return_value=PollSchedule.fixed(0.01))
+    recorder = SpanRecorder()
+    mocker.patch("doru.tracing.recorder", recorder)
+    mocker.patch("doru.exchange.recorder", recorder)
+    mocker.patch("doru.manager.task_manager.recorder", recorder)
+
+    task_manager._run_task("1", exchange_name="simulated", symbol="BTC/USDT", amount=1000)
+    spans = recorder.recent()
+    assert {s["run"] for s in spans} == {"1"}
+    assert [s["phase"] for s in spans] == [
+        "record",
+        "credential",
+        "ticker",
+        "markets",
+        "create_order",
+        "fill_wait",
+        "total",
+    ]
+    assert all(s["succeeded"] and s["exchange"] == "simulated" for s in spans)
+    assert [s["phase"] for s in recorder.summary()] == sorted(s["phase"] for s in spans)
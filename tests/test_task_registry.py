@@ -0,0 +1,83 @@
+from copy import deepcopy
+from typing import List
+
+import pytest
+
+from doru.api.schema import Task
+from doru.manager.task_registry import TaskRecord, TaskRegistry
+from doru.type import Status
+
+
+def record(id: str, exchange: str = "binance", symbol: str = "BTC/USDT", status: Status = "Stopped") -> TaskRecord:
+    return TaskRecord(id=id, symbol=symbol, amount=100, cycle="Daily", time="00:00", exchange=exchange, status=status)
+
+
+def ids(records: List[TaskRecord]) -> List[str]:
+    return [r.id for r in records]
+
+
+@pytest.fixture
+def registry() -> TaskRegistry:
+    return TaskRegistry(
+        [
+            record("1"),
+            record("2", exchange="kraken", status="Running"),
+            record("3", symbol="ETH/USDT", status="Running"),
+            record("4", exchange="kraken", symbol="ETH/USDT"),
+        ]
+    )
+
+
+def test_record_convert_to_and_from_model():
+    task = Task(
+        id="1",
+        symbol="BTC/USDT",
+        amount=100,
+        cycle="Weekly",
+        weekday="Mon",
+        time="00:00",
+        exchange="binance",
+        status="Running",
+        next_run="2022-01-03 00:00",
+        last_run="2022-01-01 00:00",
+    )
+    r = TaskRecord.from_model(task)
+    assert r.to_model() == task
+    assert r.dict(exclude_none=True) == task.dict(exclude_none=True)
+    assert list(r.dict()) == list(task.dict())
+
+
+def test_find_by_indexes(registry: TaskRegistry):
+    assert ids(registry.find()) == ["1", "2", "3", "4"]
+    assert ids(registry.find(exchange="kraken")) == ["2", "4"]
+    assert ids(registry.find(symbol="ETH/USDT")) == ["3", "4"]
+    assert ids(registry.find(status="Running")) == ["2", "3"]
+    assert ids(registry.find(exchange="binance", symbol="ETH/USDT", status="Running")) == ["3"]
+    assert registry.find(exchange="bitbank") == []
+
+
+def test_set_status_and_pop_update_indexes(registry: TaskRegistry):
+    registry.set_status("1", "Running")
+    assert registry["1"].status == "Running"
+    assert [r.id for r in registry.find(status="Running")] == ["1", "2", "3"]
+    assert [r.id for r in registry.find(status="Stopped")] == ["4"]
+
+    assert registry.pop("4").id == "4"
+    assert "4" not in registry and len(registry) == 3
+    assert registry.find(status="Stopped") == [] and registry.find(exchange="kraken")[0].id == "2"
+    with pytest.raises(KeyError):
+        registry.pop("4")
+
+    # a task added again replaces the former one
+    registry.add(record("1", exchange="kraken"))
+    assert [r.id for r in registry.find(exchange="kraken")] == ["2", "1"]
+    assert [r.id for r in registry.find(exchange="binance")] == ["3"]
+
+
+def test_deepcopy_keep_indexes(registry: TaskRegistry):
+    copied = deepcopy(registry)
+    registry.set_status("1", "Running")
+    registry["2"].last_run = "2022-01-01 00:00"
+    assert copied["1"].status == "Stopped" and copied["2"].last_run is None
+    assert [r.id for r in copied.find(status="Running")] == ["2", "3"]
+    assert dict(copied) != dict(registry)
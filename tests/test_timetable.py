@@ -0,0 +1,118 @@
+from datetime import datetime
+from typing import Hashable, List, Tuple
+
+import pytest
+
+from doru.exceptions import DoruError
+from doru.scheduler import HeapScheduler
+from doru.timetable import (
+    Spec,
+    iter_run_times,
+    load_per_second,
+    next_run_time,
+    spread_offset,
+    upcoming_runs,
+)
+
+
+# 2023-01-01 is Sunday.
+@pytest.mark.parametrize(
+    "cycle, weekday, day, time, after, expected",
+    [
+        ("Daily", None, None, "00:00", datetime(2023, 1, 1, 0, 0), datetime(2023, 1, 1, 0, 0)),
+        ("Daily", None, None, "00:00", datetime(2023, 1, 1, 0, 0, 1), datetime(2023, 1, 2, 0, 0)),
+        ("Daily", None, None, "23:59", datetime(2023, 12, 31, 12, 0), datetime(2023, 12, 31, 23, 59)),
+        ("Daily", None, None, "00:00", datetime(2023, 12, 31, 12, 0), datetime(2024, 1, 1, 0, 0)),
+        ("Weekly", "Sun", None, "00:00", datetime(2023, 1, 1, 0, 0), datetime(2023, 1, 1, 0, 0)),
+        ("Weekly", "Sun", None, "00:00", datetime(2023, 1, 1, 0, 1), datetime(2023, 1, 8, 0, 0)),
+        ("Weekly", "Mon", None, "12:00", datetime(2023, 1, 1, 13, 0), datetime(2023, 1, 2, 12, 0)),
+        ("Weekly", "Sat", None, "12:00", datetime(2023, 12, 31, 13, 0), datetime(2024, 1, 6, 12, 0)),
+        ("Monthly", None, 1, "00:01", datetime(2023, 1, 1, 0, 1), datetime(2023, 1, 1, 0, 1)),
+        ("Monthly", None, 1, "00:00", datetime(2023, 1, 1, 0, 1), datetime(2023, 2, 1, 0, 0)),
+        ("Monthly", None, 28, "23:59", datetime(2023, 2, 28, 23, 59, 30), datetime(2023, 3, 28, 23, 59)),
+        ("Monthly", None, 15, "10:00", datetime(2023, 12, 16, 0, 0), datetime(2024, 1, 15, 10, 0)),
+    ],
+)
+def test_next_run_time(cycle, weekday, day, time, after, expected):
+    assert next_run_time(cycle, time, weekday, day, after) == expected
+
+
+@pytest.mark.freeze_time("2023-01-01 00:01:00")
+@pytest.mark.parametrize(
+    "cycle, weekday, day, time",
+    [
+        ("Daily", None, None, "00:00"),
+        ("Daily", None, None, "00:02"),
+        ("Weekly", "Sun", None, "00:02"),
+        ("Weekly", "Wed", None, "00:00"),
+        ("Monthly", None, 1, "00:00"),
+        ("Monthly", None, 2, "00:00"),
+        ("Monthly", None, 28, "23:59"),
+    ],
+)
+def test_next_run_time_agrees_with_scheduler(cycle, weekday, day, time):
+    scheduler = HeapScheduler(1)
+    scheduler.submit("1", lambda: None, cycle, weekday=weekday, day=day, time=time)
+    assert next_run_time(cycle, time, weekday, day) == scheduler.next_run("1")
+
+
+@pytest.mark.parametrize("cycle", ["Weekly", "Monthly", "Yearly"])
+def test_next_run_time_without_required_param_raise_exception(cycle):
+    with pytest.raises(DoruError):
+        next_run_time(cycle, "00:00")
+
+
+@pytest.mark.parametrize(
+    "cycle, weekday, day, expected",
+    [
+        ("Daily", None, None, [datetime(2023, 1, 31), datetime(2023, 2, 1), datetime(2023, 2, 2)]),
+        ("Weekly", "Tue", None, [datetime(2023, 1, 31), datetime(2023, 2, 7), datetime(2023, 2, 14)]),
+        ("Monthly", None, 28, [datetime(2023, 2, 28), datetime(2023, 3, 28), datetime(2023, 4, 28)]),
+        ("Monthly", None, 1, [datetime(2023, 2, 1), datetime(2023, 3, 1), datetime(2023, 4, 1)]),
+    ],
+)
+def test_iter_run_times(cycle, weekday, day, expected):
+    runs = iter_run_times(cycle, "00:00", weekday, day, datetime(2023, 1, 30, 12, 0))
+    assert [next(runs) for _ in range(3)] == expected
+
+
+def test_upcoming_runs_are_sorted_and_bounded():
+    schedules: List[Tuple[Hashable, Spec]] = [
+        ("a", ("Daily", None, None, "12:00")),
+        ("b", ("Weekly", "Tue", None, "00:00")),
+        ("c", ("Daily", None, None, "12:00")),
+        ("d", ("Monthly", None, 10, "00:00")),
+    ]
+    runs = upcoming_runs(schedules, datetime(2023, 1, 1, 12, 0), datetime(2023, 1, 4, 0, 0))
+    assert runs == [
+        (datetime(2023, 1, 1, 12, 0), "a"),
+        (datetime(2023, 1, 1, 12, 0), "c"),
+        (datetime(2023, 1, 2, 12, 0), "a"),
+        (datetime(2023, 1, 2, 12, 0), "c"),
+        (datetime(2023, 1, 3, 0, 0), "b"),
+        (datetime(2023, 1, 3, 12, 0), "a"),
+        (datetime(2023, 1, 3, 12, 0), "c"),
+    ]
+    assert upcoming_runs([], datetime(2023, 1, 1), datetime(2023, 2, 1)) == []
+
+
+def test_spread_offset_is_deterministic_and_bounded():
+    offsets = [spread_offset(str(i), 60) for i in range(1000)]
+    assert offsets == [spread_offset(str(i), 60) for i in range(1000)]
+    assert all(0 <= o < 60 for o in offsets)
+    # the offsets are spread over the whole window
+    assert len({int(o) for o in offsets}) == 60
+    assert spread_offset("1", 0) == 0
+
+
+def test_load_per_second():
+    runs = [
+        (datetime(2023, 1, 1, 0, 0, 0, 100), "bitbank"),
+        (datetime(2023, 1, 1, 0, 0, 0, 900), "bitbank"),
+        (datetime(2023, 1, 1, 0, 0, 1), "bitbank"),
+        (datetime(2023, 1, 1, 0, 0, 0), "bitflyer"),
+    ]
+    assert load_per_second(runs) == {
+        "bitbank": {datetime(2023, 1, 1, 0, 0, 0): 2, datetime(2023, 1, 1, 0, 0, 1): 1},
+        "bitflyer": {datetime(2023, 1, 1, 0, 0, 0): 1},
+    }
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from doru.tracing import SpanRecorder
+
+
+@pytest.fixture
+def recorder() -> SpanRecorder:
+    return SpanRecorder(size=100)
+
+
+def test_span_record_phase_of_run(recorder: SpanRecorder):
+    with recorder.run("task1"):
+        with recorder.span("binance", "ticker", "BTC/USDT"):
+            pass
+        with pytest.raises(ValueError):
+            with recorder.span("binance", "create_order", "BTC/USDT"):
+                raise ValueError
+    with recorder.span("kraken", "credential"):
+        pass
+
+    spans = recorder.recent()
+    assert [(s["run"], s["exchange"], s["phase"], s["succeeded"]) for s in spans] == [
+        ("task1", "binance", "ticker", True),
+        ("task1", "binance", "create_order", False),
+        (None, "kraken", "credential", True),
+    ]
+    assert spans[0]["symbol"] == "BTC/USDT" and spans[0]["seconds"] >= 0
+    assert [s["phase"] for s in recorder.recent(exchange="binance", limit=1)] == ["create_order"]
+    assert len(recorder.recent(run="task1")) == 2
+
+
+def test_recorder_keep_latest_spans(recorder: SpanRecorder):
+    for i in range(150):
+        with recorder.run(str(i)), recorder.span("binance", "total"):
+            pass
+    spans = recorder.recent(limit=1000)
+    assert len(spans) == 100 and spans[0]["run"] == "50"
+
+
+def test_summary_per_exchange_and_phase():
+    recorder = SpanRecorder(size=1000)
+    for i in range(1, 101):
+        recorder.record(
+            {
+                "run": str(i),
+                "exchange": "binance",
+                "symbol": "BTC/USDT",
+                "phase": "fill_wait",
+                "started_at": 0,
+                "seconds": i,
+                "succeeded": i % 10 != 0,
+            }
+        )
+    with recorder.span("kraken", "ticker"):
+        pass
+    summary = recorder.summary()
+    assert [(s["exchange"], s["phase"]) for s in summary] == [("binance", "fill_wait"), ("kraken", "ticker")]
+    assert summary[0] == {
+        "exchange": "binance",
+        "phase": "fill_wait",
+        "count": 100,
+        "failures": 10,
+        "mean_seconds": 50.5,
+        "p50_seconds": 51,
+        "p90_seconds": 91,
+        "p99_seconds": 100,
+        "max_seconds": 100,
+    }
+
+
+def test_run_of_concurrent_coroutines_kept_apart(recorder: SpanRecorder):
+    async def order(id: str) -> None:
+        with recorder.run(id):
+            with recorder.span("binance", "ticker"):
+                await asyncio.sleep(0.01)
+            with recorder.span("binance", "create_order"):
+                await asyncio.sleep(0.01)
+
+    async def main() -> None:
+        await asyncio.gather(order("1"), order("2"))
+
+    asyncio.run(main())
+    assert sorted((s["run"], s["phase"]) for s in recorder.recent()) == [
+        ("1", "create_order"),
+        ("1", "ticker"),
+        ("2", "create_order"),
+        ("2", "ticker"),
+    ]